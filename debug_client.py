@@ -160,6 +160,7 @@ async def do_handshake(websocket) -> bool:
 
 async def receive_loop(websocket, state: dict, pipe: asyncio.Queue):
     """Background receive loop — fills state dict."""
+    received: dict[str, int] = {}  # label → чанков стрима принято
     try:
         async for raw in websocket:
             data = json.loads(raw)
@@ -201,7 +202,24 @@ async def receive_loop(websocket, state: dict, pipe: asyncio.Queue):
                     )
                 case PackType.STREAM_CHUNK:
                     await pipe.put(("chunk", pack.data))
+                    # кредит генератору: очередь клиента не ограничена —
+                    # подтверждаем каждый принятый чанк
+                    received[pack.label] = received.get(pack.label, 0) + 1
+                    await websocket.send(
+                        MsgPack(
+                            type=PackType.STREAM_ACK,
+                            source=OWN_NODE,
+                            dst=pack.source,
+                            label=pack.label,
+                            data={
+                                "buff": 10,
+                                "received": received[pack.label],
+                                "completed": received[pack.label],
+                            },
+                        ).model_dump_json()
+                    )
                 case PackType.STREAM_EOF:
+                    received.pop(pack.label, None)
                     state["stream_eof"] = True
                     await pipe.put(("eof", None))
                 case PackType.STREAM_READY:
@@ -242,6 +260,37 @@ async def rpc(websocket, state, service, method, data=None, dst=DST_NODE):
     return {"error": "timeout waiting for response"}
 
 
+async def rpc_batch(websocket, state, calls, dst=DST_NODE):
+    """
+    Несколько вызовов одним REQUEST_BATCH.
+    calls — [(service, method, data), ...]; возвращает список результатов
+    (None для вызова, завершившегося ошибкой).
+    """
+    label = str(uuid.uuid4())
+    state["response_ready"] = False
+    state["last_response"] = None
+    state["_rpc_label"] = label
+    pack = MsgPack(
+        type=PackType.REQUEST_BATCH,
+        source=OWN_NODE,
+        dst=dst,
+        data={"calls": [
+            {"service": service, "method": method, "data": data}
+            for service, method, data in calls
+        ]},
+        label=label,
+    )
+    await websocket.send(pack.model_dump_json())
+    for _ in range(50):  # 5 sec total
+        if state.get("response_ready") and state.get("_rpc_label") == label:
+            response = state.get("last_response")
+            if not isinstance(response, list):
+                return [None] * len(calls)
+            return [item.get("result") for item in response]
+        await asyncio.sleep(0.1)
+    return [None] * len(calls)
+
+
 # ------------------------------------------------------------------
 # Known service methods (from docs)
 # ------------------------------------------------------------------
@@ -542,12 +591,14 @@ async def async_main():
             pipe = asyncio.Queue()
             recv_task = asyncio.create_task(receive_loop(websocket, state, pipe))
 
-            neighbors_data = await rpc(websocket, state, "netinfo", "neighbors")
+            neighbors_data, svc_data = await rpc_batch(websocket, state, [
+                ("netinfo", "neighbors", None),
+                ("netinfo", "services", None),
+            ])
             if neighbors_data:
                 state["neighbors"] = neighbors_data.get("connected", []) + \
                                      neighbors_data.get("known", [])
 
-            svc_data = await rpc(websocket, state, "netinfo", "services")
             if svc_data:
                 state["services"] = svc_data if isinstance(svc_data, list) else []
                 state["service_methods"] = {
@@ -638,11 +689,13 @@ async def async_main():
                         input_buf = ""
                     elif key == "r":
                         status_msg = "Refreshing..."
-                        nd = await rpc(websocket, state, "netinfo", "neighbors")
+                        nd, sd = await rpc_batch(websocket, state, [
+                            ("netinfo", "neighbors", None),
+                            ("netinfo", "services", None),
+                        ])
                         if nd:
                             state["neighbors"] = nd.get("connected", []) + \
                                                  nd.get("known", [])
-                        sd = await rpc(websocket, state, "netinfo", "services")
                         if sd:
                             state["services"] = sd if isinstance(sd, list) else []
                             state["service_methods"] = {
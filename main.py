@@ -29,11 +29,17 @@ if "-m" in sys.argv and "streamlit" in sys.argv:
     sys.exit(stcli.main())
 
 from services.loader import ServiceLoader
+from services.rpc import get_rpc_methods
+from src.internal_modules.admission import Admission
+from src.internal_modules.cache import ResultCache
 from src.internal_modules.config import load_config
 from src.internal_modules.context import AppContext, app_lifespan
+from src.internal_modules.jobs import JobRegistry
 from src.internal_modules.memory import MemoryModule
+from src.internal_modules.scatter import Scatter
 from src.internal_modules.setup_logging import setup_logging
 from src.internal_modules.spawner import Spawner
+from src.internal_modules.workers import Workers
 from src.networking.network import NetworkModule
 from src.networking.node_connector import NodeConnector
 
@@ -58,6 +64,15 @@ logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
 logging.getLogger("fastapi").setLevel(logging.WARNING)
 
 
+def expose(ctx, module):
+    """Зарегистрировать внутренний модуль и открыть его @rpc методы как сервис."""
+    ctx.register(module)
+    ctx.services.register_service(module)
+    for method_name, method in get_rpc_methods(module).items():
+        ctx.services.register_method(module, method_name, method)
+    return module
+
+
 async def main():
     cfg_manager = load_config(
         base_path=BASE_DIR / 'config.yaml',
@@ -70,17 +85,24 @@ async def main():
     ctx.config_manager = cfg_manager
 
     # порядок вызовов = порядок загрузки
-    ctx.memory = ctx.register(MemoryModule(name='memory', context=ctx))
+    ctx.memory = expose(ctx, MemoryModule(name='memory', context=ctx))
+    # Workers — пулы для @rpc(executor=...)
+    ctx.workers = expose(ctx, Workers(name='workers', context=ctx))
+    # Admission — лимиты одновременных вызовов сервисов и методов
+    ctx.admission = expose(ctx, Admission(name='admission', context=ctx))
+    # ResultCache — кэш @rpc(cache_ttl=...)
+    ctx.cache = expose(ctx, ResultCache(name='cache', context=ctx))
     ctx.network = ctx.register(NetworkModule(name='network',
                                              context=ctx,
                                              host=cfg.network.host,
                                              port=cfg.network.port, ))
 
     # Spawner — не в services/, регистрируем вручную
-    ctx.spawn = ctx.register(Spawner(name='spawner', context=ctx))
-    ctx.services.register_service(ctx.spawn)
-    ctx.services.register_method(ctx.spawn, 'spawn', ctx.spawn.spawn)
-    ctx.services.register_method(ctx.spawn, 'list_generators', ctx.spawn.list_generators)
+    ctx.spawn = expose(ctx, Spawner(name='spawner', context=ctx))
+    # JobRegistry — прогресс и checkpoint'ы задач Spawner'а
+    ctx.jobs = expose(ctx, JobRegistry(name='jobs', context=ctx))
+    # Scatter — один вызов на все узлы с сервисом
+    ctx.scatter = expose(ctx, Scatter(name='scatter', context=ctx))
 
     # пробрасываем ctx в роуты FastAPI
     ctx.network.app.state.ctx = ctx
@@ -14,7 +14,7 @@ from typing import Any
 from src.internal_modules.base import ModuleGeneric
 from src.networking.protocol import MsgPack, PackType
 from src.networking.transport import WebSocketTransport
-from services.rpc import rpc
+from services.rpc import not_modified, rpc
 
 
 class CertsTool(ModuleGeneric):
@@ -135,6 +135,11 @@ class CertsTool(ModuleGeneric):
             self.log.error(f'Command error: {e}')
             return ''
 
+    def _certs_changed(self):
+        """Хранилище изменилось — сбросить кэш списков сертификатов."""
+        if self.ctx.cache:
+            self.ctx.cache.invalidate(self.name)
+
     @staticmethod
     def _extract_error_code(output: str) -> str:
         for line in output.split('\n'):
@@ -245,7 +250,7 @@ class CertsTool(ModuleGeneric):
     #  RPC методы
     # ------------------------------------------------------------------ #
 
-    @rpc
+    @rpc(limit=2, queue=32, cache_ttl=10)
     async def list_certificates(self, data: dict) -> dict:
         """Список установленных сертификатов."""
         cmd = f'"{self.csp_path / "certmgr.exe"}" -list'
@@ -295,6 +300,7 @@ class CertsTool(ModuleGeneric):
                f'-file "{pfx_path}" -pfx -container "{auto_container}" '
                f'-silent -keep_exportable -pin {pin}')
         output = await self._run_async(cmd)
+        self._certs_changed()
         result['pfx_error'] = self._extract_error_code(output)
         result['container'] = self._extract_container(output)
         if not result['container'] and result['pfx_error'] == '0x00000000':
@@ -308,6 +314,7 @@ class CertsTool(ModuleGeneric):
                f'-file "{cer_path}" -certificate -container "{result["container"]}" '
                f'-silent -inst_to_cont')
         output = await self._run_async(cmd)
+        self._certs_changed()
         result['cer_error'] = self._extract_error_code(output)
 
         if result['cer_error'] != '0x00000000':
@@ -448,6 +455,7 @@ class CertsTool(ModuleGeneric):
 
         cmd = f'"{self.csp_path / "certmgr.exe"}" -delete -thumbprint "{thumbprint}"'
         output = await self._run_async(cmd)
+        self._certs_changed()
         error = self._extract_error_code(output)
 
         if error == '0x00000000':
@@ -482,6 +490,7 @@ class CertsTool(ModuleGeneric):
                    f'-file "{tmp_path}" -pfx -container "{container_name}" '
                    f'-silent -keep_exportable -pin {password}')
             output = await self._run_async(cmd)
+            self._certs_changed()
             error = self._extract_error_code(output)
             container = self._extract_container(output)
 
@@ -533,6 +542,7 @@ class CertsTool(ModuleGeneric):
                        f'-file "{tmp_path}" -pfx -container "{auto_container}" '
                        f'-silent -keep_exportable -pin {current_pwd}')
                 output = await self._run_async(cmd)
+                self._certs_changed()
                 error = self._extract_error_code(output)
                 container = self._extract_container(output)
 
@@ -563,7 +573,7 @@ class CertsTool(ModuleGeneric):
             'results': results,
         }
 
-    @rpc
+    @rpc(cache_ttl=10)
     async def get_dashboard_data(self, data: dict) -> dict:
         """Данные для веб-панели: список сертификатов с нормализацией полей."""
         try:
@@ -599,7 +609,7 @@ class CertsTool(ModuleGeneric):
     #  Сетевая установка сертификатов (CERT_SYNC)
     # ------------------------------------------------------------------ #
 
-    @rpc
+    @rpc(cache_ttl=5)
     async def network_certs(self, data: dict) -> dict:
         """Сертификаты из сети, не установленные локально, сгруппированные по subject_cn.
 
@@ -608,9 +618,16 @@ class CertsTool(ModuleGeneric):
           total: общее число недостающих сертификатов
         Каждый entry_dict: {thumbprint, subject_cn, valid_to, available_on, sync_version}
         Сортировка: сначала самые свежие (valid_to), CONNECTED узлы приоритетнее.
+        {'if_version': v} — not_modified, если индекс и соседи не менялись.
         """
         available = self.ctx.certs_index.get_network_available()
-        connected_ids = {n.node_id for n in self.ctx.network.neighbor_table.connected()}
+        table = self.ctx.network.neighbor_table
+        # число доступных — записи устаревают по времени, без смены версии
+        version = f'{self.ctx.certs_index.version}.{table.version}.{len(available)}'
+        reply = not_modified(data, version)
+        if reply:
+            return reply
+        connected_ids = {n.node_id for n in table.connected()}
 
         groups: dict[str, list[dict]] = {}
         for entry in available:
@@ -632,11 +649,12 @@ class CertsTool(ModuleGeneric):
             entries.sort(key=_sort_key)
 
         return {
+            'version': version,
             'groups': groups,
             'total': len(available),
         }
 
-    @rpc
+    @rpc(limit=2, queue=16)
     async def install_from_node(self, data: dict) -> dict:
         """Сетевая установка сертификата с удалённого узла.
 
@@ -846,6 +864,7 @@ class CertsTool(ModuleGeneric):
                    f'-file "{tmp_path}" -pfx -container "{container}" '
                    f'-silent -keep_exportable -pin {password}')
             output = await self._run_async(cmd)
+            self._certs_changed()
             error = self._extract_error_code(output)
             result_container = self._extract_container(output)
 
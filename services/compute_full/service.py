@@ -4,7 +4,7 @@
 import uuid
 import asyncio
 from src.internal_modules.base import ModuleGeneric
-from services.rpc import rpc, stream_wrapper, stream_consumer, generator
+from services.rpc import rpc, stream_wrapper, stream_consumer, generator, shard_range
 from src.networking.protocol import MsgPack
 from src.internal_modules.memory import Pipe
 
@@ -12,18 +12,19 @@ from src.internal_modules.memory import Pipe
 class Compute(ModuleGeneric):
     def __init__(self, name, context):
         super().__init__(name, context)
+        self._sums: dict[str, int] = {}  # pipeline_id → сумма reduce-стадии
 
-    @generator
+    @generator(shardable=True)
     def compute_ranges(self, data: dict):
         count = data.get('count', 20) if isinstance(data, dict) else 20
-        for i in range(count):
+        for i in shard_range(data, count):
             self.log.debug(f'generate #{i}')
             yield [i * 100, (i + 1) * 100]
 
-    @generator
+    @generator(shardable=True)
     def compute_squares(self, data: dict):
         count = data.get('count', 20) if isinstance(data, dict) else 20
-        for i in range(count):
+        for i in shard_range(data, count):
             yield i * i
 
     # ------------------------------------------------------------------ #
@@ -117,3 +118,54 @@ class Compute(ModuleGeneric):
             self.log.info(f'RESULT  #{index} = {result}')
 
         self.log.info(f'Consumer done — total={len(results)} results={results}')
+
+    # ------------------------------------------------------------------ #
+    #  Стадии pipeline: square_map (map) → sum_reduce (reduce)
+    #  Запуск: spawner.pipeline с stages=[{compute, square_map, [B, C]},
+    #                                     {compute, sum_reduce, [E]}]
+    # ------------------------------------------------------------------ #
+
+    @stream_consumer('square_map')
+    async def map_squares(self, pipe: Pipe, ctx: dict):
+        label  = ctx.get('label')
+        emit   = ctx.get('emit')
+        buff   = ctx.get('buff', 3)
+        router = self.ctx.network.router
+
+        if label:
+            await router.send_stream_ack(label, buff)
+
+        async for chunk in pipe:
+            value = chunk[0] if isinstance(chunk, list) else chunk
+            if emit:
+                await emit(value * value)
+            if label and pipe.size < buff:
+                await router.send_stream_ack(label, buff)
+
+    @stream_consumer('sum_reduce')
+    async def reduce_sum(self, pipe: Pipe, ctx: dict):
+        label       = ctx.get('label')
+        buff        = ctx.get('buff', 3)
+        pipeline_id = ctx.get('pipeline_id', label)
+        router      = self.ctx.network.router
+
+        if label:
+            await router.send_stream_ack(label, buff)
+
+        # стримы всех map-узлов приходят в этот pipe — один consumer на узел
+        total = 0
+        async for chunk in pipe:
+            total += chunk
+            if label and pipe.size < buff:
+                await router.send_stream_ack(label, buff)
+
+        self._sums[pipeline_id] = total
+        self.log.info(f'Reduce {pipeline_id[:8]}: sum={total}')
+
+    @rpc
+    def reduced(self, data: dict):
+        """Результаты sum_reduce по pipeline_id."""
+        pipeline_id = data.get('pipeline_id') if isinstance(data, dict) else None
+        if pipeline_id:
+            return {pipeline_id: self._sums.get(pipeline_id)}
+        return dict(self._sums)
@@ -0,0 +1,81 @@
+# GRID/services/files/service.py
+# встроенный источник данных: записи большого локального файла через mmap
+
+import base64
+from pathlib import Path
+
+from src.internal_modules.base import ModuleGeneric
+from src.internal_modules.filesource import FileSource
+from services.rpc import rpc, generator
+
+
+class Files(ModuleGeneric):
+    """
+    Генератор files.read — записи файла из files.root (на узле, где он запущен).
+
+    data: path         — путь относительно files.root
+          framing      — line | fixed | length | bytes (по умолчанию line)
+          record_size  — для fixed
+          prefix       — struct-формат длины для length (по умолчанию '<I')
+          chunk_bytes  — размер среза для bytes
+          as           — view (memoryview без копии), bytes или text;
+                         по умолчанию view для consumer'а на этом же узле
+                         (partitioned-режим), иначе bytes. По сети bytes
+                         уходят base64-строкой, view — только локально
+          encoding     — для as=text (по умолчанию utf-8)
+          shard        — см. shard_range; Spawner подставляет сам
+          local        — consumer на этом узле; Spawner подставляет сам
+    """
+
+    def __init__(self, name, context):
+        super().__init__(name, context)
+        self.root = Path(context.config.files.root).resolve()
+
+    def _resolve(self, path: str) -> Path:
+        full = (self.root / path).resolve()
+        if not full.is_relative_to(self.root):
+            raise PermissionError(f'{path} is outside of files.root')
+        return full
+
+    def _open(self, data: dict) -> FileSource:
+        return FileSource(
+            self._resolve(data['path']),
+            framing      = data.get('framing', 'line'),
+            record_size  = data.get('record_size', 0),
+            prefix       = data.get('prefix', '<I'),
+            chunk_bytes  = data.get('chunk_bytes', 1 << 20),
+            keep_newline = data.get('keep_newline', False),
+        )
+
+    @generator(shardable=True)
+    def read(self, data: dict):
+        local = data.get('local', False)
+        mode = data.get('as', 'view' if local else 'bytes')
+        if mode == 'view' and not local:
+            # memoryview не сериализуется в MsgPack — только для локального consumer'а
+            raise ValueError("files.read as='view' requires a consumer on this node "
+                             "(mode='partitioned'); use as='bytes' or as='text'")
+        encoding = data.get('encoding', 'utf-8')
+        with self._open(data) as source:
+            for view in source.records(data.get('shard')):
+                if mode == 'view':
+                    yield view
+                elif mode == 'bytes':
+                    # JSON-пакет не несёт произвольные байты — base64 для сети
+                    yield bytes(view) if local else base64.b64encode(view).decode('ascii')
+                else:
+                    yield str(view, encoding)
+
+    @rpc(executor='thread')
+    def describe(self, data: dict):
+        """Размер файла и число записей (для line — None)."""
+        try:
+            with self._open(data) as source:
+                return {
+                    'path':    data['path'],
+                    'size':    source.size,
+                    'framing': source.framing,
+                    'records': source.count(),
+                }
+        except (OSError, ValueError, KeyError) as e:
+            return {'error': str(e)}
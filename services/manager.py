@@ -1,21 +1,66 @@
 # GRID/services/manager.py
 
+import inspect
 import logging
+import time
 from typing import Callable, Any, Dict
 from src.internal_modules.base import ModuleGeneric
-from services.rpc import get_generators
+from services.rpc import get_generators, get_stream_handlers
 
 _log = logging.getLogger('ServiceManager')
 
+# вид метода — определяется один раз при регистрации, а не на каждый запрос
+SYNC      = 'sync'
+ASYNC     = 'async'
+ASYNC_GEN = 'asyncgen'
+
+
+class Invoker:
+    """Запись таблицы диспетчеризации: метод, его вид и политика исполнения."""
+    __slots__ = ('fn', 'kind', 'policy', 'limit', 'cache')
+
+    def __init__(self, fn: Callable):
+        self.fn = fn
+        if inspect.isasyncgenfunction(fn):
+            self.kind = ASYNC_GEN
+        elif inspect.iscoroutinefunction(fn):
+            self.kind = ASYNC
+        else:
+            self.kind = SYNC
+        # (executor, pool) из @rpc(executor=...); None — в event loop'е
+        self.policy = getattr(fn, '_executor', None)
+        if self.policy is not None and self.kind != SYNC:
+            _log.warning(f'{getattr(fn, "__qualname__", fn)}: executor={self.policy[0]} '
+                         f'ignored, only sync methods run in pools')
+            self.policy = None
+        # (limit, queue) из @rpc(limit=, queue=) — см. Admission
+        self.limit = getattr(fn, '_limit', None)
+        # (ttl, key) из @rpc(cache_ttl=, key=) — см. ResultCache
+        self.cache = getattr(fn, '_cache', None)
+
 
 class ServiceManager:
     def __init__(self):
         self.services: Dict[str, Dict[str, Any]] = {}
+        # таблицы, собранные при регистрации: service → method → Invoker,
+        # service → stream → (Invoker wrapper'а | None, consumer)
+        self._invokers: Dict[str, Dict[str, Invoker]] = {}
+        self._streams: Dict[str, Dict[str, tuple]] = {}
+        # версия реестра: растёт при любой регистрации / удалении;
+        # с текущего времени в мс — не повторяется после перезапуска
+        self.version = int(time.time() * 1000)
 
     def register_service(self, service: ModuleGeneric):
         if service.name not in self.services:
             self.services[service.name] = {}
         self.services[service.name]['self'] = service
+        self.version += 1
+        self._streams[service.name] = {
+            name: (Invoker(handler['wrapper']) if handler.get('wrapper') else None,
+                   handler['consumer'])
+            for name, handler in get_stream_handlers(service).items()
+            if 'consumer' in handler
+        }
 
         # авторегистрация @generator методов
         for name, method in get_generators(service).items():
@@ -25,8 +70,15 @@ class ServiceManager:
     def get_service(self, service: str) -> Any | None:
         return self.services.get(service, {}).get('self')
 
+    def get_stream(self, service: str, stream: str) -> tuple | None:
+        """(Invoker wrapper'а | None, consumer) stream'а сервиса."""
+        return self._streams.get(service, {}).get(stream)
+
     def remove_service(self, service: ModuleGeneric):
         self.services.pop(service.name, None)
+        self._invokers.pop(service.name, None)
+        self._streams.pop(service.name, None)
+        self.version += 1
 
         # ------------------------------------------------------------------ #
         #  RPC methods
@@ -35,12 +87,19 @@ class ServiceManager:
     def register_method(self, service: ModuleGeneric, method_name: str,
                         method: Callable):
         self._set(service.name, method_name, method)
+        self._invokers.setdefault(service.name, {})[method_name] = Invoker(method)
+        self.version += 1
 
     def get_method(self, service: str, method: str) -> Callable | None:
         return self._get(service, method)
 
+    def get_invoker(self, service: str, method: str) -> Invoker | None:
+        return self._invokers.get(service, {}).get(method)
+
     def remove_method(self, service: ModuleGeneric, method_name: str):
         self.services.get(service.name, {}).pop(method_name, None)
+        self._invokers.get(service.name, {}).pop(method_name, None)
+        self.version += 1
 
     # ------------------------------------------------------------------ #
     #  Generators
@@ -49,6 +108,7 @@ class ServiceManager:
     def register_generator(self, service: ModuleGeneric, name: str,
                            method: Callable):
         self._set(service.name, f'__gen__{name}', method)
+        self.version += 1
 
     def get_generator(self, service: str, name: str) -> Callable | None:
         return self._get(service, f'__gen__{name}')
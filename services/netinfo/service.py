@@ -1,24 +1,52 @@
 # GRID/services/netinfo/service.py — просмотр состояния сети через RPC
 
 from src.internal_modules.base import ModuleGeneric
-from services.rpc import rpc
+from src.networking.link_scheduler import LinkScheduler
+from services.rpc import not_modified, rpc
 
 
 class NetInfo(ModuleGeneric):
     def __init__(self, name, context):
         super().__init__(name, context)
 
-    @rpc
+    @rpc(cache_ttl=1)
     def neighbors(self, data: dict):
-        """Полная таблица соседей."""
+        """
+        Полная таблица соседей. {'if_version': v} — not_modified, если таблица
+        не менялась; с 'delta': True — только изменившиеся с v узлы:
+        {'delta': {'changed': [...], 'removed': [node_id, ...]}}.
+        Замеры (rtt / load / last_ts) version не покрывает — см. neighbor_metrics.
+        """
         table = self.ctx.network.neighbor_table
+        reply = not_modified(data, table.version)
+        if reply:
+            return reply
+        since = data.get('if_version') if isinstance(data, dict) else None
+        if since is not None and data.get('delta'):
+            changed = table.changes_since(since)
+            if changed is not None:
+                return {
+                    'own':     self.ctx.NODE,
+                    'version': table.version,
+                    'delta': {
+                        'changed': [table.stable(table.get(n))
+                                    for n in changed if table.has(n)],
+                        'removed': [n for n in changed if not table.has(n)],
+                    },
+                }
         return {
             'own':       self.ctx.NODE,
-            'connected': [n.model_dump() for n in table.connected()],
-            'known':     [n.model_dump() for n in table.known()],
-            'all':       [n.model_dump() for n in table.all()],
+            'version':   table.version,
+            'connected': [table.stable(n) for n in table.connected()],
+            'known':     [table.stable(n) for n in table.known()],
+            'all':       [table.stable(n) for n in table.all()],
         }
 
+    @rpc
+    def neighbor_metrics(self, data: dict):
+        """Текущие замеры соседей: node_id → last_ts / rtt / rtt_p95 / path_rtt / load."""
+        return self.ctx.network.neighbor_table.metrics()
+
     @rpc
     def nodes(self, data: dict):
         """Активные WS подключения в NodesManager."""
@@ -28,6 +56,19 @@ class NetInfo(ModuleGeneric):
             for node_id in nm.nodes.keys()
         }
 
+    @rpc
+    def shm_links(self, data: dict):
+        """Shared-memory каналы с co-located соседями."""
+        return self.ctx.network.shm.stats()
+
+    @rpc
+    def links(self, data: dict):
+        """Очереди отправки WS-соединений: по классам control / rpc / bulk."""
+        network = self.ctx.network
+        links = {node_id: node.ws for node_id, node in network.nodes_manager.nodes.items()}
+        links.update(network.router._client_ws)
+        return {node_id: LinkScheduler.for_ws(ws).stats() for node_id, ws in links.items()}
+
     @rpc
     def services(self, data: dict):
         """Сервисы зарегистрированные локально."""
@@ -2,19 +2,111 @@
 
 import asyncio
 import inspect
+import time
+from contextvars import ContextVar
 from typing import Callable
 
+# монотонный момент, после которого результат вызова уже никому не нужен
+# (выставляет LocalExecutor на время выполнения метода)
+_deadline: ContextVar[float | None] = ContextVar('rpc_deadline', default=None)
 
-def rpc(method):
-    """Обычный RPC метод."""
-    method._is_rpc = True
-    return method
 
+# где выполняется синхронный @rpc метод: None — прямо в event loop'е
+EXECUTORS = ('thread', 'process')
 
-def generator(method):
-    """Генератор данных для Dispatcher/Spawner."""
-    method._is_generator = True
-    return method
+
+def rpc(method=None, *, executor: str | None = None, pool: str | None = None,
+        limit: int | None = None, queue: int = 0,
+        cache_ttl: float | None = None, key=None):
+    """
+    RPC метод.
+
+    @rpc                                  — выполняется в event loop'е
+    @rpc(executor='thread')               — синхронный метод в пуле потоков
+    @rpc(executor='process', pool='cpu')  — в пуле процессов 'cpu'; метод
+                                            вызывается без экземпляра (self=None)
+    @rpc(limit=2, queue=16)               — не больше 2 вызовов одновременно,
+                                            16 ждут, остальным сразу Overloaded
+    @rpc(cache_ttl=5, key=('path',))      — результат кэшируется на 5 с по ключу
+                                            (функция от data, поля data или весь data),
+                                            одновременные вызовы — одно выполнение
+    Размеры пулов — workers.pools в config.yaml, по умолчанию пул назван
+    по executor'у; admission.limits в config.yaml важнее limit/queue.
+    """
+    if executor is not None and executor not in EXECUTORS:
+        raise ValueError(f'unknown executor: {executor}, expected one of {EXECUTORS}')
+
+    def decorator(fn):
+        fn._is_rpc = True
+        if executor is not None:
+            fn._executor = (executor, pool or executor)
+        if limit is not None:
+            fn._limit = (limit, queue)
+        if cache_ttl is not None:
+            fn._cache = (cache_ttl, tuple(key) if isinstance(key, list) else key)
+        return fn
+
+    if method is not None:
+        return decorator(method)
+    return decorator
+
+
+def generator(method=None, *, shardable: bool = False):
+    """
+    Генератор данных для Dispatcher/Spawner.
+
+    @generator                  — работает только на узле-spawner'е
+    @generator(shardable=True)  — умеет работать по шарду (data['shard']),
+                                  Spawner может запускать его прямо на worker'ах
+    """
+    def decorator(fn):
+        fn._is_generator = True
+        fn._shardable = shardable
+        return fn
+
+    if method is not None:
+        return decorator(method)
+    return decorator
+
+
+def shard_range(data, total: int) -> range:
+    """
+    Диапазон индексов для шарда из data['shard'].
+
+    shard: {'start': a, 'stop': b}       — явный срез
+           {'index': i, 'count': n}      — i-я из n равных частей
+           {'start': a, 'resume': True}  — resume задачи с a-го элемента
+                                           (генератор, чей шард не в номерах
+                                           элементов, пересчитывает сам)
+    Без shard — весь диапазон [0, total).
+    """
+    shard = data.get('shard') if isinstance(data, dict) else None
+    if not shard:
+        return range(total)
+    if 'start' in shard or 'stop' in shard:
+        return range(max(0, shard.get('start', 0)), min(total, shard.get('stop', total)))
+    index, count = shard.get('index', 0), max(1, shard.get('count', 1))
+    return range(total * index // count, total * (index + 1) // count)
+
+
+def time_left() -> float | None:
+    """
+    Сколько секунд осталось у вызывающего текущего @rpc метода.
+    None — вызов без deadline. Метод может выбрать более дешёвую стратегию
+    или сразу отказаться; вложенные ctx.network.call() не ждут дольше.
+    """
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def not_modified(data, version) -> dict | None:
+    """
+    Условный ответ: {'version', 'not_modified': True}, если вызывающий
+    прислал data['if_version'] равный текущей version, иначе None.
+    """
+    if isinstance(data, dict) and data.get('if_version') == version:
+        return {'version': version, 'not_modified': True}
+    return None
 
 
 def get_generators(instance) -> dict:
@@ -50,6 +50,8 @@ class NodeRPC:
         self._reconnecting = False
         self._recv_task: asyncio.Task | None = None
         self._lock = threading.Lock()
+        # последние полные ответы call_versioned: (dst, service, method) → ответ
+        self._versioned: dict[tuple, dict] = {}
 
         self._start()
 
@@ -189,30 +191,65 @@ class NodeRPC:
             dst: целевой узел. Если None — локальный (target_node).
                  Удалённый узел маршрутизируется через mesh.
         """
+        pack = MsgPack(
+            type=PackType.REQUEST,
+            source=self.node_id,
+            dst=dst or self.target_node,
+            service=service,
+            method=method,
+            data=data,
+        )
+        return self._send_and_wait(pack, timeout, f"{service}.{method}")
+
+    def call_versioned(self, service: str, method: str, data=None,
+                       dst: str | None = None, timeout: int = 10):
+        """
+        call() с if_version: если на узле ничего не менялось, он отвечает
+        коротким not_modified, и возвращается прошлый полный ответ.
+        Для методов, отдающих 'version' (node_status, neighbors, network_certs).
+        """
+        key = (dst or self.target_node, service, method)
+        cached = self._versioned.get(key)
+        request = dict(data or {})
+        if cached is not None:
+            request['if_version'] = cached['version']
+        result = self.call(service, method, request, dst=dst, timeout=timeout)
+        if isinstance(result, dict) and result.get('not_modified') and cached is not None:
+            return cached
+        if isinstance(result, dict) and 'version' in result:
+            self._versioned[key] = result
+        return result
+
+    def call_batch(self, calls: list[dict], dst: str | None = None,
+                   timeout: int = 10) -> list[dict]:
+        """
+        Несколько вызовов к одному узлу за один round trip (REQUEST_BATCH).
+
+        calls: [{'service': ..., 'method': ..., 'data': ...}, ...]
+        Возвращает список в том же порядке: {'result': ...} или
+        {'error': ...} для каждого вызова.
+        """
+        pack = MsgPack(
+            type=PackType.REQUEST_BATCH,
+            source=self.node_id,
+            dst=dst or self.target_node,
+            data={'calls': list(calls)},
+        )
+        return self._send_and_wait(pack, timeout, f"batch of {len(calls)}")
+
+    def _send_and_wait(self, pack: MsgPack, timeout: int, what: str):
         if not self._connected and not self._reconnecting:
             raise ConnectionError("Not connected to node")
 
         if self._reconnecting:
             raise ConnectionError("Reconnecting to node...")
 
-        target = dst or self.target_node
-
-        label = str(uuid.uuid4())
+        label = pack.label
         event = threading.Event()
 
         with self._lock:
             self._pending[label] = event
 
-        pack = MsgPack(
-            type=PackType.REQUEST,
-            source=self.node_id,
-            dst=target,
-            service=service,
-            method=method,
-            data=data,
-            label=label,
-        )
-
         asyncio.run_coroutine_threadsafe(
             self._ws.send(pack.model_dump_json()),
             self._loop,
@@ -221,7 +258,7 @@ class NodeRPC:
         if not event.wait(timeout=timeout):
             with self._lock:
                 self._pending.pop(label, None)
-            raise TimeoutError(f"RPC timeout: {service}.{method}")
+            raise TimeoutError(f"RPC timeout: {what}")
 
         with self._lock:
             self._pending.pop(label, None)
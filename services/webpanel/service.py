@@ -11,7 +11,7 @@ from pathlib import Path
 import psutil
 
 from src.internal_modules.base import ModuleGeneric
-from services.rpc import rpc
+from services.rpc import not_modified, rpc
 import streamlit.web.cli as stcli
 
 log = logging.getLogger('WebPanel')
@@ -117,17 +117,25 @@ class WebPanel(ModuleGeneric):
     #  RPC методы для Streamlit UI
     # ------------------------------------------------------------------ #
 
-    @rpc
+    @rpc(cache_ttl=1)
     def node_status(self, data: dict):
-        """Полное состояние узла — для главной страницы."""
+        """
+        Полное состояние узла — для главной страницы.
+        {'if_version': v} — not_modified, если соседи и сервисы не менялись.
+        """
         nt = self.ctx.network.neighbor_table
         nm = self.ctx.network.nodes_manager
+        version = f'{nt.version}.{self.ctx.services.version}'
+        reply = not_modified(data, version)
+        if reply:
+            return reply
         return {
+            'version': version,
             'node_id': self.ctx.NODE,
             'host': self.ctx.config.network.host,
             'port': self.ctx.config.network.port,
-            'connected': [n.model_dump() for n in nt.connected()],
-            'known': [n.model_dump() for n in nt.known()],
+            'connected': [nt.stable(n) for n in nt.connected()],
+            'known': [nt.stable(n) for n in nt.known()],
             'all_services': list(self.ctx.services.services.keys()),
             'connected_count': len(nt.connected()),
             'known_count': len(nt.known()),
@@ -57,6 +57,20 @@ class RPCProxy:
             dst = None
         return self._rpc.call(service, method, data, dst=dst, timeout=timeout)
 
+    def call_versioned(self, service: str, method: str, data=None, timeout: int = 10):
+        """call с if_version: неизменившийся ответ узла не передаётся заново."""
+        dst = st.session_state.get('selected_node')
+        if dst == self._rpc.node:
+            dst = None
+        return self._rpc.call_versioned(service, method, data, dst=dst, timeout=timeout)
+
+    def call_batch(self, calls: list[dict], timeout: int = 10) -> list[dict]:
+        """Несколько вызовов к выбранному узлу за один round trip."""
+        dst = st.session_state.get('selected_node')
+        if dst == self._rpc.node:
+            dst = None
+        return self._rpc.call_batch(calls, dst=dst, timeout=timeout)
+
     @property
     def connected(self):
         return self._rpc.connected
@@ -90,7 +104,7 @@ with st.sidebar:
 
     # ---- Выбор узла ----
     try:
-        status = rpc.call('webpanel', 'node_status')
+        status = rpc.call_versioned('webpanel', 'node_status')
         connected_nodes = [n.get('node_id', '?') for n in status.get('connected', [])]
         known_nodes = [n.get('node_id', '?') for n in status.get('known', [])]
         all_nodes = [local_node] + \
@@ -9,7 +9,7 @@ def render(rpc):
     is_local = getattr(rpc, 'local_node', '?') == selected_node
 
     try:
-        status = rpc.call('webpanel', 'node_status')
+        status = rpc.call_versioned('webpanel', 'node_status')
     except Exception as e:
         st.error(f"Ошибка получения данных: {e}")
         return
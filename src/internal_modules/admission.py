@@ -0,0 +1,152 @@
+# GRID/admission.py — ограничение одновременных вызовов сервисов и методов
+#
+# Gate — не больше limit вызовов одновременно и не больше queue ждущих
+# своей очереди. Полная очередь — Overloaded сразу, с подсказкой retry_after
+# (сколько примерно ждать освобождения места), а не ожидание до таймаута.
+#
+# Лимиты: @rpc(limit=, queue=) на методе и admission.limits в config.yaml
+# по ключу 'service' или 'service.method' (конфиг важнее декоратора).
+# Вызов проходит gate метода, затем gate сервиса.
+
+import asyncio
+import time
+from collections import deque
+
+from src.internal_modules.base import ModuleGeneric
+from src.internal_modules.exceptions import Overloaded, RPCTimeout
+from services.rpc import rpc
+
+_HOLD_ALPHA   = 0.2    # вес нового замера в EWMA времени выполнения
+_DEFAULT_HOLD = 0.1    # оценка выполнения, пока замеров нет
+_WAIT_WINDOW  = 256    # последних ожиданий в очереди для статистики
+
+
+class Gate:
+    def __init__(self, name: str, limit: int, queue: int):
+        self.name  = name
+        self.limit = max(1, limit)
+        self.queue = max(0, queue)
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.expired  = 0          # deadline истёк в очереди
+        self.hold: float | None = None   # EWMA времени выполнения (сек)
+        self.waits: deque = deque(maxlen=_WAIT_WINDOW)
+
+    def retry_after(self) -> float:
+        """Через сколько секунд в очереди, вероятно, освободится место."""
+        hold = self.hold if self.hold is not None else _DEFAULT_HOLD
+        return hold * (len(self._waiters) + 1) / self.limit
+
+    async def acquire(self, remaining: float | None = None):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.queue:
+            self.rejected += 1
+            raise Overloaded(self.name, self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        queued_at = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, remaining)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # место уже передано нам — отдать следующему
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.expired += 1
+                raise RPCTimeout(f'{self.name} queue', remaining)
+            raise
+        self.waits.append(time.monotonic() - queued_at)
+        self.admitted += 1
+
+    def release(self, held: float | None = None):
+        if held is not None:
+            self.hold = held if self.hold is None else \
+                (1 - _HOLD_ALPHA) * self.hold + _HOLD_ALPHA * held
+        # место переходит первому живому ожидающему, active не меняется
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        waits = self.waits
+        return {
+            'limit':    self.limit,
+            'queue':    self.queue,
+            'active':   self.active,
+            'queued':   len(self._waiters),
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'expired':  self.expired,
+            'hold':     self.hold,
+            'wait_avg': sum(waits) / len(waits) if waits else 0.0,
+            'wait_max': max(waits, default=0.0),
+        }
+
+
+class Admission(ModuleGeneric):
+    def __init__(self, name: str, context):
+        super().__init__(name, context)
+        self._gates: dict[str, Gate] = {}
+        # (service, method, лимит декоратора) → gate'ы вызова
+        self._routes: dict[tuple, tuple[Gate, ...]] = {}
+
+    def gates(self, service: str, method: str, limit: tuple | None = None) -> tuple[Gate, ...]:
+        """Gate'ы вызова service.method: метода, затем сервиса; () — без лимитов."""
+        key = (service, method, limit)
+        gates = self._routes.get(key)
+        if gates is None:
+            limits = self.ctx.config.admission.limits
+            gates = tuple(gate for gate in (
+                self._gate(f'{service}.{method}', limits.get(f'{service}.{method}'), limit),
+                self._gate(service, limits.get(service), None),
+            ) if gate is not None)
+            self._routes[key] = gates
+        return gates
+
+    def _gate(self, name: str, configured, declared: tuple | None) -> Gate | None:
+        if configured is not None:
+            limit, queue = configured.limit, configured.queue
+        elif declared is not None:
+            limit, queue = declared
+        else:
+            return None
+        gate = self._gates.get(name)
+        if gate is None or (gate.limit, gate.queue) != (max(1, limit), max(0, queue)):
+            gate = self._gates[name] = Gate(name, limit, queue)
+        return gate
+
+    async def run(self, gates: tuple[Gate, ...], call, *args, remaining: float | None = None):
+        """Выполнить call(*args), заняв место во всех gates."""
+        deadline = None if remaining is None else time.monotonic() + remaining
+        taken: list[Gate] = []
+        try:
+            for gate in gates:
+                left = None if deadline is None else deadline - time.monotonic()
+                await gate.acquire(left)
+                taken.append(gate)
+            started = time.monotonic()
+            return await call(*args)
+        finally:
+            held = time.monotonic() - started if len(taken) == len(gates) else None
+            for gate in reversed(taken):
+                gate.release(held)
+
+    # ------------------------------------------------------------------ #
+    #  RPC API
+    # ------------------------------------------------------------------ #
+
+    @rpc
+    def stats(self, data: dict):
+        """Gate'ы узла: лимит, занято, в очереди, отклонено."""
+        return {name: gate.stats() for name, gate in self._gates.items()}
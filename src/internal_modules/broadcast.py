@@ -0,0 +1,267 @@
+# GRID/broadcast.py — broadcast-стримы: каждый consumer получает каждый элемент
+#
+# origin → дети в остовном дереве (fanout) → их дети → ...
+# Origin держит только fanout исходящих стримов вместо N: остальных узлов
+# элементы достигают ретрансляцией. Каждое ребро — обычный PipeTransport
+# (STREAM_OPEN/CHUNK/ACK/EOF), узел дерева тиражирует входящий элемент
+# своему consumer'у и своему поддереву (broadcast-Dispatcher с lag-политикой).
+
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Optional
+
+from src.internal_modules.memory import _SENTINEL
+from src.internal_modules.pipeline import STATS_RETENTION
+from src.networking.protocol import MsgPack
+
+log = logging.getLogger('Broadcast')
+
+# ключ в STREAM_OPEN.data со спецификацией broadcast (executor его вырезает)
+BROADCAST_KEY = '_broadcast'
+
+POLICIES = ('block', 'drop')
+
+
+def build_tree(nodes: list[str], fanout: int = 2) -> list[dict]:
+    """
+    k-арное остовное дерево в порядке списка (уровень за уровнем):
+    первые fanout узлов — дети origin'а, следующие — их дети и т.д.
+    Возвращает детей корня: [{'node': str, 'children': [...]}, ...]
+    """
+    fanout = max(1, fanout)
+    entries = [{'node': node, 'children': []} for node in nodes]
+    for index, entry in enumerate(entries[fanout:], start=fanout):
+        entries[(index - fanout) // fanout]['children'].append(entry)
+    return entries[:fanout]
+
+
+def tree_nodes(children: list[dict]) -> list[str]:
+    """Все узлы поддерева (в порядке обхода)."""
+    result = []
+    for child in children:
+        result.append(child['node'])
+        result.extend(tree_nodes(child['children']))
+    return result
+
+
+def open_broadcast(ctx, spec: dict, children: list[dict]):
+    """
+    Открыть стримы с текущего узла на детей в дереве.
+    Возвращает broadcast-Dispatcher (или None если детей нет).
+    """
+    if not children:
+        return None
+    pipes = ctx.memory.create_pipes(buff=spec['buff'], count=len(children))
+    dispatcher = ctx.memory.create_dispatcher(
+        pipes, broadcast=True, policy=spec['policy']
+    )
+    for pipe, child in zip(pipes, children):
+        template = MsgPack(
+            source  = ctx.NODE,
+            dst     = child['node'],
+            service = spec['service'],
+            method  = spec['stream'],
+            label   = str(uuid.uuid4()),
+            data    = {
+                'buff': spec['buff'],
+                **spec['data'],
+                BROADCAST_KEY: {**spec, 'children': child['children']},
+            },
+        )
+        ctx.memory.attach_transport(pipe, template, ctx.network.router)
+        log.info(f'[broadcast {spec["id"][:8]}] {ctx.NODE} → {child["node"]} '
+                 f'(subtree {len(tree_nodes(child["children"]))})')
+    return dispatcher
+
+
+@dataclass
+class RelayStats:
+    broadcast_id: str
+    node: str
+    children: list[str] = field(default_factory=list)
+    received: int = 0
+    local_dropped: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+
+class BroadcastRelay:
+    """
+    Узел дерева: входящий стрим → локальный consumer + поддерево.
+    Отставание consumer'а ограничено buff его pipe'а; для поддерева
+    действует policy (block — ждать самого медленного, drop — пропускать).
+    При drop окно входящего стрима ведёт сам relay (acks_inbound): медленный
+    consumer теряет элементы, но не тормозит поддерево.
+    """
+
+    def __init__(self, ctx, spec: dict, inbound):
+        self.spec = spec
+        self._router = ctx.network.router
+        self.inbound = inbound
+        # relay пишет в local до sentinel'а — держит pipe как writer
+        self.local = ctx.memory.create_pipe(buff=spec['buff']).retain()
+        self.stats = RelayStats(broadcast_id=spec['id'], node=ctx.NODE,
+                                children=[c['node'] for c in spec['children']])
+        self._dispatcher = open_broadcast(ctx, spec, spec['children'])
+        # consumer вышел (ошибка / break) — в local больше не пишем
+        self._consumer_gone = False
+        self.acks_inbound = spec['policy'] == 'drop'
+        self._task = asyncio.create_task(self._relay())
+
+    async def consumer_done(self):
+        """
+        Локальный consumer закончил (ждёт конца ретрансляции). Если раньше EOF —
+        local закрывается и очищается, а ACK входящему стриму шлёт сам relay:
+        поддерево получает поток и без consumer'а, relay не ждёт места в
+        local (policy='block').
+        """
+        if not self._task.done() and not self._consumer_gone:
+            self._consumer_gone = True
+            self.local.close()
+            self.stats.local_dropped += self.local.clear()
+            if not self.acks_inbound:
+                await self._ack()
+        await asyncio.shield(self._task)
+
+    async def _ack(self):
+        if self.inbound.label:
+            await self._router.send_stream_ack(self.inbound.label, self.spec['buff'])
+
+    async def _relay(self):
+        try:
+            if self.acks_inbound:
+                await self._ack()  # первый запрос порции
+            async for item in self.inbound:
+                self.stats.received += 1
+                if self._dispatcher:
+                    await self._dispatcher.push(item)
+                owns_ack = self.acks_inbound or self._consumer_gone
+                if owns_ack and self.inbound.size < self.spec['buff']:
+                    await self._ack()
+                if self._consumer_gone:
+                    self.stats.local_dropped += 1
+                    continue
+                if self.acks_inbound and self.local.is_full():
+                    self.stats.local_dropped += 1
+                    continue
+                await self.local.put(item)
+        except Exception as e:
+            self.stats.error = str(e)
+            log.error(f'[broadcast {self.spec["id"][:8]}] relay error: {e}')
+        finally:
+            self.stats.finished_at = time.monotonic()
+            if self._dispatcher:
+                if self.stats.error:
+                    self._dispatcher.abort()
+                else:
+                    await self._dispatcher.finish()
+            # consumer дочитает то что успело прийти
+            if not self._consumer_gone:
+                await self.local.put(_SENTINEL)
+                self.local.close()
+            self.local.release()
+
+    def snapshot(self) -> dict:
+        end = self.stats.finished_at or time.monotonic()
+        elapsed = max(end - self.stats.started_at, 1e-6)
+        dropped = {}
+        if self._dispatcher:
+            dropped = {
+                child: self._dispatcher.dropped[pipe_id]
+                for child, pipe_id in zip(self.stats.children, self._dispatcher.pipes)
+            }
+        return {
+            'broadcast_id': self.stats.broadcast_id,
+            'node':         self.stats.node,
+            'children':     self.stats.children,
+            'received':     self.stats.received,
+            'consumed':     self.local.total_got,
+            'local_dropped': self.stats.local_dropped,
+            'dropped':      dropped,
+            'rate':         round(self.stats.received / elapsed, 2),
+            'done':         self.stats.finished_at is not None,
+            'error':        self.stats.error,
+        }
+
+
+def attach_relay(ctx, spec: dict, inbound) -> 'BroadcastRelay':
+    """Executor: ретранслировать входящий broadcast-стрим, consumer читает relay.local."""
+    relay = BroadcastRelay(ctx, spec, inbound)
+    broadcasts = ctx.memory.broadcasts
+    broadcasts[spec['id']] = relay
+
+    def _forget():
+        if broadcasts.get(spec['id']) is relay:
+            del broadcasts[spec['id']]
+
+    # статистика нужна broadcast_status и после конца — relay снимается позже
+    relay._task.add_done_callback(
+        lambda _t: asyncio.get_running_loop().call_later(STATS_RETENTION, _forget))
+    return relay
+
+
+class BroadcastHandle:
+    """Handle broadcast на origin-узле: запуск генератора и статистика по дереву."""
+
+    def __init__(self, ctx, service: str, stream: str, nodes: list[str],
+                 fanout: int = 2, buff: int = 3, policy: str = 'block',
+                 data: Optional[dict] = None):
+        self.ctx = ctx
+        self.broadcast_id = str(uuid.uuid4())
+        self.tree = build_tree(nodes, fanout)
+        self.nodes = nodes
+        self.spec = {
+            'id':      self.broadcast_id,
+            'origin':  ctx.NODE,
+            'service': service,
+            'stream':  stream,
+            'buff':    buff,
+            'policy':  policy,
+            'data':    dict(data or {}),
+        }
+        self.started_at = time.monotonic()
+        self._dispatcher = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, generator):
+        self._dispatcher = open_broadcast(self.ctx, self.spec, self.tree)
+        self._task = self._dispatcher.start(generator)
+        return self
+
+    def on_generator_done(self, cb):
+        """cb(handle) — генератор отработал, упал или отменён."""
+        self._task.add_done_callback(lambda _t: cb(self))
+
+    @property
+    def generated(self) -> int:
+        return self._dispatcher.next_seq if self._dispatcher else 0
+
+    async def stats(self, timeout: int = 5) -> dict:
+        """Собрать статистику ретрансляторов со всех узлов дерева."""
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        members = []
+        for node in self.nodes:
+            try:
+                entry = await self.ctx.network.call(
+                    node, 'spawner', 'broadcast_stats',
+                    {'broadcast_id': self.broadcast_id}, timeout=timeout,
+                )
+            except Exception as e:
+                entry = {'node': node, 'error': str(e)}
+            members.append(entry or {'node': node, 'error': 'not started'})
+        ok = [m for m in members if 'received' in m]
+        return {
+            'broadcast_id': self.broadcast_id,
+            'origin':       self.ctx.NODE,
+            'generated':    self.generated,
+            'rate':         round(self.generated / elapsed, 2),
+            'tree':         self.tree,
+            # узлы, consumer которых получил все элементы без пропусков
+            'complete':     sum(1 for m in ok if m['done']
+                                and m['consumed'] == self.generated),
+            'members':      members,
+        }
@@ -0,0 +1,154 @@
+# GRID/cache.py — кэш результатов @rpc(cache_ttl=...) с объединением вызовов
+#
+# Результат вызова service.method с тем же ключом живёт cache_ttl секунд
+# (TTLCache на метод, не больше cache.max_entries записей). Одновременные
+# вызовы с одним ключом ждут одно выполнение (single-flight); исключения
+# не кэшируются. Ключ — key(data) из декоратора, кортеж полей data или
+# весь data.
+#
+# Общее выполнение идёт без deadline вызывающего: каждый ждёт его не дольше
+# своего остатка времени, и ранний таймаут одного не роняет остальных.
+# Вызывающий получает копию результата — правка её не меняет запись кэша.
+#
+# Кэшируется только на границе RPC (LocalExecutor): прямой вызов метода
+# внутри сервиса всегда выполняет его. После изменения состояния сервис
+# сбрасывает записи через ctx.cache.invalidate().
+
+import asyncio
+import copy
+import json
+import time
+from typing import Any, Awaitable, Callable
+
+from cachetools import TTLCache
+
+from src.internal_modules.base import ModuleGeneric
+from src.internal_modules.exceptions import RPCTimeout
+from services.rpc import rpc
+
+
+def cache_key(key, data) -> Any:
+    """Ключ записи: key(data), кортеж полей data или весь data в каноничном виде."""
+    if callable(key):
+        return key(data)
+    if key is not None:
+        fields = (key,) if isinstance(key, str) else key
+        data = [data.get(field) for field in fields] if isinstance(data, dict) else data
+    return json.dumps(data, sort_keys=True, default=repr)
+
+
+class MethodCache:
+    def __init__(self, ttl: float, max_entries: int):
+        self.entries = TTLCache(max_entries, ttl, timer=time.monotonic)
+        self.inflight: dict[Any, asyncio.Task] = {}
+        # растёт при invalidate: результат, начатый до сброса, не сохраняется
+        self.generation = 0
+        self.hits = self.misses = self.coalesced = self.invalidated = 0
+
+    def stats(self) -> dict:
+        return {
+            'ttl':         self.entries.ttl,
+            'size':        len(self.entries),
+            'inflight':    len(self.inflight),
+            'hits':        self.hits,
+            'misses':      self.misses,
+            'coalesced':   self.coalesced,
+            'invalidated': self.invalidated,
+        }
+
+
+class ResultCache(ModuleGeneric):
+    def __init__(self, name: str, context):
+        super().__init__(name, context)
+        self._methods: dict[tuple[str, str], MethodCache] = {}
+
+    def _method(self, service: str, method: str, ttl: float) -> MethodCache:
+        cache = self._methods.get((service, method))
+        if cache is None or cache.entries.ttl != ttl:
+            cache = MethodCache(ttl, self.ctx.config.cache.max_entries)
+            self._methods[(service, method)] = cache
+        return cache
+
+    async def run(self, service: str, method: str, cache_spec: tuple, data,
+                  call: Callable[[], Awaitable], remaining: float | None = None) -> Any:
+        """
+        Копия результата service.method(data) из кэша, из уже идущего вызова
+        с тем же ключом или от call(). cache_spec = (ttl, key); remaining —
+        сколько этот вызывающий готов ждать (call() выполняется без deadline).
+        """
+        ttl, key = cache_spec
+        cache = self._method(service, method, ttl)
+        entry_key = cache_key(key, data)
+        try:
+            result = cache.entries[entry_key]
+        except KeyError:
+            pass
+        else:
+            cache.hits += 1
+            return copy.deepcopy(result)
+
+        task = cache.inflight.get(entry_key)
+        if task is None:
+            cache.misses += 1
+            task = asyncio.create_task(self._fill(cache, entry_key, call))
+            # все вызывающие могли уйти — исключение не должно остаться незабранным
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            cache.inflight[entry_key] = task
+        else:
+            cache.coalesced += 1
+        # отмена / таймаут одного вызывающего не отменяет выполнение для остальных
+        if remaining is None:
+            result = await asyncio.shield(task)
+        else:
+            try:
+                result = await asyncio.wait_for(asyncio.shield(task), max(remaining, 0))
+            except asyncio.TimeoutError:
+                raise RPCTimeout(f'{service}.{method}', round(remaining, 3)) from None
+        return copy.deepcopy(result)
+
+    @staticmethod
+    async def _fill(cache: MethodCache, entry_key, call: Callable[[], Awaitable]):
+        generation = cache.generation
+        try:
+            result = await call()
+        finally:
+            if cache.inflight.get(entry_key) is asyncio.current_task():
+                del cache.inflight[entry_key]
+        if cache.generation == generation:
+            cache.entries[entry_key] = result
+        return result
+
+    def invalidate(self, service: str, method: str | None = None, data=None, key=None):
+        """
+        Сбросить записи: всего сервиса, метода или (data задан) одну запись.
+        key — тот же, что в @rpc(key=...) метода.
+        """
+        for (svc, name), cache in self._methods.items():
+            if svc != service or (method is not None and name != method):
+                continue
+            cache.invalidated += 1
+            if data is None:
+                cache.generation += 1
+                cache.entries.clear()
+                cache.inflight.clear()
+            else:
+                entry_key = cache_key(key, data)
+                cache.entries.pop(entry_key, None)
+                if cache.inflight.pop(entry_key, None) is not None:
+                    cache.generation += 1
+
+    # ------------------------------------------------------------------ #
+    #  RPC API
+    # ------------------------------------------------------------------ #
+
+    @rpc
+    def stats(self, data: dict):
+        """Кэши методов: ttl, записей, попадания / промахи / объединённые вызовы."""
+        return {f'{service}.{method}': cache.stats()
+                for (service, method), cache in self._methods.items()}
+
+    @rpc
+    def drop(self, data: dict):
+        """Сбросить кэш: {'service', 'method'?}."""
+        self.invalidate(data['service'], data.get('method'))
+        return {'ok': True}
@@ -40,6 +40,10 @@ class CertsIndex:
         self.own_node_id = own_node_id
         self._entries: dict[str, CertEntry] = {}
         self._sync_version: int = 0
+        # версия индекса для if_version (не путать с sync_version CERT_SYNC):
+        # растёт, когда меняется набор записей, их узлы или флаг установки;
+        # с текущего времени в мс — не повторяется после перезапуска
+        self.version: int = int(time.time() * 1000)
 
     # ------------------------------------------------------------------ #
     #  Обновление из CERT_SYNC (от удалённого узла)
@@ -53,6 +57,8 @@ class CertsIndex:
         certs_digest: [{"thumbprint": str, "subject_cn": str, "valid_to": str}, ...]
         """
         now = time.monotonic()
+        before = {tp: (e.subject_cn, e.valid_to) for tp, e in self._entries.items()
+                  if from_node in e.available_on}
 
         # Удалить этот узел из available_on для всех записей
         # (пересоздадим из свежего digest)
@@ -85,6 +91,10 @@ class CertsIndex:
             if from_node not in entry.available_on:
                 entry.available_on.append(from_node)
 
+        after = {tp: (e.subject_cn, e.valid_to) for tp, e in self._entries.items()
+                 if from_node in e.available_on}
+        if after != before:
+            self.version += 1
         self._sync_version = max(self._sync_version, sync_version)
         log.debug(f'Merged CERT_SYNC from {from_node}: {len(certs_digest)} certs')
 
@@ -99,6 +109,7 @@ class CertsIndex:
         """
         now = time.monotonic()
         local_thumbprints = set()
+        before = {tp for tp, e in self._entries.items() if e.installed_locally}
 
         for cert_info in (certs if isinstance(certs, list) else certs.values()):
             if isinstance(cert_info, dict):
@@ -129,6 +140,9 @@ class CertsIndex:
             if entry.installed_locally and tp not in local_thumbprints:
                 entry.installed_locally = False
 
+        if local_thumbprints != before:
+            self.version += 1
+
     # ------------------------------------------------------------------ #
     #  Запросы
     # ------------------------------------------------------------------ #
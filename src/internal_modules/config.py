@@ -19,10 +19,66 @@ _HOSTNAME = socket.gethostname()
 class NetworkConfig(BaseModel):
     host: str = _HOSTNAME
     port: int = 9000
+    shm:         bool = True   # shared-memory канал с узлами на этом же хосте
+    shm_ring_mb: int  = 8      # размер кольца в каждую сторону
+    # очередь отправки соединения: веса rpc / bulk и квант DRR
+    link_weights:    dict[str, int] = {'rpc': 4, 'bulk': 1}
+    link_quantum_kb: int            = 16
+    # RTT соседей (PING/PONG) и адаптивный timeout RPC без явного timeout
+    rtt_interval:     float = 5.0
+    call_timeout:     float = 10.0   # пока нет истории; без adaptive — и нижняя граница
+    call_timeout_min: float = 1.0    # нижняя граница для adaptive-вызовов
+    adaptive_timeout: bool  = True   # timeout по истории / RTT может быть ниже call_timeout
+    # медленные, но живые сервисы / методы ('service' или 'service.method'):
+    # без явного timeout их вызовы не ждут меньше call_timeout
+    adaptive_exempt:  list[str] = ['spawner', 'certstool']
+    call_timeout_max: float = 120.0
+    timeout_factor:   float = 4.0    # × p95 длительности / RTT
+    # call_service: повторы на других репликах и дублирование медленных вызовов
+    call_retries: int   = 2
+    hedge:        bool  = False
+    hedge_delay:  float = 0.5        # пока нет истории ответов реплики
 
 
 class MemoryConfig(BaseModel):
-    default_buff: int = 10
+    default_buff:     int   = 10
+    spill_dir:        Path  = Path('spill')   # сегменты переполнения pipe'ов
+    spill_segment_mb: int   = 64
+    budget_mb:        int   = 0      # бюджет памяти pipe'ов узла, 0 — без лимита
+    budget_high:      float = 0.8    # выше — окна стримов сужаются
+    budget_refuse:    float = 0.95   # выше — новые стримы отклоняются
+    pool_size:        int   = 16     # буферов освобождённых pipe'ов на каждый buff
+
+
+class JobsConfig(BaseModel):
+    db_path:             Path  = Path('jobs.sqlite')
+    checkpoint_interval: float = 5.0   # секунды между записью позиций в SQLite
+    speculate:           bool  = False # спекулятивно доисполнять хвост задачи
+    speculate_copies:    int   = 1     # макс. копий одного элемента
+
+
+class FilesConfig(BaseModel):
+    root: Path = Path('data')   # files.read читает только отсюда
+
+
+class WorkersConfig(BaseModel):
+    # пулы для @rpc(executor=...): имя → число worker'ов, 0 — по числу CPU
+    pools: dict[str, int] = {'thread': 8, 'process': 0}
+
+
+class LimitConfig(BaseModel):
+    limit: int = 4    # вызовов выполняется одновременно
+    queue: int = 32   # ждут места; сверх — Overloaded сразу
+
+
+class AdmissionConfig(BaseModel):
+    # лимиты вызовов: 'service' или 'service.method' → LimitConfig,
+    # важнее @rpc(limit=, queue=); без записи — без ограничений
+    limits: dict[str, LimitConfig] = {'certstool': LimitConfig(limit=4, queue=64)}
+
+
+class CacheConfig(BaseModel):
+    max_entries: int = 256   # записей в кэше одного метода (@rpc(cache_ttl=...))
 
 
 class LoggingConfig(BaseModel):
@@ -50,6 +106,11 @@ class Config(BaseModel):
     node:     str            = 'Node0'
     network:  NetworkConfig  = NetworkConfig()
     memory:   MemoryConfig   = MemoryConfig()
+    jobs:     JobsConfig     = JobsConfig()
+    files:    FilesConfig    = FilesConfig()
+    workers:  WorkersConfig  = WorkersConfig()
+    admission: AdmissionConfig = AdmissionConfig()
+    cache:    CacheConfig    = CacheConfig()
     logging:  LoggingConfig  = LoggingConfig()
     services: ServicesConfig = ServicesConfig()
     local:    LocalConfig    = LocalConfig()
@@ -72,9 +133,56 @@ node: Node0
 network:
   host: 0.0.0.0
   port: 9000
+  shm: true
+  shm_ring_mb: 8
+  link_weights:
+    rpc: 4
+    bulk: 1
+  link_quantum_kb: 16
+  rtt_interval: 5
+  call_timeout: 10
+  call_timeout_min: 1
+  adaptive_timeout: true
+  adaptive_exempt:
+    - spawner
+    - certstool
+  call_timeout_max: 120
+  timeout_factor: 4
+  call_retries: 2
+  hedge: false
+  hedge_delay: 0.5
 
 memory:
   default_buff: 10
+  spill_dir: spill/
+  spill_segment_mb: 64
+  budget_mb: 0
+  budget_high: 0.8
+  budget_refuse: 0.95
+  pool_size: 16
+
+jobs:
+  db_path: jobs.sqlite
+  checkpoint_interval: 5
+  speculate: false
+  speculate_copies: 1
+
+files:
+  root: data/
+
+workers:
+  pools:
+    thread: 8
+    process: 0
+
+admission:
+  limits:
+    certstool:
+      limit: 4
+      queue: 64
+
+cache:
+  max_entries: 256
 
 logging:
   level: DEBUG
@@ -11,6 +11,10 @@ if TYPE_CHECKING:
     from memory import MemoryModule
     from src.networking.network import NetworkModule
     from spawner import Spawner
+    from jobs import JobRegistry
+    from workers import Workers
+    from admission import Admission
+    from cache import ResultCache
 
 
 class AppContext:
@@ -28,6 +32,10 @@ class AppContext:
         self.network: NetworkModule | None = None
         self.memory: MemoryModule | None = None
         self.spawn: Spawner | None =  None
+        self.jobs: JobRegistry | None = None
+        self.workers: Workers | None = None
+        self.admission: Admission | None = None
+        self.cache: ResultCache | None = None
 
     def register(self, module: ModuleGeneric):
         """Регистрация в порядке вызова = порядок startup."""
@@ -1,4 +1,7 @@
 # Исключения
+import re
+
+
 class MethodNotFound(Exception):
     def __init__(self, service, method):
         super().__init__(f'Method not found: {service}.{method}')
@@ -16,3 +19,32 @@ class RPCTimeout(Exception):
 
 class NoRouteToHost(Exception):
     def __init__(self, node): super().__init__(f'no route to {node}')
+
+
+class MemoryBudgetExceeded(Exception):
+    def __init__(self, used, limit):
+        super().__init__(f'memory budget exceeded: {used}/{limit} bytes — stream refused')
+
+
+class NoReplica(Exception):
+    def __init__(self, service):
+        super().__init__(f'no reachable replica of service {service}')
+
+
+class Overloaded(Exception):
+    """Очередь сервиса/метода полна: запрос отклонён сразу, без выполнения."""
+    def __init__(self, target, retry_after: float):
+        self.target = target
+        self.retry_after = retry_after
+        super().__init__(f'overloaded: {target}, retry after {retry_after:.3f}s')
+
+
+_OVERLOADED = re.compile(r'overloaded: (\S+), retry after ([0-9.]+)s')
+
+
+def remote_error(text: str) -> Exception:
+    """Исключение из текста ERROR: Overloaded восстанавливается с retry_after."""
+    match = _OVERLOADED.fullmatch(text or '')
+    if match:
+        return Overloaded(match.group(1), float(match.group(2)))
+    return Exception(text)
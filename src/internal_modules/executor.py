@@ -3,11 +3,17 @@
 import asyncio
 import inspect
 import logging
+import time
 from typing import Callable, AsyncGenerator
 
-from  src.internal_modules.exceptions import MethodNotFound
+from  src.internal_modules.exceptions import MemoryBudgetExceeded, MethodNotFound
 from src.networking.protocol import MsgPack, PackType
-from  src.internal_modules.memory import Pipe
+from  src.internal_modules.memory import Pipe, _SENTINEL
+from src.internal_modules.pipeline import PIPELINE_KEY, attach_stage, open_input
+from src.internal_modules.broadcast import BROADCAST_KEY, attach_relay
+from src.internal_modules.jobs import SPECULATE_KEY
+from services.manager import ASYNC, ASYNC_GEN, Invoker
+from services.rpc import _deadline
 
 log = logging.getLogger('Executor')
 
@@ -21,22 +27,69 @@ class LocalExecutor:
         self.stream_registry = stream_registry
         self._router_ref     = router_ref
 
-    async def execute(self, pack: MsgPack) -> MsgPack | AsyncGenerator:
-        """Обычный RPC вызов."""
-        method: Callable | None = (
-            self.services.get_method(pack.service, pack.method)
-            if pack.method
-            else self.services.get_service(pack.service)
-        )
-        if not method:
-            raise MethodNotFound(pack.service, pack.method)
+    def _resolve(self, service: str, method: str | None) -> Invoker:
+        if method:
+            invoker = self.services.get_invoker(service, method)
+        else:
+            # вызов самого сервиса — редкий путь, без таблицы
+            target = self.services.get_service(service)
+            invoker = Invoker(target) if target else None
+        if invoker is None:
+            raise MethodNotFound(service, method)
+        return invoker
 
-        log.debug(f'execute {pack.service}.{pack.method}')
+    async def invoke(self, service: str, method: str | None, data,
+                     remaining: float | None = None):
+        """
+        Вызвать метод сервиса напрямую, без конвертов MsgPack: сырой результат
+        (async-генератор — не запущенным). remaining — остаток deadline
+        вызывающего, доступен методу через time_left().
+        """
+        invoker = self._resolve(service, method)
+        if invoker.kind == ASYNC_GEN:
+            return invoker.fn(data)
+        deadline = None if remaining is None else time.monotonic() + remaining
+        context = self._router_ref.context if self._router_ref else None
+        # @rpc(cache_ttl=...) — из кэша или из уже идущего вызова с тем же ключом;
+        # общее выполнение — без deadline, каждый вызывающий ждёт в пределах своего
+        if invoker.cache is not None and context is not None:
+            return await context.cache.run(
+                service, method, invoker.cache, data,
+                lambda: self._admit(context, service, method, invoker, data, None),
+                remaining)
+        return await self._admit(context, service, method, invoker, data, deadline)
 
-        if inspect.isasyncgenfunction(method):
-            return method(pack.data)
+    async def _admit(self, context, service: str, method: str | None,
+                     invoker: Invoker, data, deadline: float | None):
+        # лимиты одновременных вызовов: очередь или сразу Overloaded
+        admission = context.admission if context is not None else None
+        gates = admission.gates(service, method, invoker.limit) if admission else ()
+        if gates:
+            return await admission.run(gates, self._run, invoker, data, deadline,
+                                       remaining=None if deadline is None
+                                       else deadline - time.monotonic())
+        return await self._run(invoker, data, deadline)
+
+    async def _run(self, invoker: Invoker, data, deadline: float | None):
+        # @rpc(executor=...) — в пул потоков/процессов, event loop свободен
+        if invoker.policy is not None and self._router_ref:
+            return await self._router_ref.context.workers.run(
+                invoker.policy, invoker.fn, data,
+                None if deadline is None else deadline - time.monotonic())
+
+        token = _deadline.set(deadline)
+        try:
+            if invoker.kind == ASYNC:
+                return await invoker.fn(data)
+            return invoker.fn(data)
+        finally:
+            _deadline.reset(token)
 
-        result = await method(pack.data) if asyncio.iscoroutinefunction(method) else method(pack.data)
+    async def execute(self, pack: MsgPack) -> MsgPack | AsyncGenerator:
+        """Обычный RPC вызов."""
+        result = await self.invoke(pack.service, pack.method, pack.data, pack.remaining())
+        if inspect.isasyncgen(result):
+            return result
 
         return MsgPack(
             type=PackType.RESPONSE,
@@ -48,32 +101,114 @@ class LocalExecutor:
             data=result,
         )
 
+    async def execute_batch(self, pack: MsgPack) -> MsgPack:
+        """
+        REQUEST_BATCH: вызовы data['calls'] ([{'service', 'method', 'data'}])
+        выполняются конкурентно; ответ — список в том же порядке,
+        {'result': ...} или {'error': ...} на каждый вызов.
+        """
+        calls = (pack.data or {}).get('calls', []) if isinstance(pack.data, dict) else []
+        remaining = pack.remaining()
+
+        async def run(call: dict) -> dict:
+            sub = MsgPack(
+                source   = pack.source,
+                dst      = pack.dst,
+                service  = call.get('service'),
+                method   = call.get('method'),
+                data     = call.get('data'),
+                label    = pack.label,
+                deadline = remaining,
+            )
+            try:
+                result = await self.execute(sub)
+            except Exception as e:
+                return {'error': str(e) or type(e).__name__}
+            if inspect.isasyncgen(result):
+                await result.aclose()
+                return {'error': f'{sub.service}.{sub.method} is a stream, not allowed in batch'}
+            return {'result': result.data}
+
+        results = await asyncio.gather(*(run(call) for call in calls))
+        return MsgPack(
+            type=PackType.RESPONSE,
+            source=pack.dst,
+            dst=pack.source,
+            label=pack.label,
+            data=list(results),
+        )
+
     # GRID/executor.py — open_stream передаёт ws и label в ctx
 
-    async def open_stream(self, pack: MsgPack) -> MsgPack:
-        service_obj = self.services.get_service(pack.service)
-        if not service_obj:
-            raise MethodNotFound(pack.service, pack.method)
+    def _stream_handler(self, service: str, stream: str) -> tuple:
+        """(Invoker wrapper'а | None, consumer) для stream сервиса или MethodNotFound."""
+        handler = self.services.get_stream(service, stream)
+        if handler is None:
+            if not self.services.get_service(service):
+                raise MethodNotFound(service, stream)
+            raise MethodNotFound(service, f'stream:{stream}')
+        return handler
 
-        from services.rpc import get_stream_handlers
-        handlers = get_stream_handlers(service_obj)
-        handler = handlers.get(pack.method)
+    async def open_stream(self, pack: MsgPack) -> MsgPack:
+        try:
+            wrapper, consumer = self._stream_handler(pack.service, pack.method)
+        except MethodNotFound:
+            # STREAM_OPEN к async-генератору @rpc: вызывающий — consumer
+            invoker = self.services.get_invoker(pack.service, pack.method)
+            if invoker is None or invoker.kind != ASYNC_GEN:
+                raise
+            return self.open_generator(pack, invoker.fn)
 
-        if not handler or 'consumer' not in handler:
-            raise MethodNotFound(pack.service, f'stream:{pack.method}')
+        # спецификации pipeline / broadcast — служебные, в wrapper не передаются
+        data = pack.data
+        pipeline = broadcast = None
+        speculative = False
+        if isinstance(data, dict) and (PIPELINE_KEY in data or BROADCAST_KEY in data
+                                       or SPECULATE_KEY in data):
+            data = dict(data)
+            pipeline = data.pop(PIPELINE_KEY, None)
+            broadcast = data.pop(BROADCAST_KEY, None)
+            speculative = bool(data.pop(SPECULATE_KEY, False))
 
-        wrapper = handler.get('wrapper')
-        consumer = handler['consumer']
+        # новые стримы не принимаются пока память узла на пределе
+        memory = self._router_ref.context.memory
+        if not memory.budget.admits():
+            memory.budget.refused += 1
+            raise MemoryBudgetExceeded(memory.budget.used, memory.budget.limit)
 
-        pipe = Pipe(pipe_id=f'inbound_{pack.label[:8]}', buff_len=10)
+        pipe = memory.pipe_from_stream(pack.label)
         inbound = self.stream_registry.register(pack.label, pipe)
+        label = pack.label
+        # стадия pipeline: стримы всех upstream-узлов читает один consumer
+        # через общий вход; ACK входящим стримам шлёт вход, а не consumer
+        if pipeline:
+            try:
+                stage_input, created = open_input(self._router_ref.context, pipeline,
+                                                  pack.label, pipe)
+            except RuntimeError:
+                self.stream_registry.remove(pack.label)
+                raise
+            inbound.ready.set()
+            if not created:
+                return self._stream_ready(pack)
+            pipe, inbound, label, pipeline = stage_input.pipe, None, None, stage_input
+        # спекулятивная задача: consumer ждёт на пустом pipe → всё взятое
+        # обработано, сообщить генератору (JobRegistry досылает копии простаивающим)
+        if speculative:
+            pipe.set_wait_callback(
+                lambda _pipe_id: asyncio.create_task(self._idle_ack(pack.label, pipe))
+            )
 
         # label для ACK через Router.send_stream_ack()
         asyncio.create_task(
-            self._run_consumer(wrapper, consumer, pipe, pack.data, inbound,
-                               label=pack.label)
+            self._run_consumer(wrapper, consumer, pipe, data, inbound,
+                               label=label, pipeline=pipeline,
+                               broadcast=broadcast)
         )
+        return self._stream_ready(pack)
 
+    @staticmethod
+    def _stream_ready(pack: MsgPack) -> MsgPack:
         return MsgPack(
             type=PackType.STREAM_READY,
             source=pack.dst,
@@ -82,19 +217,152 @@ class LocalExecutor:
             data='ready',
         )
 
+    def open_generator(self, pack: MsgPack, method: Callable) -> MsgPack:
+        """
+        Запустить async-генератор @rpc как исходящий стрим с кредитным окном
+        (GeneratorTransport). STREAM_READY несёт путь STREAM_OPEN — по нему
+        вызывающий шлёт ACK обратно через mesh.
+        """
+        router = self._router_ref
+        reply = MsgPack(
+            type=PackType.STREAM_CHUNK,
+            source=router.context.NODE,
+            dst=pack.source,
+            label=pack.label,
+            path=list(pack.path),
+        )
+        router.context.memory.attach_generator(method(pack.data), reply, router)
+        return MsgPack(
+            type=PackType.STREAM_READY,
+            source=pack.dst,
+            dst=pack.source,
+            label=pack.label,
+            data={'path': list(pack.path)},
+        )
+
+    def open_local_generator(self, service: str, method: str, data,
+                             pipe: Pipe) -> asyncio.Task:
+        """
+        Локальный стрим из async-генератора @rpc: задача перекладывает
+        элементы в pipe (с backpressure pipe'а), без пакетов. Исключение
+        генератора уходит в pipe элементом, в конце — sentinel.
+        """
+        invoker = self._resolve(service, method)
+        if invoker.kind != ASYNC_GEN:
+            raise MethodNotFound(service, f'stream:{method}')
+        generator = invoker.fn(data)
+
+        async def pump():
+            try:
+                async for item in generator:
+                    await pipe.put(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error(f'[local stream] {service}.{method} failed: {e!r}')
+                await pipe.put(e)
+            finally:
+                await generator.aclose()
+            await pipe.put(_SENTINEL)
+
+        return asyncio.create_task(pump())
+
+    def start_local_stream(self, service: str, stream: str, data,
+                           pipe: Pipe) -> asyncio.Task:
+        """
+        Запустить локальный consumer над pipe без сети (шард генератора
+        на этом же узле). label=None — consumer не шлёт ACK.
+        """
+        wrapper, consumer = self._stream_handler(service, stream)
+        return asyncio.create_task(
+            self._run_consumer(wrapper, consumer, pipe, data, inbound=None)
+        )
+
     async def _run_consumer(self, wrapper, consumer, pipe, data, inbound,
-                            label=None):
+                            label=None, pipeline=None, broadcast=None):
+        # consumer — владелец pipe'ов которые читает (см. Pipe.retain)
+        held = [pipe.retain()]
+        try:
+            await self._consume(wrapper, consumer, pipe, data, inbound,
+                                label, pipeline, broadcast, held)
+        finally:
+            for owned in held:
+                owned.release()
+
+    async def _consume(self, wrapper, consumer, pipe, data, inbound,
+                       label, pipeline, broadcast, held: list):
         ctx = None
         if wrapper:
-            ctx = await wrapper(data) if asyncio.iscoroutinefunction(wrapper) else wrapper(data)
+            ctx = await wrapper.fn(data) if wrapper.kind == ASYNC else wrapper.fn(data)
+
+        # узел broadcast-дерева: входящий стрим ретранслируется поддереву,
+        # consumer читает локальную копию
+        relay = None
+        if broadcast:
+            relay = attach_relay(self._router_ref.context, broadcast, pipe)
+            pipe = relay.local
+            held.append(pipe.retain())
+            if isinstance(ctx, dict):
+                ctx['broadcast_id'] = broadcast['id']
+
+        # стадия pipeline (pipeline — её StageInput): выход в следующую стадию через ctx['emit']
+        emitter = None
+        if pipeline:
+            emitter = attach_stage(self._router_ref.context, pipeline)
+            if ctx is None:
+                ctx = {}
 
         # пробросить label в ctx для ACK через Router
+        # (broadcast с policy=drop: окно входящего стрима ведёт relay, не consumer)
         if isinstance(ctx, dict):
-            ctx['label'] = label
+            ctx['label'] = None if relay and relay.acks_inbound else label
             ctx['eof'] = False
+            if emitter:
+                ctx['pipeline_id'] = pipeline.spec['id']
+                ctx['stage'] = pipeline.spec['stage']
+                ctx['emit'] = None if emitter.last else emitter.emit
 
-        inbound.ready.set()
+        if inbound:
+            inbound.ready.set()
+        error = None
         try:
             await consumer(pipe, ctx)
         except Exception as e:
             log.error(f'consumer error: {e}')
+            error = str(e)
+
+        # поддерево broadcast получает поток и после выхода consumer'а:
+        # финальный ACK (он останавливает отправителя) — только после EOF
+        if relay:
+            await relay.consumer_done()
+        if emitter:
+            if error is None:
+                await emitter.finish()
+            else:
+                await emitter.abort(error)
+        await self._final_ack(label, pipe, error=error)
+
+    async def _idle_ack(self, label: str, pipe: Pipe):
+        """ACK с точным прогрессом, когда consumer простаивает на пустом pipe."""
+        if not self._router_ref or pipe.total_got == 0:
+            return
+        progress = {'received': pipe.total_put, 'completed': pipe.total_got}
+        try:
+            await self._router_ref.send_stream_ack(label, 0, progress)
+        except Exception as e:
+            log.debug(f'idle ACK {label[:8]} failed: {e}')
+
+    async def _final_ack(self, label, pipe: Pipe, error: str | None = None):
+        """Финальный ACK генератору: сколько элементов consumer обработал."""
+        if not label or not self._router_ref:
+            return
+        progress = {
+            'received':  pipe.total_put,
+            'completed': pipe.total_got if error is None else max(pipe.total_got - 1, 0),
+            'done':      True,
+            'error':     error,
+        }
+        try:
+            await self._router_ref.send_stream_ack(label, 0, progress, final=True)
+        except Exception as e:
+            log.warning(f'final ACK {label[:8]} failed: {e}')
@@ -0,0 +1,143 @@
+# GRID/filesource.py — записи большого локального файла через mmap
+#
+# Файл не загружается в память: FileSource отображает его через mmap и отдаёт
+# записи как memoryview-срезы отображения (без копирования). Шард (формат
+# shard_range) выбирает только свою часть файла — каждый worker читает свой
+# диапазон.
+#
+# framing:
+#   line   — строки по '\n'; шард — диапазон байт, строка принадлежит шарду,
+#            в котором начинается (resume-шард {'start': N, 'resume': True} —
+#            с N-й строки)
+#   fixed  — записи по record_size байт; шард — диапазон номеров записей
+#   length — <prefix длина><payload>; шард — диапазон номеров записей
+#            (заголовки просматриваются без чтения payload)
+#   bytes  — срезы по chunk_bytes; шард — диапазон номеров срезов
+
+import logging
+import mmap
+import struct
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, Optional
+
+from services.rpc import shard_range
+
+log = logging.getLogger('FileSource')
+
+FRAMINGS = ('line', 'fixed', 'length', 'bytes')
+
+
+class FileSource:
+    def __init__(self, path: Path, framing: str = 'line', record_size: int = 0,
+                 prefix: str = '<I', chunk_bytes: int = 1 << 20,
+                 keep_newline: bool = False):
+        if framing not in FRAMINGS:
+            raise ValueError(f'unknown framing {framing!r}, expected one of {FRAMINGS}')
+        if framing == 'fixed' and record_size <= 0:
+            raise ValueError('fixed framing requires record_size > 0')
+        self.path = Path(path)
+        self.framing = framing
+        self.record_size = record_size
+        self.prefix = struct.Struct(prefix)
+        self.chunk_bytes = max(1, chunk_bytes)
+        self.keep_newline = keep_newline
+        self._file = open(self.path, 'rb')
+        self.size = self.path.stat().st_size
+        # пустой файл нельзя отобразить
+        self._mm: Optional[mmap.mmap] = None
+        self._view: Optional[memoryview] = None
+        if self.size:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mm)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        # выданные memoryview держат отображение: тогда его освободит GC
+        # после того как consumer их отпустит
+        try:
+            if self._view is not None:
+                self._view.release()
+            if self._mm is not None:
+                self._mm.close()
+        except BufferError:
+            log.debug(f'{self.path.name}: views still alive, mmap left to GC')
+        self._file.close()
+
+    # ------------------------------------------------------------------ #
+    #  Размер в записях (для шардирования и describe)
+    # ------------------------------------------------------------------ #
+
+    def count(self) -> Optional[int]:
+        """Число записей; для line — None (потребовало бы чтения всего файла)."""
+        if self.framing == 'fixed':
+            return self.size // self.record_size
+        if self.framing == 'bytes':
+            return -(-self.size // self.chunk_bytes)
+        if self.framing == 'length':
+            return sum(1 for _ in self._length_offsets())
+        return None
+
+    # ------------------------------------------------------------------ #
+    #  Записи
+    # ------------------------------------------------------------------ #
+
+    def records(self, shard: Optional[dict] = None) -> Iterator[memoryview]:
+        if not self.size:
+            return
+        data = {'shard': shard} if shard else {}
+        if self.framing == 'line':
+            if shard and shard.get('resume'):
+                # resume задачи: start — номер строки, а не смещение в байтах
+                yield from islice(self._lines(range(self.size)), shard.get('start', 0), None)
+            else:
+                yield from self._lines(shard_range(data, self.size))
+        elif self.framing == 'fixed':
+            size = self.record_size
+            for index in shard_range(data, self.count()):
+                yield self._view[index * size:(index + 1) * size]
+        elif self.framing == 'bytes':
+            size = self.chunk_bytes
+            for index in shard_range(data, self.count()):
+                yield self._view[index * size:min((index + 1) * size, self.size)]
+        else:
+            yield from self._lengths(data)
+
+    def _lines(self, span: range) -> Iterator[memoryview]:
+        mm, pos = self._mm, span.start
+        # строка, начатая в предыдущем шарде, — его
+        if pos > 0 and mm[pos - 1] != 0x0A:
+            newline = mm.find(b'\n', pos)
+            pos = self.size if newline < 0 else newline + 1
+        while pos < span.stop:
+            newline = mm.find(b'\n', pos)
+            end = self.size if newline < 0 else newline
+            stop = end + 1 if self.keep_newline and newline >= 0 else end
+            yield self._view[pos:stop]
+            pos = end + 1
+
+    def _length_offsets(self) -> Iterator[tuple[int, int]]:
+        """(offset payload, длина) каждой записи — только по заголовкам."""
+        header, pos = self.prefix.size, 0
+        while pos + header <= self.size:
+            (length,) = self.prefix.unpack_from(self._mm, pos)
+            if pos + header + length > self.size:
+                log.warning(f'{self.path.name}: truncated record at offset {pos}')
+                return
+            yield pos + header, length
+            pos += header + length
+
+    def _lengths(self, data: dict) -> Iterator[memoryview]:
+        span = shard_range(data, self.count()) if data else None
+        for index, (offset, length) in enumerate(self._length_offsets()):
+            if span is not None:
+                if index < span.start:
+                    continue
+                if index >= span.stop:
+                    return
+            yield self._view[offset:offset + length]
@@ -0,0 +1,553 @@
+# GRID/jobs.py — реестр задач Spawner'а
+#
+# spawn() раньше возвращал labels и забывал задачу. JobRegistry держит
+# каждую задачу: прогресс по worker'ам (sent / acked / completed / bytes),
+# скорость и ETA, а позицию генератора периодически пишет в SQLite.
+#
+# Позиция (checkpoint) — номер первого элемента генератора, который ещё не
+# подтверждён consumer'ом. Всё что ниже — гарантированно обработано, поэтому
+# после рестарта origin'а jobs.resume продолжает с этой позиции
+# (at-least-once: элементы выше позиции могут обработаться повторно).
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Any, Optional
+
+from src.internal_modules.base import ModuleGeneric
+from src.internal_modules.memory import Dispatcher, PipeTransport
+from src.internal_modules.pipeline import STATS_RETENTION
+from services.rpc import rpc
+
+log = logging.getLogger('Jobs')
+
+# ключ STREAM_OPEN: задача спекулятивная — consumer шлёт ACK при простое
+SPECULATE_KEY = '_speculate'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id     TEXT PRIMARY KEY,
+    origin     TEXT NOT NULL,
+    spec       TEXT NOT NULL,
+    status     TEXT NOT NULL,
+    position   INTEGER NOT NULL DEFAULT 0,
+    generated  INTEGER NOT NULL DEFAULT 0,
+    total      INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+# статусы, после которых задача больше не меняется
+_FINAL = ('done', 'failed')
+
+
+class JobWorker:
+    """Один стрим задачи: pipe → PipeTransport → consumer на node."""
+
+    def __init__(self, node: str, pipe, transport: PipeTransport):
+        self.node = node
+        self.pipe = pipe
+        self.transport = transport
+        # seq элементов, отданных в этот pipe и ещё не подтверждённых (по порядку)
+        self.outstanding: deque[int] = deque()
+        # seq спекулятивных копий, досланных этому worker'у
+        self.copies: set[int] = set()
+        self._confirmed = 0
+
+    def settle(self) -> list[int]:
+        """Снять с outstanding элементы, которые consumer уже обработал."""
+        confirmed = []
+        while self._confirmed < self.transport.completed and self.outstanding:
+            confirmed.append(self.outstanding.popleft())
+            self._confirmed += 1
+        return confirmed
+
+    def idle(self, won: set[int]) -> bool:
+        """Стрим открыт, pipe пуст и всё своё (кроме выигранного другими) обработано."""
+        return (self.transport.state == 'streaming' and self.pipe.empty()
+                and all(seq in won for seq in self.outstanding))
+
+    def as_dict(self) -> dict:
+        t = self.transport
+        end = t.finished_at or time.monotonic()
+        elapsed = max(end - t.started_at, 1e-6)
+        rate = t.completed / elapsed
+        backlog = len(self.outstanding)
+        return {
+            'node':      self.node,
+            'label':     t.template.label,
+            'state':     t.state,
+            'sent':      t.sent,
+            'acked':     t.acked,
+            'completed': t.completed,
+            'bytes':     t.sent_bytes,
+            'backlog':   backlog,
+            'copies':    len(self.copies),
+            'rate':      round(rate, 2),
+            'eta':       round(backlog / rate, 1) if rate and backlog else None,
+            'error':     t.error,
+        }
+
+
+class Job:
+    def __init__(self, job_id: str, spec: dict, dispatcher: Dispatcher,
+                 workers: list[JobWorker], start_at: int = 0,
+                 total: Optional[int] = None, speculate: int = 0):
+        self.job_id = job_id
+        self.spec = spec
+        self.dispatcher = dispatcher
+        self.workers = workers
+        self.start_at = start_at
+        self.total = total
+        self.status = 'running'
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self._by_pipe = {w.pipe.pipe_id: w for w in workers}
+
+        # спекулятивное доисполнение: сколько копий одного элемента допускается
+        self.speculate = speculate
+        self._items: dict[int, Any] = {}     # seq → элемент (только при speculate)
+        self._copies: dict[int, int] = {}    # seq → сколько копий разослано
+        self._won: set[int] = set()          # продублированные seq, уже обработанные
+        self._settled = False                # все элементы подтверждены
+        self.spec_stats = {'copies': 0, 'won_by_copy': 0, 'wasted': 0, 'cancelled': 0}
+        dispatcher.set_dispatch_callback(self._on_dispatch)
+
+    def _on_dispatch(self, pipe_id: str, seq: int, item):
+        worker = self._by_pipe.get(pipe_id)
+        if worker:
+            if seq < self.dispatcher.next_seq:
+                # остаток pipe'а отказавшего worker'а передан этому
+                for w in self.workers:
+                    if w is not worker and seq in w.outstanding:
+                        w.outstanding.remove(seq)
+            worker.outstanding.append(seq)
+            if self.speculate:
+                self._items[seq] = item
+
+    @property
+    def generated(self) -> int:
+        return self.dispatcher.next_seq
+
+    @property
+    def completed(self) -> int:
+        done = sum(w.transport.completed for w in self.workers)
+        return self.start_at + done - self.spec_stats['wasted']
+
+    def _settle(self):
+        """Разобрать подтверждения; для продублированных seq — кто успел первым."""
+        for w in self.workers:
+            for seq in w.settle():
+                if seq in self._won:
+                    self.spec_stats['wasted'] += 1
+                    continue
+                if seq in self._copies:
+                    self._won.add(seq)
+                    if seq in w.copies:
+                        self.spec_stats['won_by_copy'] += 1
+                self._items.pop(seq, None)
+
+    def position(self) -> int:
+        """Первый неподтверждённый seq — всё что ниже обработано."""
+        self._settle()
+        pending = [seq for w in self.workers for seq in w.outstanding
+                   if seq not in self._won]
+        return min(pending) if pending else self.generated
+
+    def refresh(self) -> str:
+        """Пересчитать статус по состоянию dispatcher'а и транспортов."""
+        if self.status in _FINAL:
+            return self.status
+        self._settle()
+        # отказавший worker губит задачу только если за ним остались элементы
+        # (то, что лежало в его pipe, dispatcher отдал другим)
+        orphaned = self.dispatcher.orphaned()
+        lost = [w for w in self.workers if w.transport.state == 'failed'
+                and any(seq not in orphaned for seq in w.outstanding)]
+        if self.dispatcher.failed or (lost and not self._settled):
+            self.status = 'failed'
+        elif self._settled or (self.dispatcher.exhausted and all(
+                w.transport.state == 'done'
+                or (w.transport.state == 'failed' and not w.outstanding)
+                for w in self.workers)):
+            self.status = 'done'
+        if self.dispatcher.exhausted and self.total is None:
+            self.total = self.generated
+        if self.status in _FINAL:
+            self.finished_at = time.monotonic()
+        return self.status
+
+    # ------------------------------------------------------------------ #
+    #  Спекулятивное доисполнение отстающих элементов
+    # ------------------------------------------------------------------ #
+
+    async def speculate_loop(self, interval: float = 0.2):
+        """
+        После исчерпания генератора досылать самые старые неподтверждённые
+        элементы отстающих worker'ов на простаивающие. Первый обработавший
+        выигрывает; когда подтверждено всё — стримы проигравших отменяются,
+        остальные закрываются EOF.
+        """
+        while not self.dispatcher.exhausted:
+            if self.dispatcher.failed:
+                return
+            await asyncio.sleep(interval)
+
+        while True:
+            self._settle()
+            pending = sorted(
+                ((seq, w) for w in self.workers for seq in w.outstanding
+                 if seq not in self._won),
+                key=lambda entry: entry[0],
+            )
+            if not pending:
+                break
+            if all(w.transport.state in ('done', 'failed', 'cancelled')
+                   for w in self.workers):
+                # стримы закончились, а подтверждены не все — статус решит refresh()
+                return
+            for idle in (w for w in self.workers if w.idle(self._won)):
+                candidate = next(
+                    (seq for seq, owner in pending
+                     if owner is not idle and seq not in idle.copies
+                     and seq in self._items
+                     and self._copies.get(seq, 0) < self.speculate),
+                    None,
+                )
+                if candidate is None:
+                    break
+                self._copies[candidate] = self._copies.get(candidate, 0) + 1
+                idle.copies.add(candidate)
+                idle.outstanding.append(candidate)
+                self.spec_stats['copies'] += 1
+                await idle.pipe.put(self._items[candidate])
+                log.debug(f'[job {self.job_id[:8]}] speculative #{candidate} '
+                          f'→ {idle.node}')
+            await asyncio.sleep(interval)
+
+        self._settled = True
+        for w in self.workers:
+            if w.transport.state not in ('handshake', 'streaming'):
+                continue
+            if not w.outstanding:
+                await self.dispatcher.close_pipe(w.pipe.pipe_id)
+            else:
+                # всё что у него осталось уже обработано другими — отменить
+                await w.transport.cancel()
+                self.spec_stats['cancelled'] += 1
+        self._items.clear()
+        log.info(f'[job {self.job_id[:8]}] settled, speculation: {self.spec_stats}')
+
+    def as_dict(self, workers: bool = True) -> dict:
+        self.refresh()
+        end = self.finished_at or time.monotonic()
+        elapsed = max(end - self.started_at, 1e-6)
+        done_now = self.completed - self.start_at
+        rate = done_now / elapsed
+        remaining = self.total - self.completed if self.total is not None else None
+        result = {
+            'job_id':    self.job_id,
+            'status':    self.status,
+            'generator': f'{self.spec.get("generator_service")}.{self.spec.get("generator")}',
+            'target':    f'{self.spec.get("service")}.{self.spec.get("method")}',
+            'position':  self.position(),
+            'generated': self.generated,
+            'sent':      sum(w.transport.sent for w in self.workers),
+            'acked':     sum(w.transport.acked for w in self.workers),
+            'completed': self.completed,
+            'bytes':     sum(w.transport.sent_bytes for w in self.workers),
+            'total':     self.total,
+            'elapsed':   round(elapsed, 1),
+            'rate':      round(rate, 2),
+            'eta':       round(remaining / rate, 1) if rate and remaining else None,
+        }
+        if self.speculate:
+            result['speculation'] = dict(self.spec_stats, max_copies=self.speculate)
+        if workers:
+            result['workers'] = [w.as_dict() for w in self.workers]
+        return result
+
+
+class JobRegistry(ModuleGeneric):
+    """
+    Реестр задач на origin-узле + SQLite checkpoint'ы.
+    Живые задачи — в self.jobs; после рестарта незавершённые задачи
+    из SQLite видны как 'interrupted' и поднимаются через jobs.resume.
+    Завершённая задача уходит из self.jobs через STATS_RETENTION после
+    финального checkpoint'а — дальше status / list_jobs отдают строку SQLite.
+    Запись в SQLite — пачкой, одним commit'ом в отдельном потоке, чтение
+    из RPC — тоже в потоке: event loop (маршрутизация, keepalive) не ждёт
+    ни диск, ни lock соединения.
+    """
+
+    def __init__(self, name: str, context):
+        super().__init__(name, context)
+        cfg = context.config.jobs
+        self.db_path = Path(cfg.db_path)
+        self.interval = cfg.checkpoint_interval
+        self.default_speculate = cfg.speculate
+        self.default_copies = cfg.speculate_copies
+        self.jobs: dict[str, Job] = {}
+        # задачи, финальный checkpoint которых уже записан
+        self._saved_final: set[str] = set()
+        self._db: Optional[sqlite3.Connection] = None
+        # соединение общее для потока записи и чтений из RPC
+        self._db_lock = threading.Lock()
+        # запросы (sql, params) в очереди на запись и задача, которая их пишет
+        self._pending: list[tuple[str, tuple]] = []
+        self._writer: Optional[asyncio.Task] = None
+        self._task = None
+
+    async def start(self):
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute(_SCHEMA)
+        cur = self._db.execute(
+            "UPDATE jobs SET status='interrupted', updated_at=? "
+            "WHERE origin=? AND status='running'",
+            (time.time(), self.ctx.NODE),
+        )
+        self._db.commit()
+        if cur.rowcount:
+            self.log.warning(f'{cur.rowcount} job(s) interrupted by restart — '
+                             f'see jobs.list_jobs / jobs.resume')
+        self._task = asyncio.create_task(self._checkpoint_loop())
+        self.log.info(f'Started (db={self.db_path})')
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        if self._writer:
+            await asyncio.gather(self._writer, return_exceptions=True)
+        if self._db:
+            self.checkpoint()
+            with self._db_lock:
+                self._db.close()
+                self._db = None
+        self.log.info('Stopped')
+
+    # ------------------------------------------------------------------ #
+    #  Регистрация задач (вызывает Spawner)
+    # ------------------------------------------------------------------ #
+
+    def speculation(self, spec: dict) -> int:
+        """
+        Сколько спекулятивных копий элемента допускает задача (0 — выключено).
+        spawn(..., speculate=True | False | N), по умолчанию — jobs.speculate.
+        Dispatcher такой задачи создаётся с linger=True.
+        """
+        value = spec.get('speculate', self.default_speculate)
+        if value is True:
+            return self.default_copies
+        return max(0, int(value or 0))
+
+    def track(self, spec: dict, dispatcher: Dispatcher,
+              streams: list[tuple[str, Any, PipeTransport]],
+              job_id: Optional[str] = None, start_at: int = 0) -> Job:
+        """
+        Взять задачу под наблюдение. Вызывать ДО dispatcher.start().
+        streams: [(node_id, pipe, transport), ...]
+        """
+        workers = [JobWorker(node, pipe, t) for node, pipe, t in streams]
+        job = Job(job_id or str(uuid.uuid4()), spec, dispatcher, workers,
+                  start_at=start_at, total=spec.get('total'),
+                  speculate=self.speculation(spec) if dispatcher.linger else 0)
+        self.jobs[job.job_id] = job
+        self._saved_final.discard(job.job_id)  # resume под тем же job_id
+        if job.speculate:
+            asyncio.create_task(job.speculate_loop())
+        self._queue(self._row(job, created=job_id is None))
+        self.log.info(f'Job {job.job_id[:8]} tracked: {len(workers)} workers'
+                      + (f', resume from #{start_at}' if start_at else ''))
+        return job
+
+    # ------------------------------------------------------------------ #
+    #  SQLite checkpoint'ы
+    # ------------------------------------------------------------------ #
+
+    def _row(self, job: Job, created: bool = False) -> tuple[str, tuple]:
+        """Запрос checkpoint'а задачи (состояние снимается сейчас, на loop'е)."""
+        now = time.time()
+        status = job.refresh()
+        if created:
+            return (
+                'INSERT OR REPLACE INTO jobs (job_id, origin, spec, status, position, '
+                'generated, total, created_at, updated_at) VALUES (?,?,?,?,?,?,?,?,?)',
+                (job.job_id, self.ctx.NODE, json.dumps(job.spec, default=str), status,
+                 job.position(), job.generated, job.total, now, now),
+            )
+        return (
+            'UPDATE jobs SET status=?, position=?, generated=?, total=?, '
+            'updated_at=? WHERE job_id=?',
+            (status, job.position(), job.generated, job.total, now, job.job_id),
+        )
+
+    def _write(self, rows: list[tuple[str, tuple]]):
+        """Пачка запросов — одна транзакция (вызывается в потоке)."""
+        with self._db_lock:
+            if not self._db:
+                return
+            try:
+                for sql, params in rows:
+                    self._db.execute(sql, params)
+                self._db.commit()
+            except sqlite3.Error:
+                self._db.rollback()
+                raise
+
+    def _queue(self, row: tuple[str, tuple]):
+        """Поставить запрос в очередь записи; пишет одна задача, по порядку."""
+        self._pending.append(row)
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._flush())
+
+    async def _flush(self):
+        while self._pending:
+            rows, self._pending = self._pending, []
+            try:
+                await asyncio.to_thread(self._write, rows)
+            except sqlite3.Error as e:
+                self.log.error(f'checkpoint of {len(rows)} row(s) failed: {e}')
+
+    def checkpoint(self):
+        """
+        Записать позиции всех живых задач синхронно (остановка модуля):
+        вместе с тем, что ещё ждало в очереди.
+        """
+        rows, self._pending = self._pending, []
+        rows.extend(self._row(job) for job in list(self.jobs.values()))
+        try:
+            self._write(rows)
+        except sqlite3.Error as e:
+            self.log.error(f'checkpoint failed: {e}')
+
+    async def _checkpoint_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            jobs = [job for job_id, job in list(self.jobs.items())
+                    if job_id not in self._saved_final]
+            if not jobs:
+                continue
+            rows = [self._row(job) for job in jobs]
+            # статус на момент снимка: только он попадёт в SQLite
+            final = [job for job in jobs if job.status in _FINAL]
+            # INSERT новых задач из очереди — раньше их UPDATE
+            if self._writer:
+                await asyncio.shield(self._writer)
+            try:
+                await asyncio.to_thread(self._write, rows)
+            except sqlite3.Error as e:
+                self.log.error(f'checkpoint of {len(rows)} job(s) failed: {e}')
+                continue
+            # финальный checkpoint лёг в SQLite — задачу можно снимать из памяти
+            for job in final:
+                self._saved_final.add(job.job_id)
+                self.log.info(f'Job {job.job_id[:8]} {job.status}: '
+                              f'{job.completed} items')
+                # живой прогресс по worker'ам нужен status ещё какое-то время
+                asyncio.get_running_loop().call_later(
+                    STATS_RETENTION, self._forget, job)
+
+    def _forget(self, job: Job):
+        """Снять завершённую задачу (dispatcher, pipes, transports) из памяти."""
+        if self.jobs.get(job.job_id) is job:
+            del self.jobs[job.job_id]
+            self._saved_final.discard(job.job_id)
+
+    def _stored(self, job_id: Optional[str] = None) -> list[dict]:
+        """Строки SQLite (вызывается в потоке: lock держит и запись пачки)."""
+        with self._db_lock:
+            if not self._db:
+                return []
+            if job_id:
+                rows = self._db.execute(
+                    'SELECT * FROM jobs WHERE job_id=?', (job_id,)).fetchall()
+            else:
+                rows = self._db.execute(
+                    'SELECT * FROM jobs WHERE origin=? ORDER BY created_at',
+                    (self.ctx.NODE,)).fetchall()
+        result = []
+        for row in rows:
+            entry = dict(row)
+            entry['spec'] = json.loads(entry['spec'])
+            result.append(entry)
+        return result
+
+    # ------------------------------------------------------------------ #
+    #  RPC
+    # ------------------------------------------------------------------ #
+
+    @rpc
+    async def list_jobs(self, data: dict):
+        """Все задачи этого origin: живые — с прогрессом, остальные — из SQLite."""
+        result = [job.as_dict(workers=False) for job in self.jobs.values()]
+        for row in await asyncio.to_thread(self._stored):
+            if row['job_id'] in self.jobs:
+                continue
+            result.append({
+                'job_id':    row['job_id'],
+                'status':    row['status'],
+                'generator': f'{row["spec"].get("generator_service")}.'
+                             f'{row["spec"].get("generator")}',
+                'target':    f'{row["spec"].get("service")}.{row["spec"].get("method")}',
+                'position':  row['position'],
+                'generated': row['generated'],
+                'total':     row['total'],
+            })
+        return result
+
+    @rpc
+    async def status(self, data: dict):
+        """Прогресс задачи по worker'ам: sent / acked / completed / bytes / rate / ETA."""
+        job_id = data.get('job_id') if isinstance(data, dict) else data
+        job = self.jobs.get(job_id)
+        if job:
+            return job.as_dict()
+        stored = await asyncio.to_thread(self._stored, job_id)
+        if stored:
+            return stored[0]
+        return {'error': f'unknown job: {job_id}'}
+
+    @rpc
+    async def resume(self, data: dict):
+        """Продолжить задачу с последнего checkpoint'а (после рестарта origin)."""
+        job_id = data.get('job_id') if isinstance(data, dict) else data
+        live = self.jobs.get(job_id)
+        if live and live.refresh() == 'running':
+            return {'error': f'job {job_id} is still running'}
+
+        stored = await asyncio.to_thread(self._stored, job_id)
+        if not stored:
+            return {'error': f'unknown job: {job_id}'}
+        row = stored[0]
+        if row['status'] == 'done':
+            return {'error': f'job {job_id} is already done'}
+
+        self.jobs.pop(job_id, None)
+        self.log.info(f'Resuming job {job_id[:8]} from #{row["position"]}')
+        return await self.ctx.spawn.spawn({
+            **row['spec'],
+            'job_id':   job_id,
+            'start_at': row['position'],
+        })
+
+    @rpc
+    async def forget(self, data: dict):
+        """Удалить завершённую/прерванную задачу из реестра и SQLite."""
+        job_id = data.get('job_id') if isinstance(data, dict) else data
+        live = self.jobs.get(job_id)
+        if live and live.refresh() == 'running':
+            return {'error': f'job {job_id} is still running'}
+        self.jobs.pop(job_id, None)
+        self._saved_final.discard(job_id)
+        if self._db:
+            self._queue(('DELETE FROM jobs WHERE job_id=?', (job_id,)))
+            await asyncio.shield(self._writer)
+        return {'status': 'forgotten', 'job_id': job_id}
@@ -2,57 +2,422 @@
 
 import asyncio
 import logging
+import sys
+import time
+from collections import deque
+from pathlib import Path
 from typing import Callable, Dict, Optional
 
 from src.internal_modules.base import ModuleGeneric
+from src.internal_modules.spill import SpillFile
 from src.networking.protocol import MsgPack, PackType
+from services.rpc import rpc
 
 log = logging.getLogger('Memory')
 _SENTINEL = object()
 
+# длинные коллекции оцениваются по выборке
+_SAMPLE = 16
+
+
+def estimate_size(item, _depth: int = 0) -> int:
+    """
+    Грубая оценка объёма элемента в байтах (payload, без накладных расходов
+    Python). Нужна для бюджета памяти, а не для точного учёта.
+    """
+    if item is None or item is _SENTINEL:
+        return 0
+    if isinstance(item, (bytes, bytearray, memoryview)):
+        return len(item)
+    if isinstance(item, str):
+        return len(item)
+    if isinstance(item, (bool, int, float)):
+        return 8
+    if _depth < 4 and isinstance(item, (list, tuple, set, dict)):
+        values = list(item.items()) if isinstance(item, dict) else list(item)
+        if not values:
+            return 0
+        sample = values[:_SAMPLE]
+        sampled = sum(estimate_size(v, _depth + 1) for v in sample)
+        return sampled * len(values) // len(sample)
+    return sys.getsizeof(item)
+
+
+class MemoryBudget:
+    """
+    Бюджет памяти узла в байтах для всех pipe'ов (in-memory часть).
+    high   — выше этой доли окна стримов сужаются (до 1 у refuse)
+    refuse — выше этой доли новые стримы отклоняются
+    limit=0 — без ограничения, только учёт.
+    """
+
+    def __init__(self, limit: int = 0, high: float = 0.8, refuse: float = 0.95):
+        self.limit = limit
+        self.high = high
+        self.refuse = refuse
+        self.used = 0
+        self.peak = 0
+        self.refused = 0
+
+    def add(self, delta: int):
+        self.used += delta
+        self.peak = max(self.peak, self.used)
+
+    @property
+    def pressure(self) -> float:
+        return self.used / self.limit if self.limit else 0.0
+
+    def window(self, buff: int) -> int:
+        """Окно стрима (чанков до ACK) с учётом давления на память."""
+        pressure = self.pressure
+        if pressure <= self.high:
+            return buff
+        if pressure >= self.refuse:
+            return 1
+        share = (self.refuse - pressure) / (self.refuse - self.high)
+        return max(1, int(buff * share))
+
+    def admits(self) -> bool:
+        return self.pressure < self.refuse
+
+    def as_dict(self) -> dict:
+        return {
+            'limit':    self.limit,
+            'used':     self.used,
+            'peak':     self.peak,
+            'pressure': round(self.pressure, 3),
+            'high':     self.high,
+            'refuse':   self.refuse,
+            'refused':  self.refused,
+        }
+
+
+class RingBuffer:
+    """
+    Буфер pipe: deque ограниченной ёмкости + очереди ожидающих put/get.
+    Будит одного ожидающего на операцию (в т.ч. на целый батч), а не на элемент.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.items: deque = deque()
+        self.sizes: deque[int] = deque()   # оценка объёма каждого элемента
+        self._getters: deque[asyncio.Future] = deque()
+        self._putters: deque[asyncio.Future] = deque()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def full(self) -> bool:
+        return len(self.items) >= self.capacity
+
+    def free(self) -> int:
+        return max(self.capacity - len(self.items), 0)
+
+    @staticmethod
+    def _wake(waiters: deque):
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    @staticmethod
+    async def _wait(waiters: deque):
+        waiter = asyncio.get_running_loop().create_future()
+        waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # разбуженный, но отменённый — передать очередь следующему
+            if waiter.done() and not waiter.cancelled():
+                RingBuffer._wake(waiters)
+            raise
+
+    async def wait_space(self):
+        while self.full():
+            await self._wait(self._putters)
+
+    async def wait_items(self):
+        while not self.items:
+            await self._wait(self._getters)
+
+    def push(self, item, size: int):
+        self.items.append(item)
+        self.sizes.append(size)
+
+    def pop(self) -> tuple[object, int]:
+        return self.items.popleft(), self.sizes.popleft()
+
+    def readable(self):
+        """Данные появились — разбудить consumer'а (и следующего, если ещё есть)."""
+        self._wake(self._getters)
+
+    def writable(self):
+        """Место освободилось — разбудить producer'а."""
+        self._wake(self._putters)
+
+    def clear(self) -> int:
+        dropped = len(self.items)
+        self.items.clear()
+        self.sizes.clear()
+        self.writable()
+        return dropped
+
+    def reset(self):
+        """
+        Перед возвратом в пул: ожидающих get — отменить (иначе они проснутся
+        на стриме следующего владельца), ожидающих put — разбудить (pipe закрыт).
+        """
+        self.clear()
+        while self._getters:
+            self._getters.popleft().cancel()
+        while self._putters:
+            waiter = self._putters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+
 
 class Pipe:
-    def __init__(self, pipe_id: str, buff_len: int = 10):
+    def __init__(self, pipe_id: str, buff_len: int = 10,
+                 spill: Optional[SpillFile] = None,
+                 ring: Optional[RingBuffer] = None):
         self.pipe_id = pipe_id
         self.buff_len = buff_len
         self.low_watermark = max(1, buff_len // 3)  # may be truncated
-        self._queue = asyncio.Queue(maxsize=buff_len)
+        # ring — буфер из пула MemoryModule (пустой, того же buff_len)
+        self._ring = ring if ring is not None else RingBuffer(buff_len)
         self._closed = False
         self._refill_cb: Optional[Callable[[str], None]] = None
+        self._wait_cb: Optional[Callable[[str], None]] = None
+        # spill-режим: переполнение уходит на диск, put() не блокируется
+        self._spill = spill
+        # учёт байт in-memory буфера (оценка, см. estimate_size)
+        self.bytes = 0
+        self._budget: Optional[MemoryBudget] = None
+        self.label: Optional[str] = None  # label стрима, если pipe сетевой
+        # счётчики пропускной способности (без sentinel)
+        self.total_put = 0
+        self.total_got = 0
+        # владельцы: Dispatcher / PipeTransport / consumer. Последний release()
+        # освобождает pipe (MemoryModule снимает регистрацию, буфер — в пул)
+        self._refs = 0
+        self._release_cb: Optional[Callable[['Pipe'], None]] = None
+
+    def retain(self) -> 'Pipe':
+        self._refs += 1
+        return self
+
+    def release(self):
+        self._refs -= 1
+        if self._refs <= 0 and self._release_cb:
+            cb, self._release_cb = self._release_cb, None
+            cb(self)
+
+    def attach_budget(self, budget: 'MemoryBudget'):
+        self._budget = budget
+        budget.add(self.bytes)
 
-    def set_refill_callback(self, cb: Callable[[str], None]):  # may be truncated
+    def _account(self, size: int):
+        self.bytes += size
+        if self._budget:
+            self._budget.add(size)
+
+    def set_refill_callback(self, cb: Callable[[str], None]):
+        """cb(pipe_id) — размер опустился до low_watermark (только при пересечении)."""
         self._refill_cb = cb
 
+    def _push(self, item):
+        size = estimate_size(item)
+        self._ring.push(item, size)
+        self._account(size)
+
+    def _store(self, item):
+        # порядок: пока на диске что-то есть, новые элементы тоже идут на диск
+        if self._spill is not None and (self._ring.full() or len(self._spill)):
+            self._spill.push(item, sentinel=item is _SENTINEL)
+        else:
+            self._push(item)
+        if item is not _SENTINEL:
+            self.total_put += 1
+
     async def put(self, item):
-        await self._queue.put(item)
+        if self._closed:
+            return  # pipe закрыт/освобождён — писать некуда, не ждём места
+        ring = self._ring
+        if self._spill is None:
+            if ring.full():
+                await ring.wait_space()
+                if self._closed:
+                    return  # pipe закрыт, пока ждали места (worker отказал)
+            size = estimate_size(item)
+            ring.push(item, size)
+            self._account(size)
+            if item is not _SENTINEL:
+                self.total_put += 1
+        else:
+            self._store(item)
+        if ring._getters:
+            ring.readable()
+
+    async def put_many(self, items: list):
+        """Положить пачку по порядку: ждёт места сколько нужно, будит consumer'а один раз на порцию."""
+        if self._closed:
+            return
+        pending = 0
+        for item in items:
+            if self._spill is None and self._ring.full():
+                if pending:
+                    self._ring.readable()
+                    pending = 0
+                await self._ring.wait_space()
+                if self._closed:
+                    return
+            self._store(item)
+            pending += 1
+        if pending:
+            self._ring.readable()
+
+    def _unspill(self):
+        """Дочитать с диска в освободившиеся слоты буфера (по порядку)."""
+        while self._spill is not None and len(self._spill) and not self._ring.full():
+            item, sentinel = self._spill.pop()
+            self._push(_SENTINEL if sentinel else item)
+
+    def set_wait_callback(self, cb: Callable[[str], None]):
+        """cb(pipe_id) — consumer ждёт на пустом pipe (всё взятое обработано)."""
+        self._wait_cb = cb
+
+    def _take(self, limit: int) -> list:
+        """Снять до limit элементов (не дальше sentinel) + уведомления после батча."""
+        before = len(self._ring)
+        items = []
+        while self._ring.items and len(items) < limit:
+            if items and self._ring.items[0] is _SENTINEL:
+                break  # sentinel отдаём отдельным get — после данных
+            item, size = self._ring.pop()
+            self._account(-size)
+            items.append(item)
+            if item is not _SENTINEL:
+                self.total_got += 1
+            else:
+                break
+        self._unspill()
+        if self._ring._putters:
+            self._ring.writable()
+        if self._ring.items and self._ring._getters:
+            self._ring.readable()  # остаток — следующему ожидающему
+        after = len(self._ring)
+        if self._refill_cb and before > self.low_watermark >= after:
+            self._refill_cb(self.pipe_id)
+        return items
+
+    async def _wait_items(self):
+        if not self._ring.items:
+            if self._wait_cb:
+                self._wait_cb(self.pipe_id)
+            await self._ring.wait_items()
 
     async def get(self):
-        item = await self._queue.get()
-        if self._queue.qsize() <= self.low_watermark and self._refill_cb:
+        ring = self._ring
+        if not ring.items:
+            if self._closed and self.empty():
+                return _SENTINEL  # закрыт и пуст — конец стрима, без ожидания
+            await self._wait_items()
+        before = len(ring.items)
+        item, size = ring.pop()
+        self._account(-size)
+        if item is not _SENTINEL:
+            self.total_got += 1
+        if self._spill is not None:
+            self._unspill()
+        if ring._putters:
+            ring.writable()
+        if self._refill_cb and before > self.low_watermark >= len(ring.items):
             self._refill_cb(self.pipe_id)
         return item
 
+    async def get_many(self, limit: int) -> list:
+        """
+        До limit элементов за одно ожидание (минимум один).
+        Пустой список — конец стрима (sentinel).
+        """
+        if self._closed and self.empty():
+            return []
+        await self._wait_items()
+        # sentinel _take отдаёт только отдельно — после всех данных
+        items = self._take(max(1, limit))
+        if items[0] is _SENTINEL:
+            self._on_eof()
+            return []
+        return items
+
     def is_full(self) -> bool:
-        return self._queue.full()
+        # со spill pipe не бывает полным — генератор не останавливается
+        return self._spill is None and self._ring.full()
 
     def empty(self) -> bool:
-        return self._queue.empty()
+        return not self._ring.items and not self.spilled
 
     @property
     def size(self) -> int:
-        return self._queue.qsize()
+        return len(self._ring) + self.spilled
+
+    @property
+    def spilled(self) -> int:
+        return len(self._spill) if self._spill is not None else 0
+
+    def drain(self) -> list:
+        """Снять всё что лежит в буфере и на диске, по порядку (без sentinel)."""
+        items = []
+        while not self.empty():
+            if self._ring.items:
+                item, size = self._ring.pop()
+                self._account(-size)
+            else:
+                item, sentinel = self._spill.pop()
+                item = _SENTINEL if sentinel else item
+            if item is not _SENTINEL:
+                items.append(item)
+        self._ring.writable()
+        return items
+
+    def clear(self) -> int:
+        """Выбросить всё что лежит в буфере (отмена стрима). Возвращает сколько."""
+        dropped = self._spill.clear() if self._spill is not None else 0
+        dropped += self._ring.clear()
+        self._account(-self.bytes)
+        return dropped
+
+    def stats(self) -> dict:
+        return {
+            'pipe_id':   self.pipe_id,
+            'label':     self.label,
+            'buff':      self.buff_len,
+            'size':      self.size,
+            'bytes':     self.bytes,
+            'total_put': self.total_put,
+            'total_got': self.total_got,
+            'closed':    self._closed,
+            'spill':     self._spill.stats() if self._spill is not None else None,
+        }
 
     def close(self):
         self._closed = True
 
+    def _on_eof(self):
+        if self._spill is not None:
+            self._spill.close()
+
     def __aiter__(self):
         return self
 
     async def __anext__(self):
-        if self._closed and self._queue.empty():
+        if self._closed and self.empty():
             raise StopAsyncIteration
         item = await self.get()
         if item is _SENTINEL:
+            self._on_eof()
             raise StopAsyncIteration
         return item
 
@@ -66,6 +431,58 @@ class PipeTransport:
         self.timeout = timeout
         self.buff_size = pipe.buff_len
         self._task: Optional[asyncio.Task] = None
+        # прогресс стрима (читает JobRegistry)
+        self.state = 'handshake'    # handshake → streaming → eof → done | failed
+        self.sent = 0               # STREAM_CHUNK отправлено
+        self.sent_bytes = 0         # объём payload (оценка, см. estimate_size)
+        self.acked = 0              # consumer подтвердил приём
+        self.completed = 0          # consumer обработал
+        self.error: Optional[str] = None
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        # окно, запрошенное consumer'ом под давлением памяти (None — buff_size)
+        self.window_hint: Optional[int] = None
+        # cb(transport) — стрим завершён, MemoryModule снимает регистрацию
+        self._done_cb: Optional[Callable[['PipeTransport'], None]] = None
+        self._released = False
+        pipe.retain()
+
+    @property
+    def window(self) -> int:
+        """Чанков до ожидания ACK: buff_size, суженный давлением памяти с обеих сторон."""
+        window = self.buff_size
+        if self.window_hint:
+            window = min(window, self.window_hint)
+        return self.router.context.memory.budget.window(window)
+
+    def on_ack(self, data):
+        """
+        STREAM_ACK от consumer. data — int (старый формат, только buff)
+        или {'buff', 'received', 'completed', 'done', 'error'}.
+        """
+        if not isinstance(data, dict):
+            return
+        self.window_hint = data.get('window')
+        self.acked = max(self.acked, data.get('received', 0))
+        self.completed = max(self.completed, data.get('completed', 0))
+        if self.state == 'cancelled':
+            return
+        if data.get('error'):
+            self._finish('failed', data['error'])
+        elif data.get('done'):
+            self._finish('done')
+
+    def _finish(self, state: str, error: Optional[str] = None):
+        self.state = state
+        self.error = error or self.error
+        self.finished_at = self.finished_at or time.monotonic()
+        if self._task is not asyncio.current_task():
+            self.stop()  # pump не должен ждать на буфере, который уйдёт в пул
+        if not self._released:
+            self._released = True
+            self.pipe.release()
+            if self._done_cb:
+                self._done_cb(self)
 
     def start(self) -> asyncio.Task:
         self._task = asyncio.create_task(self._handshake_and_pump())
@@ -92,38 +509,50 @@ class PipeTransport:
         await self.router._forward(open_pack)
 
         try:
-            await asyncio.wait_for(future, timeout=self.timeout)
+            result = await asyncio.wait_for(future, timeout=self.timeout)
         except asyncio.TimeoutError:
             log.error(f'[pipe_transport] handshake timeout {self.template.label[:8]}')
+            self._finish('failed', 'handshake timeout')
+            return
+        if isinstance(result, Exception):
+            # consumer отказал (нет stream'а, исчерпан бюджет памяти, ...)
+            log.error(f'[pipe_transport] stream refused {self.template.label[:8]}: {result}')
+            self._finish('failed', str(result))
             return
 
         log.info(f'[pipe_transport] handshake ok, buff_size={self.buff_size}')
+        self.state = 'streaming'
         await self._pump()
 
     async def _pump(self):
         sent_in_batch = 0
         ack_label = f'ack_{self.template.label}'
 
-        async for chunk in self.pipe:
-            chunk_pack = MsgPack(
-                type=PackType.STREAM_CHUNK,
-                source=self.template.source,
-                dst=self.template.dst,
-                label=self.template.label,
-                data=chunk,
-            )
-            await self.router._send_pack(chunk_pack)
-            sent_in_batch += 1
-            log.debug(f'[pipe_transport] sent #{sent_in_batch}/{self.buff_size}')
-
-            if sent_in_batch >= self.buff_size:
-                log.debug(f'[pipe_transport] batch done ({self.buff_size} chunks) — waiting ACK')
+        # из pipe берём сразу всё что есть, но не больше остатка окна
+        while chunks := await self.pipe.get_many(self.window - sent_in_batch):
+            for chunk in chunks:
+                chunk_pack = MsgPack(
+                    type=PackType.STREAM_CHUNK,
+                    source=self.template.source,
+                    dst=self.template.dst,
+                    label=self.template.label,
+                    data=chunk,
+                )
+                await self.router._send_pack(chunk_pack)
+                self.sent += 1
+                self.sent_bytes += estimate_size(chunk)
+            sent_in_batch += len(chunks)
+            log.debug(f'[pipe_transport] sent #{sent_in_batch}/{self.window}')
+
+            if sent_in_batch >= self.window:
+                log.debug(f'[pipe_transport] batch done ({sent_in_batch} chunks) — waiting ACK')
                 ack_future = self.router.sessions.register_single(ack_label, '', '')
                 try:
                     await asyncio.wait_for(ack_future, timeout=self.timeout)
                     log.debug(f'[pipe_transport] ACK received — next batch')
                 except asyncio.TimeoutError:
                     log.error(f'[pipe_transport] ACK timeout — stopping')
+                    self._finish('failed', 'ACK timeout')
                     break
                 sent_in_batch = 0
 
@@ -134,8 +563,157 @@ class PipeTransport:
             label=self.template.label,
         )
         await self.router._send_pack(eof_pack)
+        if self.state == 'streaming':
+            self.state = 'eof'
         log.info(f'[pipe_transport] EOF sent')
 
+    async def cancel(self):
+        """
+        Отменить стрим: перестать слать чанки и отправить STREAM_EOF с
+        cancel=True — consumer выбросит необработанные элементы и выйдет.
+        """
+        if self.state in ('done', 'failed', 'cancelled'):
+            return
+        self.stop()
+        self.pipe.close()
+        self._finish('cancelled')
+        await self.router._send_pack(MsgPack(
+            type=PackType.STREAM_EOF,
+            source=self.template.source,
+            dst=self.template.dst,
+            label=self.template.label,
+            data={'cancel': True},
+        ))
+        log.info(f'[pipe_transport] stream {self.template.label[:8]} cancelled')
+
+    def abort(self):
+        """CANCEL от consumer'а: перестать слать чанки, EOF не отправляется."""
+        if self.state in ('done', 'failed', 'cancelled'):
+            return
+        self.stop()
+        self._finish('cancelled')
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+
+class GeneratorTransport:
+    """
+    Async-генератор @rpc → STREAM_CHUNK вызывающему, с кредитным окном как у
+    PipeTransport: в пути и в pipe consumer'а не больше window чанков.
+    Кредит — разница между отправленным и взятым consumer'ом ('completed'
+    из STREAM_ACK); исчерпан — генератор не продвигается до следующего ACK.
+    """
+    def __init__(self, generator, router, reply: MsgPack, buff: int = 10,
+                 timeout: int = 30):
+        self.generator = generator
+        self.router = router
+        self.template = reply      # source / dst / label / path ответа
+        self.buff_size = buff
+        self.timeout = timeout
+        self._task: Optional[asyncio.Task] = None
+        self.state = 'streaming'   # streaming → eof → done | failed | cancelled
+        self.sent = 0
+        self.sent_bytes = 0
+        self.acked = 0
+        self.completed = 0
+        self.error: Optional[str] = None
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.window_hint: Optional[int] = None
+        self._credit = asyncio.Event()
+        self._done_cb: Optional[Callable[['GeneratorTransport'], None]] = None
+
+    @property
+    def window(self) -> int:
+        window = self.buff_size
+        if self.window_hint:
+            window = min(window, self.window_hint)
+        return self.router.context.memory.budget.window(window)
+
+    def on_ack(self, data):
+        """STREAM_ACK от вызывающего: {'buff', 'received', 'completed', 'done', 'error'}."""
+        if not isinstance(data, dict):
+            return
+        # buff=0 — служебный ACK (idle / final), окно не меняет
+        self.buff_size = data.get('buff') or self.buff_size
+        self.window_hint = data.get('window')
+        self.acked = max(self.acked, data.get('received', 0))
+        self.completed = max(self.completed, data.get('completed', 0))
+        if data.get('error'):
+            self._finish('failed', data['error'])
+        elif data.get('done') and self.state == 'streaming':
+            # consumer ушёл раньше конца генератора — дальше слать некому
+            self._finish('cancelled')
+        self._credit.set()
+
+    def _finish(self, state: str, error: Optional[str] = None):
+        if self.finished_at is not None:
+            return
+        self.state = state
+        self.error = error or self.error
+        self.finished_at = time.monotonic()
+        if self._task is not asyncio.current_task():
+            self.stop()
+        if self._done_cb:
+            self._done_cb(self)
+
+    def start(self) -> asyncio.Task:
+        self._task = asyncio.create_task(self._pump())
+        return self._task
+
+    def _pack(self, type_: PackType, data=None) -> MsgPack:
+        return MsgPack(
+            type=type_,
+            source=self.template.source,
+            dst=self.template.dst,
+            label=self.template.label,
+            data=data,
+            path=list(self.template.path),
+        )
+
+    async def _wait_credit(self) -> bool:
+        while self.sent - self.completed >= self.window:
+            self._credit.clear()
+            try:
+                await asyncio.wait_for(self._credit.wait(), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                log.error(f'[gen_transport] ACK timeout {self.template.label[:8]} — stopping')
+                self._finish('failed', 'ACK timeout')
+            if self.state != 'streaming':
+                return False
+        return True
+
+    async def _pump(self):
+        try:
+            async for chunk in self.generator:
+                if not await self._wait_credit():
+                    break
+                await self.router._send_pack(self._pack(PackType.STREAM_CHUNK, chunk))
+                self.sent += 1
+                self.sent_bytes += estimate_size(chunk)
+        except Exception as e:
+            log.error(f'[gen_transport] generator {self.template.label[:8]} failed: {e}')
+            self._finish('failed', str(e))
+            # ошибка идёт тем же каналом что и чанки (STREAM_EOF), чтобы не обогнать их
+            await self.router._send_pack(self._pack(PackType.STREAM_EOF, {'error': str(e)}))
+            return
+        finally:
+            await self.generator.aclose()
+
+        if self.state == 'streaming':
+            self.state = 'eof'
+        await self.router._send_pack(self._pack(PackType.STREAM_EOF))
+        # финального ACK от старых клиентов может не быть
+        self._finish('done' if self.state == 'eof' else self.state)
+
+    def abort(self):
+        """CANCEL от вызывающего: остановить генератор, EOF не отправляется."""
+        self._finish('cancelled')
+        self._credit.set()
+        self.stop()
+
     def stop(self):
         if self._task:
             self._task.cancel()
@@ -147,24 +725,182 @@ class Dispatcher:
     Паузит генератор когда все pipe полные.
     """
 
-    def __init__(self, pipes: list[Pipe]):
+    def __init__(self, pipes: list[Pipe], first_seq: int = 0, linger: bool = False,
+                 broadcast: bool = False, policy: str = 'block'):
         self.pipes: Dict[str, Pipe] = {p.pipe_id: p for p in pipes}
         self._resume = asyncio.Event()
         self._resume.set()
         self._running = False
         self._task: Optional[asyncio.Task] = None
+        # порядковый номер следующего элемента генератора (для checkpoint'ов)
+        self.next_seq = first_seq
+        self.exhausted = False
+        self.failed = False
+        # linger=True — после исчерпания генератора pipes не закрываются:
+        # их закрывает владелец (JobRegistry досылает копии отстающих элементов)
+        self.linger = linger
+        # broadcast=True — каждый элемент уходит во ВСЕ pipes (репликация).
+        # policy для отстающего pipe: 'block' — ждать его, 'drop' — пропустить
+        # элемент (отставание ограничено buff_len pipe'а)
+        self.broadcast = broadcast
+        self.policy = policy
+        self.dropped: Dict[str, int] = {p.pipe_id: 0 for p in pipes}
+        # seq элементов, ещё лежащих в каждом pipe (хвост последних put)
+        self._queued: Dict[str, deque] = {p.pipe_id: deque() for p in pipes}
+        # (seq, элемент) из pipe'ов отказавших worker'ов — ждут раздачи живым
+        self._orphans: deque = deque()
+        self._dispatch_cb: Optional[Callable[[str, int, object], None]] = None
+        # pipes, в которые dispatcher ещё пишет; пусто — dispatcher отработал
+        self._held = set(self.pipes)
+        self._done_cb: Optional[Callable[['Dispatcher'], None]] = None
 
         for pipe in pipes:
+            pipe.retain()
             pipe.set_refill_callback(self._on_refill_needed)
 
+    def set_dispatch_callback(self, cb: Callable[[str, int, object], None]):
+        """cb(pipe_id, seq, item) — вызывается после того как элемент seq лёг в pipe."""
+        self._dispatch_cb = cb
+
+    async def _put(self, target: Pipe, item, seq: Optional[int] = None):
+        # seq задан — элемент отказавшего worker'а, номер у него уже есть
+        fresh = seq is None
+        if fresh:
+            seq = self.next_seq
+        await target.put(item)
+        queued = self._queued[target.pipe_id]
+        queued.append(seq)
+        while len(queued) > target.size:
+            queued.popleft()
+        if self._dispatch_cb:
+            self._dispatch_cb(target.pipe_id, seq, item)
+        if fresh:
+            self.next_seq += 1
+
+    async def _put_all(self, item):
+        """Broadcast: один элемент → все открытые pipes."""
+        for pipe in self.pipes.values():
+            if pipe._closed:
+                continue
+            if self.policy == 'drop' and pipe.is_full():
+                self.dropped[pipe.pipe_id] += 1
+                continue
+            await pipe.put(item)
+            if self._dispatch_cb:
+                self._dispatch_cb(pipe.pipe_id, self.next_seq, item)
+        self.next_seq += 1
+
+    async def _dispatch(self, item):
+        if self.broadcast:
+            await self._put_all(item)
+            return
+        await self._flush_orphans()
+        target = await self._next_target()
+        if target:
+            await self._put(target, item)
+
+    async def _flush_orphans(self):
+        """Раздать живым pipe'ам элементы отказавших worker'ов (seq сохраняется)."""
+        while self._orphans and self._running:
+            target = await self._next_target()
+            if target is None:
+                return
+            seq, item = self._orphans.popleft()
+            await self._put(target, item, seq)
+
+    def orphaned(self) -> set[int]:
+        """seq элементов отказавших worker'ов, ещё не отданных другим."""
+        return {seq for seq, _ in self._orphans}
+
+    def drop_pipe(self, pipe_id: str, redispatch: bool = False):
+        """
+        Стрим worker'а завершился отказом / отменой: pipe выводится из раздачи
+        (broadcast с policy='block' не ждёт его). redispatch=True — то, что
+        осталось в pipe, получат живые worker'ы (unicast, пока генератор идёт).
+        """
+        pipe = self.pipes.get(pipe_id)
+        if pipe is None or pipe_id not in self._held:
+            return
+        pipe.close()
+        items = pipe.drain()
+        queued = self._queued.get(pipe_id, deque())
+        count = min(len(items), len(queued))
+        if redispatch and not self.broadcast and not self.exhausted and count:
+            self._orphans.extend(zip(list(queued)[len(queued) - count:],
+                                     items[len(items) - count:]))
+            log.warning(f'[dispatcher] pipe {pipe_id} failed — '
+                        f'{count} items re-dispatched')
+        elif items:
+            log.warning(f'[dispatcher] pipe {pipe_id} closed — {len(items)} items dropped')
+        queued.clear()
+        self._release(pipe_id)
+        if not self.exhausted and all(p._closed for p in self.pipes.values()):
+            log.error('[dispatcher] no live pipes left — aborting')
+            self.failed = True
+            self.abort()
+        self._resume.set()
+
     def _on_refill_needed(self, pipe_id: str):
         log.debug(f'[dispatcher] refill from {pipe_id}')
         self._resume.set()
 
     def _least_loaded(self) -> Optional[Pipe]:
-        candidates = [p for p in self.pipes.values() if not p.is_full()]
+        candidates = [p for p in self.pipes.values()
+                      if not p._closed and not p.is_full()]
         return min(candidates, key=lambda p: p.size) if candidates else None
 
+    async def _next_target(self) -> Optional[Pipe]:
+        """Дождаться pipe со свободным местом (пауза когда все полные)."""
+        target = None
+        while target is None and self._running:
+            target = self._least_loaded()
+            if target is None:
+                self._resume.clear()
+                log.debug('[dispatcher] all pipes full — paused')
+                await self._resume.wait()
+        return target
+
+    # ------------------------------------------------------------------ #
+    #  Push-режим — элементы приходят не из генератора, а через push()
+    #  (например, consumer стадии pipeline пере-эмитит в следующий стрим)
+    # ------------------------------------------------------------------ #
+
+    async def push(self, item):
+        """Положить элемент в наименее загруженный pipe (broadcast — во все), с backpressure."""
+        self._running = True
+        await self._dispatch(item)
+
+    async def finish(self):
+        """Закрыть все pipes sentinel'ом — PipeTransport отправит EOF."""
+        await self._flush_orphans()
+        for pipe_id in self.pipes:
+            await self.close_pipe(pipe_id)
+        self._running = False
+
+    async def close_pipe(self, pipe_id: str):
+        """Закрыть один pipe sentinel'ом (EOF только этому worker'у)."""
+        pipe = self.pipes[pipe_id]
+        if not pipe._closed:
+            await pipe.put(_SENTINEL)
+            pipe.close()
+        self._release(pipe_id)
+
+    def abort(self):
+        """Закрыть pipes без sentinel — прервать цепочку (как при ошибке producer)."""
+        self._running = False
+        self._resume.set()
+        for pipe_id, pipe in self.pipes.items():
+            pipe.close()
+            self._release(pipe_id)
+
+    def _release(self, pipe_id: str):
+        if pipe_id not in self._held:
+            return
+        self._held.discard(pipe_id)
+        self.pipes[pipe_id].release()
+        if not self._held and self._done_cb:
+            self._done_cb(self)
+
     async def run(self, generator: Callable):
         self._running = True
         loop = asyncio.get_event_loop()
@@ -190,36 +926,40 @@ class Dispatcher:
         producer_future = loop.run_in_executor(None, _produce)
         log.info(f'[dispatcher] started → {len(self.pipes)} pipes')
 
+        ended = False
         while self._running:
             item = await gen_queue.get()
             if item is _SENTINEL:
+                ended = True
                 if _producer_failed:
                     log.error('[dispatcher] producer failed — closing all pipes')
                 else:
                     log.debug('[dispatcher] generator exhausted')
                 break
 
-            target = None
-            while target is None and self._running:
-                target = self._least_loaded()
-                if target is None:
-                    self._resume.clear()
-                    log.debug('[dispatcher] all pipes full — paused')
-                    await self._resume.wait()
+            await self._dispatch(item)
 
-            if target:
-                await target.put(item)
+        if not ended:
+            # остановлен извне: producer может ждать места в очереди —
+            # дать ему увидеть остановку и выйти
+            while await gen_queue.get() is not _SENTINEL:
+                pass
 
         # При ошибке producer — закрыть pipes без sentinel (прервать цепочку)
-        if _producer_failed:
-            for pipe in self.pipes.values():
-                pipe.close()
-            log.error('[dispatcher] aborted due to producer failure')
+        if not _producer_failed and not self.failed:
+            await self._flush_orphans()
+        if _producer_failed or self.failed:
+            self.failed = True
+            self.abort()
+            log.error('[dispatcher] aborted' +
+                      (' due to producer failure' if _producer_failed else ''))
         else:
             # закрываем все pipes sentinel'ом чтобы PipeTransport отправил EOF
-            for pipe in self.pipes.values():
-                await pipe.put(_SENTINEL)
-                pipe.close()
+            self.exhausted = True
+            if self.linger:
+                log.info('[dispatcher] generator exhausted — pipes left open')
+                return
+            await self.finish()
 
         log.info('[dispatcher] finished')
 
@@ -237,38 +977,87 @@ class MemoryModule(ModuleGeneric):
         super().__init__(name, context)
         self.pipes: Dict[str, Pipe] = {}
         self.dispatchers: list[Dispatcher] = []
-        self._transports: list[PipeTransport] = []
+        # label → исходящий стрим (PipeTransport / GeneratorTransport)
+        self._transports: Dict[str, PipeTransport | GeneratorTransport] = {}
+        # pipeline_id → выходы стадий на этом узле (StageEmitter, см. pipeline.py)
+        self.pipeline_stages: Dict[str, list] = {}
+        # (pipeline_id, stage) → вход стадии на этом узле (StageInput, см. pipeline.py)
+        self.pipeline_inputs: Dict[tuple, object] = {}
+        # broadcast_id → ретранслятор broadcast-стрима на этом узле (см. broadcast.py)
+        self.broadcasts: Dict[str, object] = {}
         self._counter = 0
+        cfg = context.config.memory
+        self.spill_dir = Path(cfg.spill_dir)
+        self.spill_segment_bytes = cfg.spill_segment_mb << 20
+        self.budget = MemoryBudget(cfg.budget_mb << 20, cfg.budget_high, cfg.budget_refuse)
+        # пул буферов освобождённых pipe'ов: buff_len → [queue, ...]
+        self.pool_size = cfg.pool_size
+        self._pool: Dict[int, list[RingBuffer]] = {}
+        self.released = 0
+        self.reused = 0
 
     async def start(self):
         self.log.info(f'Started (node={self.name})')
 
     async def stop(self):
-        for t in self._transports:
+        for t in self._transports.values():
             t.stop()
         for d in self.dispatchers:
             d.stop()
         for pipe in self.pipes.values():
             pipe.close()
+            if pipe._spill is not None:
+                pipe._spill.close()
         self.log.info('Stopped')
 
     # ------------------------------------------------------------------ #
     #  Pipe management
     # ------------------------------------------------------------------ #
 
-    def create_pipe(self, buff: int = 10) -> Pipe:
+    def create_pipe(self, buff: int = 10, spill: bool = False) -> Pipe:
+        """spill=True — переполнение уходит в mmap-сегменты на диске (spill_dir)."""
         self._counter += 1
         pipe_id = f'{self.name}_{self._counter}'
-        pipe = Pipe(pipe_id, buff)
+        spill_file = SpillFile(
+            self.spill_dir, f'{self.ctx.NODE}_{pipe_id}', self.spill_segment_bytes
+        ) if spill else None
+        ring = None
+        if spill_file is None and self._pool.get(buff):
+            ring = self._pool[buff].pop()
+            self.reused += 1
+        pipe = Pipe(pipe_id, buff, spill_file, ring)
+        pipe.attach_budget(self.budget)
+        pipe._release_cb = self._release_pipe
         self.pipes[pipe_id] = pipe
         log.debug(f'pipe created: {pipe_id}')
         return pipe
 
-    def create_pipes(self, buff: int = 10, count: int = 1) -> list:
-        return [self.create_pipe(buff) for _ in range(count)]
-
-    def create_dispatcher(self, pipes: list[Pipe]) -> Dispatcher:
-        d = Dispatcher(pipes)
+    def _release_pipe(self, pipe: Pipe):
+        """Последний владелец отпустил pipe: снять регистрацию, буфер — в пул."""
+        self.pipes.pop(pipe.pipe_id, None)
+        pipe.close()
+        pipe.clear()
+        self.released += 1
+        if pipe._spill is not None:
+            pipe._spill.close()
+            return
+        free = self._pool.setdefault(pipe.buff_len, [])
+        if len(free) < self.pool_size:
+            pipe._ring.reset()
+            free.append(pipe._ring)
+            # у освобождённого pipe остаются счётчики (статистика задач),
+            # но не буфер — он уже принадлежит пулу; свой пустой вместо него
+            pipe._ring = RingBuffer(0)
+        log.debug(f'pipe released: {pipe.pipe_id}')
+
+    def create_pipes(self, buff: int = 10, count: int = 1, spill: bool = False) -> list:
+        return [self.create_pipe(buff, spill) for _ in range(count)]
+
+    def create_dispatcher(self, pipes: list[Pipe], first_seq: int = 0,
+                          linger: bool = False, broadcast: bool = False,
+                          policy: str = 'block') -> Dispatcher:
+        d = Dispatcher(pipes, first_seq, linger, broadcast, policy)
+        d._done_cb = self.dispatchers.remove
         self.dispatchers.append(d)
         return d
 
@@ -282,10 +1071,49 @@ class MemoryModule(ModuleGeneric):
         Чанки из pipe потекут как STREAM_CHUNK на remote через Router.
         """
         pt = PipeTransport(pipe, router, pack_template)
-        self._transports.append(pt)
+        pt._done_cb = self._transport_done
+        pipe.label = pack_template.label
+        self._transports[pack_template.label] = pt
         pt.start()
         return pt
 
+    def _transport_done(self, pt: PipeTransport):
+        self._transports.pop(pt.template.label, None)
+        if pt.state not in ('failed', 'cancelled'):
+            return
+        # отказавший стрим не должен держать dispatcher: его pipe больше
+        # никто не читает (при отказе — остаток уходит другим worker'ам)
+        for d in list(self.dispatchers):
+            if pt.pipe.pipe_id in d.pipes:
+                d.drop_pipe(pt.pipe.pipe_id, redispatch=pt.state == 'failed')
+
+    def attach_generator(self, generator, reply: MsgPack, router,
+                         buff: Optional[int] = None) -> GeneratorTransport:
+        """
+        Отдать async-генератор @rpc вызывающему через Router с кредитным
+        окном (buff, по умолчанию memory.default_buff; ACK может его сменить).
+        """
+        gt = GeneratorTransport(generator, router, reply,
+                                buff or self.ctx.config.memory.default_buff)
+        gt._done_cb = lambda t: self._generator_done(t, router)
+        self._transports[reply.label] = gt
+        gt.start()
+        return gt
+
+    def _generator_done(self, gt: GeneratorTransport, router):
+        self._transports.pop(gt.template.label, None)
+        # маршрут из STREAM_OPEN на стороне генератора больше не нужен
+        router._stream_routes.pop(gt.template.label, None)
+
+    def get_transport(self, label: str) -> Optional[PipeTransport | GeneratorTransport]:
+        return self._transports.get(label)
+
+    def on_stream_ack(self, label: str, data):
+        """Router вызывает это при получении STREAM_ACK на генераторе."""
+        pt = self._transports.get(label)
+        if pt:
+            pt.on_ack(data)
+
     # ------------------------------------------------------------------ #
     #  Network pipe: inbound (remote → локальный pipe)
     # ------------------------------------------------------------------ #
@@ -296,7 +1124,7 @@ class MemoryModule(ModuleGeneric):
         Router будет класть STREAM_CHUNK в эту pipe через feed_chunk().
         """
         pipe = self.create_pipe(buff)
-        pipe._stream_label = label  # маркер для Router
+        pipe.label = label  # маркер для Router
         self.log.debug(f'inbound pipe created for label={label[:8]}')
         return pipe
 
@@ -309,6 +1137,60 @@ class MemoryModule(ModuleGeneric):
         await pipe.put(_SENTINEL)
         pipe.close()
 
+    # ------------------------------------------------------------------ #
+    #  RPC
+    # ------------------------------------------------------------------ #
+
+    @rpc
+    def pipe_stats(self, data: dict):
+        """Состояние pipe'ов узла: заполненность, счётчики, spill-метрики."""
+        only_spill = isinstance(data, dict) and data.get('spill', False)
+        return [
+            pipe.stats() for pipe in self.pipes.values()
+            if not only_spill or pipe._spill is not None
+        ]
+
+    @rpc
+    def usage(self, data: dict):
+        """
+        Память узла: бюджет + байты по стримам.
+        inbound — входящие стримы (pipe consumer'а), outbound — исходящие
+        (pipe перед PipeTransport, окно с учётом давления), local — остальные.
+        """
+        inbound, outbound, local = [], [], []
+        for pipe in self.pipes.values():
+            entry = {
+                'pipe_id': pipe.pipe_id,
+                'label':   pipe.label,
+                'items':   pipe.size,
+                'bytes':   pipe.bytes,
+                'spilled': pipe._spill.bytes_on_disk if pipe._spill is not None else 0,
+            }
+            transport = self._transports.get(pipe.label) if pipe.label else None
+            if transport:
+                entry.update(dst=transport.template.dst, window=transport.window,
+                             state=transport.state)
+                outbound.append(entry)
+            elif pipe.label:
+                inbound.append(entry)
+            else:
+                local.append(entry)
+        return {
+            'node':     self.ctx.NODE,
+            'budget':   self.budget.as_dict(),
+            'live':     {
+                'pipes':       len(self.pipes),
+                'dispatchers': len(self.dispatchers),
+                'transports':  len(self._transports),
+                'released':    self.released,
+                'reused':      self.reused,
+                'pooled':      sum(len(q) for q in self._pool.values()),
+            },
+            'inbound':  inbound,
+            'outbound': outbound,
+            'local':    local,
+        }
+
 
 """
 Пример использования — outbound:
@@ -0,0 +1,414 @@
+# GRID/pipeline.py — многостадийные pipeline'ы поверх mesh-стримов
+#
+# generate (origin) → stage 0 (map на B..D) → stage 1 (reduce на E) → ...
+# Каждое ребро — обычный PipeTransport (STREAM_OPEN/CHUNK/ACK/EOF), поэтому
+# flow control на всех рёбрах одинаковый. Consumer стадии пере-эмитит
+# элементы через ctx['emit'] прямо в следующую стадию, минуя origin.
+#
+# На узле стадии один consumer: стримы от всех upstream-узлов сливаются
+# в его pipe (StageInput), конец входа — EOF от каждого из них. Так
+# reduce на E видит все элементы стадии, а не часть от одного map-узла.
+
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Optional
+
+from src.internal_modules.memory import _SENTINEL
+from src.networking.protocol import MsgPack
+
+log = logging.getLogger('Pipeline')
+
+# ключ в STREAM_OPEN.data со спецификацией pipeline (executor его вырезает)
+PIPELINE_KEY = '_pipeline'
+
+# сколько секунд статистика завершённого pipeline остаётся доступной
+STATS_RETENTION = 300
+
+# сколько секунд вход стадии ждёт недостающие upstream-стримы, когда все
+# открытые уже прислали EOF (upstream-узел мог отказать до открытия)
+INPUT_GRACE = 30
+
+
+@dataclass
+class PipelineStage:
+    service: str
+    stream: str                                   # имя @stream_consumer
+    nodes: list[str] = field(default_factory=list)
+    buff: int = 3
+    data: dict = field(default_factory=dict)      # данные для @stream_wrapper
+
+    @classmethod
+    def from_dict(cls, d: dict) -> 'PipelineStage':
+        return cls(
+            service=d['service'],
+            stream=d['stream'],
+            nodes=list(d.get('nodes', [])),
+            buff=d.get('buff', 3),
+            data=dict(d.get('data') or {}),
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class StageStats:
+    pipeline_id: str
+    stage: int
+    node: str
+    label: str = ''
+    items_in: int = 0
+    items_out: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished_at or time.monotonic()
+        return max(end - self.started_at, 1e-6)
+
+    def as_dict(self) -> dict:
+        return {
+            'pipeline_id': self.pipeline_id,
+            'stage':       self.stage,
+            'node':        self.node,
+            'label':       self.label,
+            'items_in':    self.items_in,
+            'items_out':   self.items_out,
+            'elapsed':     round(self.elapsed, 3),
+            'rate_in':     round(self.items_in / self.elapsed, 2),
+            'rate_out':    round(self.items_out / self.elapsed, 2),
+            'done':        self.finished_at is not None,
+            'error':       self.error,
+        }
+
+
+def open_stage(ctx, pipeline_id: str, origin: str,
+               stages: list[PipelineStage], index: int):
+    """
+    Открыть стримы с текущего узла на все узлы стадии index (по одному на узел).
+    Возвращает push-Dispatcher: элементы раздаются по узлам стадии.
+    """
+    stage = stages[index]
+    nodes = list(dict.fromkeys(stage.nodes))
+    pipes = ctx.memory.create_pipes(buff=stage.buff, count=len(nodes))
+    dispatcher = ctx.memory.create_dispatcher(pipes)
+
+    spec = {
+        'id':     pipeline_id,
+        'origin': origin,
+        'stage':  index,
+        'stages': [s.to_dict() for s in stages],
+    }
+    for pipe, node in zip(pipes, nodes):
+        template = MsgPack(
+            source  = ctx.NODE,
+            dst     = node,
+            service = stage.service,
+            method  = stage.stream,
+            label   = str(uuid.uuid4()),
+            data    = {'buff': stage.buff, **stage.data, PIPELINE_KEY: spec},
+        )
+        ctx.memory.attach_transport(pipe, template, ctx.network.router)
+        log.info(f'[pipeline {pipeline_id[:8]}] stage {index} → {node} '
+                 f'{stage.service}.{stage.stream}')
+    return dispatcher
+
+
+def upstream_count(spec: dict) -> int:
+    """Сколько узлов шлёт в узел стадии: origin для стадии 0, иначе узлы предыдущей."""
+    index = spec['stage']
+    if index == 0:
+        return 1
+    return len(dict.fromkeys(spec['stages'][index - 1]['nodes']))
+
+
+class StageInput:
+    """
+    Вход стадии на узле: все upstream-стримы pipeline сливаются в один pipe,
+    его читает один consumer. Кредитное окно у каждого стрима своё (ACK
+    шлёт feeder стрима по мере перекладывания), финальный ACK — всем сразу,
+    когда consumer стадии закончил.
+    """
+
+    def __init__(self, ctx, spec: dict):
+        self.ctx = ctx
+        self.spec = spec
+        self.key = (spec['id'], spec['stage'])
+        self.expected = upstream_count(spec)
+        self.buff = spec['stages'][spec['stage']].get('buff', 3)
+        self.pipe = ctx.memory.create_pipe(buff=self.buff)
+        self.labels: list[str] = []
+        self._inputs: list[tuple[str, object]] = []  # (label, pipe) входящих стримов
+        self._feeders: list[asyncio.Task] = []
+        self._open = 0
+        self._eofs = 0
+        self.ended = False
+        self._grace: Optional[asyncio.TimerHandle] = None
+
+    def add(self, label: str, pipe):
+        """Подключить входящий стрим от очередного upstream-узла."""
+        if self._grace:
+            self._grace.cancel()
+            self._grace = None
+        self.labels.append(label)
+        self._inputs.append((label, pipe))
+        self._open += 1
+        self._feeders.append(asyncio.create_task(self._feed(label, pipe.retain())))
+
+    async def _feed(self, label: str, pipe):
+        router = self.ctx.network.router
+        try:
+            await router.send_stream_ack(label, self.buff)
+            while items := await pipe.get_many(self.buff):
+                await self.pipe.put_many(items)
+                if pipe.size < self.buff:
+                    await router.send_stream_ack(label, self.buff)
+        except Exception as e:
+            log.error(f'[pipeline {self.key[0][:8]}] input {label[:8]} failed: {e}')
+        finally:
+            pipe.release()
+        self._open -= 1
+        self._eofs += 1
+        if self._open == 0:
+            if self._eofs >= self.expected:
+                await self._end()
+            else:
+                self._grace = asyncio.get_running_loop().call_later(
+                    INPUT_GRACE, lambda: asyncio.create_task(self._end()))
+
+    async def _end(self):
+        if self.ended:
+            return
+        if self._eofs < self.expected:
+            log.warning(f'[pipeline {self.key[0][:8]}] stage {self.key[1]}: '
+                        f'{self._eofs}/{self.expected} upstream streams — closing input')
+        self.ended = True
+        await self.pipe.put(_SENTINEL)
+        self.pipe.close()
+
+    async def close(self, error: Optional[str] = None):
+        """Consumer стадии закончил: снять вход и отправить финальный ACK каждому стриму."""
+        self.ended = True
+        if self._grace:
+            self._grace.cancel()
+        for task in self._feeders:
+            task.cancel()
+        self.ctx.memory.pipeline_inputs.pop(self.key, None)
+        router = self.ctx.network.router
+        for label, pipe in self._inputs:
+            progress = {
+                'received':  pipe.total_put,
+                'completed': pipe.total_got,
+                'done':      True,
+                'error':     error,
+            }
+            try:
+                await router.send_stream_ack(label, 0, progress, final=True)
+            except Exception as e:
+                log.warning(f'final ACK {label[:8]} failed: {e}')
+            # EOF от отвергнутого upstream уже не придёт
+            router.stream_registry.remove(label)
+
+
+def open_input(ctx, spec: dict, label: str, pipe) -> tuple[StageInput, bool]:
+    """
+    Executor: входящий стрим стадии pipeline → вход стадии на этом узле.
+    (вход, True) — вход новый, для него нужно запустить consumer.
+    """
+    key = (spec['id'], spec['stage'])
+    stage_input = ctx.memory.pipeline_inputs.get(key)
+    created = stage_input is None
+    if created:
+        stage_input = ctx.memory.pipeline_inputs[key] = StageInput(ctx, spec)
+    elif stage_input.ended:
+        raise RuntimeError(f'pipeline {spec["id"][:8]} stage {spec["stage"]}: '
+                           f'input already closed')
+    stage_input.add(label, pipe)
+    return stage_input, created
+
+
+async def _report_done(ctx, spec: dict, error: Optional[str]):
+    """Последняя стадия на этом узле закончила — сообщить origin (pipeline_done)."""
+    try:
+        await ctx.network.call(spec['origin'], 'spawner', 'pipeline_done', {
+            'pipeline_id': spec['id'],
+            'node':        ctx.NODE,
+            'error':       error,
+        })
+    except Exception as e:
+        log.warning(f'[pipeline {spec["id"][:8]}] done report to {spec["origin"]} failed: {e}')
+
+
+class StageEmitter:
+    """
+    Выход стадии на consumer-узле.
+    emit(item) → следующая стадия (с backpressure), finish() → EOF вниз по цепочке.
+    На последней стадии dispatcher=None — эмитить некуда.
+    """
+
+    def __init__(self, stats: StageStats, stage_input: StageInput, dispatcher=None):
+        self.stats = stats
+        self._input = stage_input
+        self._pipe = stage_input.pipe
+        self._dispatcher = dispatcher
+        # cb(emitter) — стадия завершилась (успешно или с ошибкой)
+        self._done_cb: Optional[Callable[['StageEmitter'], None]] = None
+
+    @property
+    def last(self) -> bool:
+        return self._dispatcher is None
+
+    async def emit(self, item):
+        if self._dispatcher is None:
+            raise RuntimeError(
+                f'pipeline {self.stats.pipeline_id[:8]}: '
+                f'stage {self.stats.stage} is the last one, nothing to emit to'
+            )
+        self.stats.items_out += 1
+        await self._dispatcher.push(item)
+
+    def snapshot(self) -> dict:
+        if self.stats.finished_at is None:
+            self.stats.items_in = self._pipe.total_got
+        return self.stats.as_dict()
+
+    async def finish(self):
+        self.stats.items_in = self._pipe.total_got
+        self.stats.finished_at = time.monotonic()
+        if self._dispatcher:
+            await self._dispatcher.finish()
+        await self._input.close()
+        self._done()
+
+    async def abort(self, error: str):
+        self.stats.items_in = self._pipe.total_got
+        self.stats.finished_at = time.monotonic()
+        self.stats.error = error
+        if self._dispatcher:
+            self._dispatcher.abort()
+        await self._input.close(error)
+        self._done()
+
+    def _done(self):
+        cb, self._done_cb = self._done_cb, None
+        if cb:
+            cb(self)
+
+
+def attach_stage(ctx, stage_input: StageInput) -> StageEmitter:
+    """Executor: подключить выход стадии к её входу на этом узле."""
+    spec = stage_input.spec
+    stages = [PipelineStage.from_dict(s) for s in spec['stages']]
+    index = spec['stage']
+    stats = StageStats(pipeline_id=spec['id'], stage=index,
+                       node=ctx.NODE, label=stage_input.labels[0])
+
+    dispatcher = None
+    if index + 1 < len(stages):
+        dispatcher = open_stage(ctx, spec['id'], spec['origin'], stages, index + 1)
+    emitter = StageEmitter(stats, stage_input, dispatcher)
+    stages_map = ctx.memory.pipeline_stages
+    stages_map.setdefault(spec['id'], []).append(emitter)
+
+    def _forget():
+        emitters = stages_map.get(spec['id'], [])
+        if emitter in emitters:
+            emitters.remove(emitter)
+        if not emitters:
+            stages_map.pop(spec['id'], None)
+
+    def _done(_emitter):
+        # статистика стадии нужна pipeline_status и после конца — снимается позже
+        asyncio.get_running_loop().call_later(STATS_RETENTION, _forget)
+        if emitter.last:
+            asyncio.create_task(_report_done(ctx, spec, emitter.stats.error))
+
+    emitter._done_cb = _done
+    return emitter
+
+
+class PipelineHandle:
+    """Handle pipeline на origin-узле: запуск генератора и per-stage статистика."""
+
+    def __init__(self, ctx, stages: list[PipelineStage],
+                 pipeline_id: Optional[str] = None):
+        self.ctx = ctx
+        self.stages = stages
+        self.pipeline_id = pipeline_id or str(uuid.uuid4())
+        self.started_at = time.monotonic()
+        # узлы последней стадии, ещё не сообщившие о конце (pipeline_done)
+        self._pending = set(stages[-1].nodes)
+        self.finished_at: Optional[float] = None
+        self._dispatcher = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, generator: Callable):
+        self._dispatcher = open_stage(
+            self.ctx, self.pipeline_id, self.ctx.NODE, self.stages, 0
+        )
+        self._task = self._dispatcher.start(generator)
+        return self
+
+    def on_generator_done(self, cb: Callable[['PipelineHandle'], None]):
+        """cb(handle) — генератор отработал, упал или отменён."""
+        self._task.add_done_callback(lambda _t: cb(self))
+
+    @property
+    def failed(self) -> bool:
+        """Генератор не отдал ни одной стадии: ни один стрим стадии 0 не открылся."""
+        return self._dispatcher is not None and self._dispatcher.failed
+
+    def last_stage_done(self, node: str) -> bool:
+        """Узел последней стадии закончил. True — закончили все, pipeline завершён."""
+        self._pending.discard(node)
+        if self._pending or self.finished_at is not None:
+            return False
+        self.finished_at = time.monotonic()
+        return True
+
+    @property
+    def generated(self) -> int:
+        if not self._dispatcher:
+            return 0
+        return sum(p.total_put for p in self._dispatcher.pipes.values())
+
+    async def stats(self, timeout: int = 5) -> dict:
+        """Собрать статистику со всех узлов всех стадий."""
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        result = {
+            'pipeline_id': self.pipeline_id,
+            'origin':      self.ctx.NODE,
+            'generated':   self.generated,
+            'rate':        round(self.generated / elapsed, 2),
+            'done':        self.finished_at is not None,
+            'stages':      [],
+        }
+        for index, stage in enumerate(self.stages):
+            workers = []
+            for node in dict.fromkeys(stage.nodes):
+                try:
+                    entries = await self.ctx.network.call(
+                        node, 'spawner', 'pipeline_stats',
+                        {'pipeline_id': self.pipeline_id, 'stage': index},
+                        timeout=timeout,
+                    )
+                    workers.extend(entries or [])
+                except Exception as e:
+                    workers.append({'node': node, 'stage': index, 'error': str(e)})
+            ok = [w for w in workers if 'items_in' in w]
+            result['stages'].append({
+                'stage':     index,
+                'service':   stage.service,
+                'stream':    stage.stream,
+                'items_in':  sum(w['items_in'] for w in ok),
+                'items_out': sum(w['items_out'] for w in ok),
+                'rate_in':   round(sum(w['rate_in'] for w in ok), 2),
+                'done':      bool(ok) and all(w['done'] for w in ok),
+                'workers':   workers,
+            })
+        return result
@@ -0,0 +1,155 @@
+# GRID/scatter.py — один вызов на все узлы с сервисом (scatter-gather)
+#
+# gather() шлёт запрос каждому узлу параллельно и отдаёт ответы по мере
+# прихода: {'node', 'result'} или {'node', 'error'}. Узел, не ответивший за
+# timeout, получает {'node', 'error': 'timeout ...'}.
+#
+# fanout > 0 — ретрансляция по остовному дереву (build_tree из broadcast.py):
+# origin открывает mesh-стрим только на fanout детей (scatter.stream), каждый
+# выполняет вызов у себя, раздаёт его своему поддереву и пересылает наверх
+# ответы всего поддерева. Недоступный ребёнок — ошибки на всё его поддерево.
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Callable
+
+from src.internal_modules.base import ModuleGeneric
+from src.internal_modules.broadcast import build_tree, tree_nodes
+from services.rpc import rpc
+
+# встроенные reducer'ы для вызовов по RPC (функцию по сети не передать)
+REDUCERS: dict[str, Callable[[list], Any]] = {
+    'sum':    sum,
+    'count':  len,
+    'concat': lambda results: [item for result in results for item in (result or [])],
+    'merge':  lambda results: {k: v for result in results for k, v in (result or {}).items()},
+}
+
+# доля остатка времени, которую получает ретранслятор: его ошибки
+# по таймауту должны успеть дойти до origin'а
+_RELAY_SHARE = 0.9
+
+
+class Scatter(ModuleGeneric):
+
+    def targets(self, service: str, method: str = '') -> list[str]:
+        """Узлы с сервисом (включая свой), ближайшие первыми."""
+        return self.ctx.network.router.replicas(service, method)
+
+    async def gather(self, service: str, method: str, data: Any = None,
+                     nodes: list[str] | None = None, timeout: float | None = None,
+                     fanout: int = 0) -> AsyncIterator[dict]:
+        """Вызвать service.method на узлах, отдавая ответы по мере прихода."""
+        nodes = self.targets(service, method) if nodes is None else list(nodes)
+        direct = [node for node in nodes if node == self.ctx.NODE or not fanout]
+        subtrees = build_tree([n for n in nodes if n not in direct], fanout) if fanout else []
+        async for item in self._scatter(service, method, data, direct, subtrees,
+                                        timeout or self.ctx.config.network.call_timeout,
+                                        fanout):
+            yield item
+
+    async def call(self, service: str, method: str, data: Any = None,
+                   nodes: list[str] | None = None, timeout: float | None = None,
+                   fanout: int = 0, reducer: Callable[[list], Any] | str | None = None) -> dict:
+        """
+        Собрать все ответы: {'results': {node: result}, 'errors': {node: error}}.
+        reducer (функция или имя из REDUCERS) сворачивает успешные ответы
+        в 'result'.
+        """
+        results, errors = {}, {}
+        async for item in self.gather(service, method, data, nodes, timeout, fanout):
+            if 'error' in item:
+                errors[item['node']] = item['error']
+            else:
+                results[item['node']] = item['result']
+        answer = {'results': results, 'errors': errors}
+        if reducer is not None:
+            fn = REDUCERS[reducer] if isinstance(reducer, str) else reducer
+            answer['result'] = fn(list(results.values()))
+        return answer
+
+    # ------------------------------------------------------------------ #
+    #  RPC API
+    # ------------------------------------------------------------------ #
+
+    @rpc
+    async def collect(self, data: dict):
+        """
+        Scatter-gather одним RPC (для webpanel и удалённых клиентов):
+        {'service', 'method', 'data', 'nodes', 'timeout', 'fanout', 'reduce'}.
+        reduce — имя встроенного reducer'а: sum / count / concat / merge.
+        """
+        reducer = data.get('reduce')
+        if reducer is not None and reducer not in REDUCERS:
+            return {'error': f'unknown reducer: {reducer}, expected one of {list(REDUCERS)}'}
+        return await self.call(data['service'], data['method'], data.get('data'),
+                               data.get('nodes'), data.get('timeout'),
+                               data.get('fanout', 0), reducer)
+
+    @rpc
+    async def stream(self, data: dict):
+        """
+        Ретранслятор дерева: выполнить вызов на этом узле и в поддереве
+        data['tree'], отдавая ответы по мере прихода.
+        """
+        async for item in self._scatter(data['service'], data['method'], data.get('data'),
+                                        [self.ctx.NODE], data.get('tree', []),
+                                        data['timeout'], data.get('fanout', 2)):
+            yield item
+
+    # ------------------------------------------------------------------ #
+    #  Внутреннее
+    # ------------------------------------------------------------------ #
+
+    async def _scatter(self, service: str, method: str, data: Any,
+                       direct: list[str], subtrees: list[dict],
+                       timeout: float, fanout: int) -> AsyncIterator[dict]:
+        pending = set(direct) | set(tree_nodes(subtrees))
+        queue: asyncio.Queue = asyncio.Queue()
+        deadline = time.monotonic() + timeout
+        tasks = [asyncio.create_task(self._call_one(node, service, method, data, timeout, queue))
+                 for node in direct]
+        tasks += [asyncio.create_task(self._relay(child, service, method, data,
+                                                  timeout * _RELAY_SHARE, fanout, queue))
+                  for child in subtrees]
+        try:
+            while pending:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=left)
+                except asyncio.TimeoutError:
+                    break
+                # ответ узла засчитывается один раз (ошибку поддерева после
+                # уже пришедших ответов не повторяем)
+                if item['node'] in pending:
+                    pending.discard(item['node'])
+                    yield item
+            for node in pending:
+                yield {'node': node, 'error': f'timeout ({timeout}s)'}
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _call_one(self, node: str, service: str, method: str, data: Any,
+                        timeout: float, queue: asyncio.Queue):
+        try:
+            result = await self.ctx.network.call(node, service, method, data, timeout=timeout)
+            await queue.put({'node': node, 'result': result})
+        except Exception as e:
+            await queue.put({'node': node, 'error': str(e) or type(e).__name__})
+
+    async def _relay(self, child: dict, service: str, method: str, data: Any,
+                     timeout: float, fanout: int, queue: asyncio.Queue):
+        request = {'service': service, 'method': method, 'data': data,
+                   'tree': child['children'], 'timeout': timeout, 'fanout': fanout}
+        try:
+            stream = await self.ctx.network.stream(child['node'], self.name, 'stream',
+                                                   request, timeout=timeout)
+            async for item in stream:
+                await queue.put(item)
+        except Exception as e:
+            self.log.warning(f'Relay via {child["node"]} failed: {e}')
+            for node in [child['node']] + tree_nodes(child['children']):
+                await queue.put({'node': node, 'error': f'relay via {child["node"]}: {e}'})
@@ -1,15 +1,34 @@
 # GRID/spawner.py
 
+import asyncio
 import uuid
+from itertools import islice
 
 from src.internal_modules.base import ModuleGeneric
+from src.internal_modules.broadcast import POLICIES, BroadcastHandle
+from src.internal_modules.exceptions import MethodNotFound
+from src.internal_modules.jobs import SPECULATE_KEY
+from src.internal_modules.pipeline import STATS_RETENTION, PipelineHandle, PipelineStage
 from src.networking.protocol import MsgPack
 from services.rpc import rpc
 
 
+def _init_data(data: dict) -> tuple[dict, dict | None]:
+    """init_data запроса (по умолчанию {}) и ответ-ошибка, если это не dict."""
+    init_data = data.get('init_data')
+    if init_data is None:
+        init_data = {}
+    if not isinstance(init_data, dict):
+        return init_data, {'error': f'init_data must be a dict, '
+                                    f'got {type(init_data).__name__}'}
+    return init_data, None
+
+
 class Spawner(ModuleGeneric):
     def __init__(self, name, context):
         super().__init__(name, context)
+        self._pipelines: dict[str, PipelineHandle] = {}
+        self._broadcasts: dict[str, BroadcastHandle] = {}
         self.log.info('Spawner registered')
 
     @rpc
@@ -20,7 +39,10 @@ class Spawner(ModuleGeneric):
         target_method = data.get('method')
         workers_count = data.get('workers_count', 1)
         buff = data.get('buff', 3)
-        init_data = data.get('init_data', {})
+        # в init_data добавляются shard (resume, partitioned) и флаг спекуляции
+        init_data, error = _init_data(data)
+        if error:
+            return error
 
         gen_fn = self.ctx.services.get_generator(service_name, generator_name)
         if not gen_fn:
@@ -30,17 +52,64 @@ class Spawner(ModuleGeneric):
                 'available': available,
             }
 
+        # resume задачи из JobRegistry: продолжить с checkpoint'а
+        job_id = data.get('job_id')
+        start_at = data.get('start_at', 0)
+        # partitioned / broadcast в JobRegistry не попадают: им нечего продолжать
+        mode = data.get('mode')
+        if mode in ('partitioned', 'broadcast') and (job_id or start_at):
+            return {'error': f'{mode} jobs are not tracked by jobs: '
+                             f'job_id / start_at are not supported'}
+
         def _generator():
-            yield from gen_fn(init_data)
+            if not start_at:
+                yield from gen_fn(init_data)
+            elif getattr(gen_fn, '_shardable', False):
+                # shardable генератор умеет начать прямо с позиции (номер элемента)
+                yield from gen_fn({**init_data,
+                                   'shard': {'start': start_at, 'resume': True}})
+            else:
+                # остальные прогоняются до позиции вхолостую, без отправки
+                yield from islice(gen_fn(init_data), start_at, None)
 
         nodes = list(self.ctx.network.nodes_manager.nodes.values())
+        if data.get('mode') == 'broadcast' and data.get('nodes'):
+            # явный список узлов дерева (могут быть и не прямые соседи)
+            return self._spawn_broadcast(data, list(data['nodes']), _generator,
+                                         init_data)
         if len(nodes) < workers_count:
             return {'error': f'need {workers_count} nodes, have {len(nodes)}'}
 
-        nodes = nodes[:workers_count]
-        pipes = [self.ctx.memory.create_pipe(buff=buff) for _ in range(workers_count)]
-        dispatcher = self.ctx.memory.create_dispatcher(pipes)
+        # ближайшие по RTT узлы — первыми; без замеров — в конце
+        ranked = self.ctx.network.neighbor_table.rank([n.node_id for n in nodes])
+        by_id = {n.node_id: n for n in nodes}
+        nodes = [by_id[node_id] for node_id in ranked[:workers_count]]
+
+        if data.get('mode') == 'broadcast':
+            return self._spawn_broadcast(data, [n.node_id for n in nodes], _generator,
+                                         init_data)
+
+        if data.get('mode') == 'partitioned':
+            if not getattr(gen_fn, '_shardable', False):
+                return {'error': f'generator {service_name}.{generator_name} '
+                                 f'is not shardable (@generator(shardable=True))'}
+            return await self._spawn_partitioned(data, [n.node_id for n in nodes],
+                                                 init_data)
+
+        # spill=True — медленный consumer не останавливает генератор:
+        # переполнение pipe уходит на диск (см. spill.py)
+        spill = data.get('spill', False)
+        pipes = [self.ctx.memory.create_pipe(buff=buff, spill=spill)
+                 for _ in range(workers_count)]
+        # спекулятивное доисполнение: pipes остаются открытыми после генератора
+        speculate = self.ctx.jobs.speculation(data)
+        dispatcher = self.ctx.memory.create_dispatcher(
+            pipes, first_seq=start_at, linger=speculate > 0
+        )
         labels = []
+        streams = []
+        # consumer спекулятивной задачи сообщает о простое (idle ACK)
+        open_data = {**init_data, SPECULATE_KEY: True} if speculate else init_data
 
         for index, node in enumerate(nodes):
             label = str(uuid.uuid4())
@@ -50,18 +119,155 @@ class Spawner(ModuleGeneric):
                 service=target_service,
                 method=target_method,
                 label=label,
-                data=init_data,
+                data=open_data,
             )
             # PipeTransport через Router (mesh-маршрутизация)
-            self.ctx.memory.attach_transport(
+            transport = self.ctx.memory.attach_transport(
                 pipes[index], template, self.ctx.network.router
             )
             labels.append(label)
+            streams.append((node.node_id, pipes[index], transport))
             self.log.info(f'Pipe → {node.node_id} gen={service_name}.{generator_name}')
 
+        spec = {k: v for k, v in data.items() if k not in ('job_id', 'start_at')}
+        job = self.ctx.jobs.track(spec, dispatcher, streams, job_id, start_at)
+
         dispatcher.start(_generator)
-        self.log.info(f'Spawned {workers_count} workers')
-        return {'status': 'started', 'labels': labels, 'count': workers_count}
+        self.log.info(f'Spawned {workers_count} workers (job {job.job_id[:8]})')
+        return {'status': 'started', 'job_id': job.job_id, 'labels': labels,
+                'count': workers_count, 'start_at': start_at}
+
+    # ------------------------------------------------------------------ #
+    #  Partitioned-режим: генератор запускается на worker'ах по шардам,
+    #  по сети идут только управляющие сообщения и результаты
+    # ------------------------------------------------------------------ #
+
+    async def _spawn_partitioned(self, data: dict, nodes: list[str],
+                                 init_data: dict) -> dict:
+        count = len(nodes)
+        explicit = data.get('shards')
+        if explicit and len(explicit) != count:
+            return {'error': f'shards has {len(explicit)} entries, '
+                             f'workers_count is {count}'}
+        shards = [dict(explicit[index]) if explicit else {'index': index, 'count': count}
+                  for index in range(count)]
+
+        async def _start(node_id: str, shard: dict) -> dict:
+            request = {
+                'generator_service': data.get('generator_service'),
+                'generator':         data.get('generator'),
+                'service':           data.get('service'),
+                'method':            data.get('method'),
+                'buff':              data.get('buff', 3),
+                'init_data':         init_data,
+                'shard':             shard,
+            }
+            try:
+                result = await self.ctx.network.call(
+                    node_id, 'spawner', 'run_shard', request
+                )
+            except Exception as e:
+                result = {'error': str(e)}
+            self.log.info(f'Shard {shard} → {node_id}: {result}')
+            return {'node': node_id, 'shard': shard, **(result or {})}
+
+        # worker'ы запускаются параллельно: старт не растёт с их числом
+        shards = await asyncio.gather(*(_start(node_id, shard)
+                                        for node_id, shard in zip(nodes, shards)))
+        started = [s for s in shards if s.get('status') == 'started']
+        self.log.info(f'Spawned {len(started)}/{count} partitioned workers')
+        return {
+            'status': 'started' if started else 'failed',
+            'mode':   'partitioned',
+            'pipes':  [{'node': s['node'], 'pipe_id': s['pipe_id']} for s in started],
+            'shards': shards,
+            'count':  len(started),
+        }
+
+    # ------------------------------------------------------------------ #
+    #  Broadcast-режим: каждый worker получает каждый элемент,
+    #  ретрансляция по остовному дереву (origin шлёт только fanout стримов)
+    # ------------------------------------------------------------------ #
+
+    def _spawn_broadcast(self, data: dict, nodes: list[str], generator,
+                         init_data: dict) -> dict:
+        policy = data.get('policy', 'block')
+        if policy not in POLICIES:
+            return {'error': f'unknown policy: {policy}, expected one of {POLICIES}'}
+
+        handle = BroadcastHandle(
+            self.ctx,
+            service=data.get('service'),
+            stream=data.get('method'),
+            nodes=nodes,
+            fanout=data.get('fanout', 2),
+            buff=data.get('buff', 3),
+            policy=policy,
+            data=init_data,
+        ).start(generator)
+        self._broadcasts[handle.broadcast_id] = handle
+        # handle нужен broadcast_status и после конца генератора — снимается позже
+        handle.on_generator_done(lambda h: asyncio.get_running_loop().call_later(
+            STATS_RETENTION, self._broadcasts.pop, h.broadcast_id, None))
+        self.log.info(f'Broadcast {handle.broadcast_id[:8]} → {len(nodes)} nodes '
+                      f'(fanout={data.get("fanout", 2)}, policy={policy})')
+        return {'status': 'started', 'mode': 'broadcast',
+                'broadcast_id': handle.broadcast_id, 'tree': handle.tree,
+                'count': len(nodes)}
+
+    @rpc
+    async def broadcast_status(self, data: dict):
+        """Статистика broadcast по всем узлам дерева (вызывать на origin-узле)."""
+        handle = self._broadcasts.get(data.get('broadcast_id'))
+        if not handle:
+            return {'error': f'unknown broadcast: {data.get("broadcast_id")}',
+                    'broadcasts': list(self._broadcasts)}
+        return await handle.stats()
+
+    @rpc
+    def broadcast_stats(self, data: dict):
+        """Локальная статистика ретранслятора broadcast на этом узле."""
+        relay = self.ctx.memory.broadcasts.get(data.get('broadcast_id'))
+        return relay.snapshot() if relay else None
+
+    @rpc
+    async def run_shard(self, data: dict):
+        """
+        Worker-сторона partitioned-режима: прогнать локальный генератор
+        по своему шарду в локальный @stream_consumer (без STREAM_* пакетов).
+        """
+        service_name = data.get('generator_service')
+        generator_name = data.get('generator')
+        gen_fn = self.ctx.services.get_generator(service_name, generator_name)
+        if not gen_fn:
+            return {'error': f'generator not found on {self.ctx.NODE}: '
+                             f'{service_name}.{generator_name}'}
+
+        init_data, error = _init_data(data)
+        if error:
+            return error
+        # local: consumer на этом же узле — генератор может отдавать
+        # несериализуемые объекты (files.read as='view')
+        gen_data = {**init_data, 'shard': data.get('shard'), 'local': True}
+
+        def _generator():
+            yield from gen_fn(gen_data)
+
+        pipe = self.ctx.memory.create_pipe(buff=data.get('buff', 3))
+        try:
+            self.ctx.network.router.executor.start_local_stream(
+                data.get('service'), data.get('method'), init_data, pipe
+            )
+        except MethodNotFound as e:
+            return {'error': str(e)}
+
+        self.ctx.memory.create_dispatcher([pipe]).start(_generator)
+        self.log.info(
+            f'Shard {data.get("shard")} started: {service_name}.{generator_name} '
+            f'→ {data.get("service")}.{data.get("method")} (pipe {pipe.pipe_id})'
+        )
+        # локальный pipe шарда — его видно в memory.pipe_stats этого узла
+        return {'status': 'started', 'pipe_id': pipe.pipe_id, 'node': self.ctx.NODE}
 
     @rpc
     def list_generators(self, data: dict):
@@ -73,4 +279,88 @@ class Spawner(ModuleGeneric):
         return {
             name: self.ctx.services.list_generators(name)
             for name in self.ctx.services.services
-        }
\ No newline at end of file
+        }
+
+    # ------------------------------------------------------------------ #
+    #  Многостадийные pipeline'ы: generate → map (B..D) → reduce (E)
+    # ------------------------------------------------------------------ #
+
+    @rpc
+    async def pipeline(self, data: dict):
+        """
+        Запустить pipeline. Генератор работает на этом узле, каждая стадия —
+        @stream_consumer на своих узлах, пере-эмит через ctx['emit'].
+
+        data: {generator_service, generator, init_data,
+               stages: [{service, stream, nodes: [...], buff, data}, ...]}
+        """
+        service_name = data.get('generator_service')
+        generator_name = data.get('generator')
+        init_data, error = _init_data(data)
+        if error:
+            return error
+
+        gen_fn = self.ctx.services.get_generator(service_name, generator_name)
+        if not gen_fn:
+            return {
+                'error': f'generator not found: {service_name}.{generator_name}',
+                'available': self.ctx.services.list_generators(service_name),
+            }
+
+        stages = [PipelineStage.from_dict(s) for s in data.get('stages', [])]
+        if not stages:
+            return {'error': 'pipeline needs at least one stage'}
+        empty = [i for i, s in enumerate(stages) if not s.nodes]
+        if empty:
+            return {'error': f'stages without nodes: {empty}'}
+
+        def _generator():
+            yield from gen_fn(init_data)
+
+        handle = PipelineHandle(self.ctx, stages).start(_generator)
+        self._pipelines[handle.pipeline_id] = handle
+        # handle снимается через STATS_RETENTION после конца последней стадии
+        # (pipeline_done); если стадия 0 не открылась — после конца генератора
+        def _generator_done(h: PipelineHandle):
+            if h.failed:
+                self._forget_pipeline(h)
+
+        handle.on_generator_done(_generator_done)
+        self.log.info(
+            f'Pipeline {handle.pipeline_id[:8]} started: '
+            + ' → '.join(f'{s.service}.{s.stream}{s.nodes}' for s in stages)
+        )
+        return {'status': 'started', 'pipeline_id': handle.pipeline_id,
+                'stages': len(stages)}
+
+    def _forget_pipeline(self, handle: PipelineHandle):
+        asyncio.get_running_loop().call_later(
+            STATS_RETENTION, self._pipelines.pop, handle.pipeline_id, None)
+
+    @rpc
+    def pipeline_done(self, data: dict):
+        """Узел последней стадии закончил: {'pipeline_id', 'node', 'error'}."""
+        handle = self._pipelines.get(data.get('pipeline_id'))
+        if handle and handle.last_stage_done(data.get('node')):
+            self.log.info(f'Pipeline {handle.pipeline_id[:8]} finished')
+            self._forget_pipeline(handle)
+        return {'ok': True}
+
+    @rpc
+    async def pipeline_status(self, data: dict):
+        """Per-stage throughput pipeline (вызывать на origin-узле)."""
+        handle = self._pipelines.get(data.get('pipeline_id'))
+        if not handle:
+            return {'error': f'unknown pipeline: {data.get("pipeline_id")}',
+                    'pipelines': list(self._pipelines)}
+        return await handle.stats()
+
+    @rpc
+    def pipeline_stats(self, data: dict):
+        """Локальная статистика стадий pipeline на этом узле."""
+        stage = data.get('stage')
+        return [
+            e.snapshot()
+            for e in self.ctx.memory.pipeline_stages.get(data.get('pipeline_id'), [])
+            if stage is None or e.stats.stage == stage
+        ]
@@ -0,0 +1,157 @@
+# GRID/spill.py — сброс переполнения Pipe на диск
+#
+# Когда in-memory очередь pipe полна, элементы дописываются в append-only
+# сегменты (memory-mapped файлы) и вычитываются обратно строго по порядку.
+# Генератор не останавливается, RAM ограничена buff_len, диск — сегментами,
+# которые удаляются сразу после вычитывания.
+#
+# Формат записи: <u32 длина payload> <u8 kind> <payload (pickle)>
+
+import logging
+import mmap
+import os
+import pickle
+import struct
+import time
+from collections import deque
+from pathlib import Path
+
+log = logging.getLogger('Spill')
+
+_HEADER = struct.Struct('<IB')
+_ITEM, _SENTINEL = 0, 1
+
+
+class _Segment:
+    """Один файл сегмента: пишем в хвост, читаем с головы."""
+
+    def __init__(self, path: Path, size: int):
+        self.path = path
+        self.size = size
+        self._file = open(path, 'w+b')
+        self._file.truncate(size)
+        self.mm = mmap.mmap(self._file.fileno(), size)
+        self.write_off = 0
+        self.read_off = 0
+
+    def fits(self, length: int) -> bool:
+        return self.write_off + length <= self.size
+
+    def append(self, record: bytes):
+        end = self.write_off + len(record)
+        self.mm[self.write_off:end] = record
+        self.write_off = end
+
+    def read(self) -> tuple[int, bytes]:
+        length, kind = _HEADER.unpack_from(self.mm, self.read_off)
+        start = self.read_off + _HEADER.size
+        payload = self.mm[start:start + length]
+        self.read_off = start + length
+        return kind, payload
+
+    @property
+    def drained(self) -> bool:
+        return self.read_off >= self.write_off
+
+    @property
+    def pending_bytes(self) -> int:
+        return self.write_off - self.read_off
+
+    def close(self):
+        self.mm.close()
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except OSError as e:
+            log.warning(f'segment {self.path.name} not removed: {e}')
+
+
+class SpillFile:
+    """
+    Очередь переполнения pipe на диске из mmap-сегментов.
+    push() — в хвост, pop() — с головы; пустые сегменты удаляются.
+    """
+
+    def __init__(self, directory: Path, name: str, segment_bytes: int = 64 << 20):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.name = name
+        self.segment_bytes = segment_bytes
+        self._segments: deque[_Segment] = deque()
+        self._counter = 0
+        self._items = 0
+        # метрики
+        self.items_written = 0
+        self.items_read = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self.peak_bytes = 0
+        self.started_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return self._items
+
+    @property
+    def bytes_on_disk(self) -> int:
+        return sum(s.pending_bytes for s in self._segments)
+
+    def _new_segment(self, min_size: int) -> _Segment:
+        self._counter += 1
+        path = self.directory / f'{self.name}.{self._counter:06d}.seg'
+        segment = _Segment(path, max(self.segment_bytes, min_size))
+        self._segments.append(segment)
+        log.debug(f'spill segment opened: {path.name} ({segment.size} bytes)')
+        return segment
+
+    def push(self, item, sentinel: bool = False):
+        payload = b'' if sentinel else pickle.dumps(item, pickle.HIGHEST_PROTOCOL)
+        record = _HEADER.pack(len(payload), _SENTINEL if sentinel else _ITEM) + payload
+        tail = self._segments[-1] if self._segments else None
+        if tail is None or not tail.fits(len(record)):
+            tail = self._new_segment(len(record))
+        tail.append(record)
+        self._items += 1
+        self.items_written += 1
+        self.bytes_written += len(record)
+        self.peak_bytes = max(self.peak_bytes, self.bytes_on_disk)
+
+    def pop(self) -> tuple[object, bool]:
+        """(item, is_sentinel) — самый старый элемент."""
+        head = self._segments[0]
+        kind, payload = head.read()
+        if head.drained:
+            if len(self._segments) > 1:
+                self._segments.popleft().close()
+            else:
+                # единственный сегмент вычитан — писать в него с начала
+                head.read_off = head.write_off = 0
+        self._items -= 1
+        self.items_read += 1
+        self.bytes_read += _HEADER.size + len(payload)
+        if kind == _SENTINEL:
+            return None, True
+        return pickle.loads(payload), False
+
+    def clear(self) -> int:
+        dropped = self._items
+        for segment in self._segments:
+            segment.close()
+        self._segments.clear()
+        self._items = 0
+        return dropped
+
+    def close(self):
+        self.clear()
+
+    def stats(self) -> dict:
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        return {
+            'items':         self._items,
+            'bytes_on_disk': self.bytes_on_disk,
+            'peak_bytes':    self.peak_bytes,
+            'segments':      len(self._segments),
+            'items_written': self.items_written,
+            'items_read':    self.items_read,
+            'write_bps':     round(self.bytes_written / elapsed, 1),
+            'read_bps':      round(self.bytes_read / elapsed, 1),
+        }
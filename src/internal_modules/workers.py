@@ -0,0 +1,147 @@
+# GRID/workers.py — пулы потоков и процессов для синхронных @rpc методов
+#
+# @rpc(executor='thread') / @rpc(executor='process', pool='cpu') — метод
+# выполняется в пуле, event loop (маршрутизация, keepalive, стримы) не
+# блокируется. Пул создаётся при первом вызове; размер — workers.pools
+# в config.yaml (0 — по числу CPU).
+#
+# В процесс уходит только data: метод вызывается без экземпляра сервиса
+# (self=None), модуль сервиса импортируется в процессе пула по пути файла.
+# Вызов, дождавшийся свободного worker'а уже после deadline, не выполняется.
+
+import asyncio
+import contextvars
+import importlib.util
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from src.internal_modules.base import ModuleGeneric
+from src.internal_modules.exceptions import RPCTimeout
+from services.rpc import _deadline, rpc
+
+_WAIT_WINDOW = 256   # последних ожиданий в очереди для статистики
+
+
+def _call(fn, data, deadline: float | None):
+    # в новом контексте: time_left() внутри метода видит deadline вызывающего
+    _deadline.set(deadline)
+    return fn(data)
+
+
+def _run_in_thread(fn, data, submitted: float, deadline: float | None):
+    """Точка входа в потоке пула: (ожидание в очереди, результат, просрочен)."""
+    started = time.monotonic()
+    if deadline is not None and started >= deadline:
+        return started - submitted, None, True
+    return started - submitted, contextvars.Context().run(_call, fn, data, deadline), False
+
+
+def _run_in_process(module_name: str, path: str, qualname: str, data,
+                    submitted: float, deadline: float | None):
+    """Точка входа в процессе пула; функция метода ищется по модулю и qualname."""
+    started = time.monotonic()
+    if deadline is not None and started >= deadline:
+        return started - submitted, None, True
+    module = sys.modules.get(module_name)
+    if module is None:
+        # сервисы грузятся ServiceLoader'ом из файла — в новом процессе так же
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+    fn = module
+    for part in qualname.split('.'):
+        fn = getattr(fn, part)
+    return started - submitted, _call(lambda d: fn(None, d), data, deadline), False
+
+
+class WorkerPool:
+    def __init__(self, name: str, kind: str, workers: int):
+        self.name    = name
+        self.kind    = kind
+        self.workers = workers or os.cpu_count() or 1
+        if kind == 'thread':
+            self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix=f'rpc-{name}')
+        else:
+            self.executor = ProcessPoolExecutor(self.workers)
+        self.pending = 0          # отправлено в пул и ещё не завершено
+        self.done    = 0
+        self.failed  = 0
+        self.expired = 0          # deadline истёк в очереди
+        self.waits: deque = deque(maxlen=_WAIT_WINDOW)
+
+    def stats(self) -> dict:
+        waits = self.waits
+        return {
+            'kind':     self.kind,
+            'workers':  self.workers,
+            'pending':  self.pending,
+            'queued':   max(0, self.pending - self.workers),
+            'done':     self.done,
+            'failed':   self.failed,
+            'expired':  self.expired,
+            'wait_avg': sum(waits) / len(waits) if waits else 0.0,
+            'wait_max': max(waits, default=0.0),
+        }
+
+
+class Workers(ModuleGeneric):
+    def __init__(self, name: str, context):
+        super().__init__(name, context)
+        self._pools: dict[str, WorkerPool] = {}
+
+    async def stop(self):
+        for pool in self._pools.values():
+            pool.executor.shutdown(wait=False, cancel_futures=True)
+        self._pools.clear()
+
+    def pool(self, kind: str, name: str) -> WorkerPool:
+        pool = self._pools.get(name)
+        if pool is None:
+            workers = self.ctx.config.workers.pools.get(name, 0)
+            pool = self._pools[name] = WorkerPool(name, kind, workers)
+            self.log.info(f'Pool {name}: {pool.workers} {kind} workers')
+        elif pool.kind != kind:
+            raise ValueError(f'pool {name} is a {pool.kind} pool, not {kind}')
+        return pool
+
+    async def run(self, policy: tuple, fn, data, remaining: float | None = None):
+        """Выполнить синхронный метод в пуле policy = (executor, pool)."""
+        kind, name = policy
+        pool = self.pool(kind, name)
+        submitted = time.monotonic()
+        deadline = None if remaining is None else submitted + remaining
+        if kind == 'thread':
+            job = (_run_in_thread, fn, data, submitted, deadline)
+        else:
+            func = fn.__func__
+            job = (_run_in_process, func.__module__, sys.modules[func.__module__].__file__,
+                   func.__qualname__, data, submitted, deadline)
+
+        pool.pending += 1
+        try:
+            waited, result, expired = await asyncio.get_running_loop().run_in_executor(
+                pool.executor, *job)
+        except Exception:
+            pool.failed += 1
+            raise
+        finally:
+            pool.pending -= 1
+        pool.waits.append(waited)
+        if expired:
+            pool.expired += 1
+            raise RPCTimeout(f'{fn.__qualname__} in pool {name}', round(waited, 3))
+        pool.done += 1
+        return result
+
+    # ------------------------------------------------------------------ #
+    #  RPC API
+    # ------------------------------------------------------------------ #
+
+    @rpc
+    def stats(self, data: dict):
+        """Пулы узла: размер, очередь, ожидание в очереди (сек)."""
+        return {name: pool.stats() for name, pool in self._pools.items()}
@@ -0,0 +1,254 @@
+# GRID/link_scheduler.py — очередь отправки на одно WS-соединение
+#
+# Все пакеты на соединение проходят через один LinkScheduler:
+#   control — строгий приоритет: keepalive, handshake, gossip, ACK, CANCEL
+#   rpc     — REQUEST / RESPONSE / ERROR / STREAM_OPEN / READY
+#   bulk    — данные стримов (STREAM_CHUNK / STREAM_EOF)
+# rpc и bulk делят соединение по весам (deficit round-robin в байтах), внутри
+# класса — DRR между label'ами, так что параллельные стримы идут поровну,
+# а порядок пакетов одного label сохраняется.
+#
+# Пока соединение свободно и очередь пуста, пакет пишется сразу — без
+# задачи-писателя; очередь появляется только когда отправители конкурируют.
+# Байты пакетов в очереди учитываются в MemoryBudget узла.
+
+import asyncio
+import logging
+import weakref
+from collections import deque
+from typing import Optional
+
+from src.networking.protocol import MsgPack, PackType
+
+log = logging.getLogger('LinkScheduler')
+
+CONTROL = 'control'
+RPC = 'rpc'
+BULK = 'bulk'
+PRIORITIES = (CONTROL, RPC, BULK)
+
+_CONTROL_TYPES = {
+    PackType.PING, PackType.PONG,
+    PackType.HELLO, PackType.HELLO_ACK, PackType.HELLO_REJECT,
+    PackType.GOSSIP, PackType.ANNOUNCE, PackType.CERT_SYNC,
+    PackType.SHM_LINK, PackType.CANCEL, PackType.STREAM_ACK,
+}
+_BULK_TYPES = {PackType.STREAM_CHUNK, PackType.STREAM_EOF}
+
+
+def classify(pack: MsgPack) -> str:
+    """Класс пакета: pack.priority, если задан, иначе по типу."""
+    if pack.priority in PRIORITIES:
+        return pack.priority
+    if pack.type in _CONTROL_TYPES:
+        return CONTROL
+    if pack.type in _BULK_TYPES:
+        return BULK
+    return RPC
+
+
+# ------------------------------------------------------------------ #
+#  Deficit round-robin
+# ------------------------------------------------------------------ #
+
+class _Flow:
+    """FIFO одного label: (payload, size, future, priority)."""
+
+    def __init__(self):
+        self.items: deque = deque()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def head_size(self) -> int:
+        return self.items[0][1]
+
+    def pop(self):
+        return self.items.popleft()
+
+
+class _Drr:
+    """
+    Deficit round-robin по ключам. Дети — _Flow или вложенный _Drr
+    (нужны только __len__ / head_size / pop). quantum(key) — байт за обход.
+    """
+
+    def __init__(self, quantum):
+        self.quantum = quantum
+        self.children: dict = {}
+        self.active: deque = deque()
+        self.deficit: dict = {}
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def child(self, key, factory):
+        child = self.children.get(key)
+        if child is None:
+            child = self.children[key] = factory()
+        return child
+
+    def activate(self, key):
+        """Ключ получил элемент: встать в очередь обхода, если ещё не в ней."""
+        self._len += 1
+        if key not in self.deficit:
+            self.deficit[key] = 0
+            self.active.append(key)
+
+    def _settle(self):
+        """Довести обход до ключа, который обслуживается следующим."""
+        while True:
+            key = self.active[0]
+            if self.deficit[key] >= self.children[key].head_size():
+                return key
+            self.deficit[key] += self.quantum(key)
+            self.active.rotate(-1)
+
+    def head_size(self) -> int:
+        return self.children[self._settle()].head_size()
+
+    def pop(self):
+        key = self._settle()
+        child = self.children[key]
+        self.deficit[key] -= child.head_size()
+        item = child.pop()
+        self._len -= 1
+        if not len(child):
+            # опустевший ключ теряет накопленный дефицит (классический DRR)
+            self.active.popleft()
+            del self.deficit[key]
+            if isinstance(child, _Flow):
+                del self.children[key]
+        return item
+
+
+# ------------------------------------------------------------------ #
+#  LinkScheduler
+# ------------------------------------------------------------------ #
+
+class LinkScheduler:
+    # веса rpc / bulk и квант DRR (байт); выставляет NetworkModule из config
+    weights = {RPC: 4, BULK: 1}
+    quantum = 16 << 10
+    # бюджет памяти узла: в нём — сериализованные пакеты, ждущие записи
+    budget = None
+
+    _links: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def configure(cls, weights: dict, quantum: int, budget=None):
+        cls.weights = {RPC: max(1, weights.get(RPC, 4)), BULK: max(1, weights.get(BULK, 1))}
+        cls.quantum = max(1, quantum)
+        cls.budget = budget
+
+    @classmethod
+    def for_ws(cls, websocket) -> 'LinkScheduler':
+        """Один планировщик на соединение, сколько бы транспортов его ни оборачивало."""
+        link = cls._links.get(websocket)
+        if link is None:
+            link = cls._links[websocket] = cls(websocket)
+        return link
+
+    def __init__(self, websocket):
+        self.ws = websocket
+        # FastAPI WebSocket (server-side) — send_text, websockets (client-side) — send
+        self._write_fn = websocket.send_text if hasattr(websocket, 'send_text') else websocket.send
+        self._control: deque = deque()
+        self._classes = _Drr(lambda cls: self.weights[cls] * self.quantum)
+        self._busy = False
+        self._writer: Optional[asyncio.Task] = None
+        self.sent = {CONTROL: 0, RPC: 0, BULK: 0}
+        self.sent_bytes = {CONTROL: 0, RPC: 0, BULK: 0}
+        self.queued_max = 0
+        self.queued_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._control) + len(self._classes)
+
+    async def send(self, pack: MsgPack):
+        """Поставить пакет в очередь соединения; возвращает когда он записан."""
+        priority = classify(pack)
+        payload = pack.model_dump_json()
+        if not self._busy and not len(self):
+            # соединение свободно — без очереди
+            self._busy = True
+            try:
+                await self._write_fn(payload)
+            finally:
+                self._busy = False
+                if len(self):
+                    self._kick()
+            self._count(priority, len(payload))
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        item = (payload, len(payload), future, priority)
+        if priority == CONTROL:
+            self._control.append(item)
+        else:
+            flows = self._classes.child(priority, lambda: _Drr(lambda _label: self.quantum))
+            flows.child(pack.label, _Flow).items.append(item)
+            flows.activate(pack.label)
+            self._classes.activate(priority)
+        self.queued_max = max(self.queued_max, len(self))
+        self._account(len(payload))
+        self._kick()
+        await future
+
+    def _kick(self):
+        if not self._busy and (self._writer is None or self._writer.done()):
+            self._writer = asyncio.create_task(self._drain())
+
+    def _account(self, size: int):
+        self.queued_bytes += size
+        if self.budget is not None:
+            self.budget.add(size)
+
+    def _next(self):
+        """Снять следующий пакет из очереди (его байты уходят из бюджета)."""
+        item = self._control.popleft() if self._control else self._classes.pop()
+        self._account(-item[1])
+        return item
+
+    async def _drain(self):
+        while len(self) and not self._busy:
+            payload, size, future, priority = self._next()
+            if future.cancelled():
+                continue
+            self._busy = True
+            try:
+                await self._write_fn(payload)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                self._fail_all(e)
+                return
+            finally:
+                self._busy = False
+            self._count(priority, size)
+            if not future.done():
+                future.set_result(None)
+
+    def _fail_all(self, error: Exception):
+        """Соединение не пишется: ожидающие отправители получают ошибку."""
+        while len(self):
+            future = self._next()[2]
+            if not future.done():
+                future.set_exception(error)
+
+    def _count(self, priority: str, size: int):
+        self.sent[priority] += 1
+        self.sent_bytes[priority] += size
+
+    def stats(self) -> dict:
+        return {
+            'queued':     {CONTROL: len(self._control),
+                           **{cls: len(self._classes.children.get(cls) or ())
+                              for cls in (RPC, BULK)}},
+            'queued_max': self.queued_max,
+            'queued_bytes': self.queued_bytes,
+            'sent':       dict(self.sent),
+            'bytes':      dict(self.sent_bytes),
+            'weights':    dict(self.weights),
+        }
@@ -2,6 +2,7 @@
 
 import logging
 import time
+from collections import deque
 from enum import Enum
 from typing import Dict, List, Optional
 
@@ -11,6 +12,24 @@ log = logging.getLogger('NeighborTable')
 
 PROTOCOL_VERSION = "1.0"
 
+RTT_ALPHA  = 0.2   # вес нового замера в EWMA
+RTT_WINDOW = 64    # замеров для перцентиля
+# новый via принимается, только если путь через него заметно быстрее
+VIA_SWITCH_RATIO = 0.8
+# изменений, по которым ещё можно отдать дельту от старой версии
+CHANGES_WINDOW = 256
+# поля NeighborInfo, которые меняются без роста version (замеры и last_ts):
+# в ответы с version не входят, отдаются отдельно (netinfo.neighbor_metrics)
+VOLATILE_FIELDS = {'last_ts', 'rtt', 'rtt_p95', 'path_rtt', 'load'}
+
+
+def percentile(samples, q: float) -> float | None:
+    """q-перцентиль (0..1) по ближайшему рангу; None для пустой выборки."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
 
 class NeighborStatus(str, Enum):
     CONNECTED   = "connected"    # прямое WS соединение
@@ -28,6 +47,12 @@ class NeighborInfo(BaseModel):
     session_id: Optional[str]   = None
     version:    str             = PROTOCOL_VERSION
     services:   List[str]       = []       # сервисы на этой ноде
+    # задержка (секунды): rtt / rtt_p95 — замеры PING/PONG прямого линка,
+    # path_rtt — для KNOWN: rtt до via + задержка via → узел из его gossip
+    rtt:        Optional[float] = None
+    rtt_p95:    Optional[float] = None
+    path_rtt:   Optional[float] = None
+    load:       Optional[int]   = None     # выполняющихся запросов (из PONG)
 
     # UNUSED: свойство uri не используется в проекте.
     # При необходимости: ws://{host}:{port}/ws/{node_id}
@@ -40,6 +65,13 @@ class NeighborTable:
     def __init__(self, own_node_id: str):
         self.own_node_id = own_node_id
         self._table: Dict[str, NeighborInfo] = {}
+        # последние замеры RTT прямых линков: node_id → deque
+        self._rtt_samples: Dict[str, deque] = {}
+        # версия таблицы: растёт при смене состава, статуса, via и сервисов
+        # (замеры rtt / load / last_ts её не меняют). Начинается с текущего
+        # времени в мс — после перезапуска не повторяет старые значения
+        self.version = int(time.time() * 1000)
+        self._changes: deque = deque(maxlen=CHANGES_WINDOW)   # (version, node_id)
 
     # ------------------------------------------------------------------ #
     #  Регистрация
@@ -60,12 +92,14 @@ class NeighborTable:
             services   = services or [],
         )
         self._table[node_id] = info
+        self._changed(node_id)
         log.info(f'Registered connected: {node_id} ({host}:{port})')
         return info
 
     def register_known(self, node_id: str, host: str, port: int,
                        via: str, version: str = PROTOCOL_VERSION,
-                       services: List[str] = None) -> NeighborInfo:
+                       services: List[str] = None,
+                       path_rtt: Optional[float] = None) -> NeighborInfo:
         # не перезаписывать connected более слабым known
         existing = self._table.get(node_id)
         if existing and existing.status == NeighborStatus.CONNECTED:
@@ -80,8 +114,10 @@ class NeighborTable:
             last_ts  = time.time(),
             version  = version,
             services = services or [],
+            path_rtt = path_rtt,
         )
         self._table[node_id] = info
+        self._changed(node_id)
         log.debug(f'Registered known: {node_id} via {via}')
         return info
 
@@ -98,6 +134,8 @@ class NeighborTable:
     def mark_unreachable(self, node_id: str):
         info = self._table.get(node_id)
         if info:
+            if info.status != NeighborStatus.UNREACHABLE:
+                self._changed(node_id)
             info.status = NeighborStatus.UNREACHABLE
             log.warning(f'Marked unreachable: {node_id}')
 
@@ -108,17 +146,78 @@ class NeighborTable:
             info.session_id = session_id
             info.last_ts    = time.time()
             info.via        = None
+            self._changed(node_id)
+
+    def record_rtt(self, node_id: str, rtt: float):
+        """Замер PING/PONG прямого линка: обновить EWMA и p95."""
+        info = self._table.get(node_id)
+        if not info:
+            return
+        samples = self._rtt_samples.setdefault(node_id, deque(maxlen=RTT_WINDOW))
+        samples.append(rtt)
+        info.rtt = rtt if info.rtt is None else (1 - RTT_ALPHA) * info.rtt + RTT_ALPHA * rtt
+        info.rtt_p95 = percentile(samples, 0.95)
+
+    def rtt_score(self, node_id: str) -> Optional[float]:
+        """
+        Оценка задержки до узла (сек): p95 прямого линка, для KNOWN —
+        path_rtt. None — замеров ещё нет.
+        """
+        info = self._table.get(node_id)
+        if not info:
+            return None
+        if info.status == NeighborStatus.CONNECTED:
+            return info.rtt_p95 if info.rtt_p95 is not None else info.rtt
+        if info.status == NeighborStatus.KNOWN:
+            return info.path_rtt
+        return None
+
+    def rank(self, node_ids: List[str]) -> List[str]:
+        """Узлы по возрастанию задержки; без замеров — в конце, в исходном порядке."""
+        def key(node_id):
+            score = self.rtt_score(node_id)
+            return (score is None, score or 0.0)
+        return sorted(node_ids, key=key)
 
     def update_services(self, node_id: str, services: List[str]):
         info = self._table.get(node_id)
         if info:
+            if info.services != services:
+                self._changed(node_id)
             info.services = services
             log.debug(f'Services updated for {node_id}: {services}')
 
+    def update_load(self, node_id: str, load: int):
+        info = self._table.get(node_id)
+        if info:
+            info.load = load
+
     def remove(self, node_id: str):
-        self._table.pop(node_id, None)
+        if self._table.pop(node_id, None) is not None:
+            self._changed(node_id)
+        self._rtt_samples.pop(node_id, None)
         log.info(f'Removed neighbor: {node_id}')
 
+    def _changed(self, node_id: str):
+        self.version += 1
+        self._changes.append((self.version, node_id))
+
+    def changes_since(self, version: int) -> set[str] | None:
+        """
+        Узлы, изменившиеся после version (удалённые — тоже). None — version
+        из другого запуска, старше окна изменений или не int (пришла от
+        клиента как есть): нужна полная таблица.
+        """
+        if not isinstance(version, int) or isinstance(version, bool):
+            return None
+        if version > self.version:
+            return None
+        if version == self.version:
+            return set()
+        if not self._changes or self._changes[0][0] > version + 1:
+            return None
+        return {node_id for changed_at, node_id in self._changes if changed_at > version}
+
     # ------------------------------------------------------------------ #
     #  Запросы
     # ------------------------------------------------------------------ #
@@ -144,6 +243,16 @@ class NeighborTable:
         """Найти ноды с нужным сервисом."""
         return [n for n in self._table.values() if service in n.services]
 
+    @staticmethod
+    def stable(info: NeighborInfo) -> dict:
+        """NeighborInfo без VOLATILE_FIELDS — то, что покрывает version."""
+        return info.model_dump(exclude=VOLATILE_FIELDS)
+
+    def metrics(self) -> Dict[str, dict]:
+        """Замеры по узлам: node_id → last_ts / rtt / rtt_p95 / path_rtt / load."""
+        return {node_id: n.model_dump(include=VOLATILE_FIELDS)
+                for node_id, n in self._table.items()}
+
     # ------------------------------------------------------------------ #
     #  Gossip
     # ------------------------------------------------------------------ #
@@ -157,15 +266,45 @@ class NeighborTable:
                and n.node_id != self.own_node_id
         ]
 
+    def _path_cost(self, entry: dict, from_node: str) -> Optional[float]:
+        """Задержка до узла из gossip-записи при пересылке через from_node."""
+        hop = self.rtt_score(from_node)
+        if entry.get('status') == NeighborStatus.CONNECTED:
+            tail = entry.get('rtt_p95') or entry.get('rtt')
+        else:
+            tail = entry.get('path_rtt')
+        if hop is None or tail is None:
+            return None
+        return hop + tail
+
     def merge_gossip(self, neighbors: List[dict], from_node: str):
-        """Смержить входящую таблицу соседей."""
-        added = 0
+        """
+        Смержить входящую таблицу соседей. Для уже известных KNOWN узлов via
+        меняется на from_node, если путь через него заметно быстрее (по RTT).
+        """
+        added = rerouted = 0
         for entry in neighbors:
             node_id = entry.get('node_id')
             if not node_id or node_id == self.own_node_id:
                 continue
-            if node_id in self._table:
-                continue  # уже знаем — не перезаписываем
+            # split horizon: маршрут from_node через нас не годится
+            if entry.get('via') == self.own_node_id:
+                continue
+            cost = self._path_cost(entry, from_node)
+            existing = self._table.get(node_id)
+            if existing:
+                if existing.status != NeighborStatus.KNOWN or cost is None:
+                    continue
+                if existing.via == from_node:
+                    existing.path_rtt = cost
+                elif existing.path_rtt is None or cost < existing.path_rtt * VIA_SWITCH_RATIO:
+                    log.info(f'Route to {node_id}: via {existing.via} → {from_node} '
+                             f'({existing.path_rtt} → {cost:.4f}s)')
+                    existing.via = from_node
+                    existing.path_rtt = cost
+                    self._changed(node_id)
+                    rerouted += 1
+                continue
             self.register_known(
                 node_id  = node_id,
                 host     = entry.get('host', ''),
@@ -173,7 +312,8 @@ class NeighborTable:
                 via      = from_node,
                 version  = entry.get('version', PROTOCOL_VERSION),
                 services = entry.get('services', []),
+                path_rtt = cost,
             )
             added += 1
-        if added:
-            log.info(f'Gossip from {from_node}: +{added} new neighbors')
\ No newline at end of file
+        if added or rerouted:
+            log.info(f'Gossip from {from_node}: +{added} new neighbors, {rerouted} rerouted')
\ No newline at end of file
@@ -9,9 +9,11 @@ from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from typing import Dict
 
 from src.internal_modules.base import ModuleGeneric
+from src.networking.link_scheduler import LinkScheduler
 from src.networking.neighbor_table import PROTOCOL_VERSION, NeighborTable
 from src.networking.protocol import MsgPack, PackType
 from src.networking.router import Router
+from src.networking.shm_link import ShmLinkManager
 from src.networking.transport import WebSocketTransport
 
 log = logging.getLogger('Network')
@@ -41,7 +43,7 @@ class ConnectionManager:
 
     async def broadcast(self, pack: MsgPack):
         for ws in self.active_connections:
-            await ws.send_json(pack.model_dump())
+            await WebSocketTransport(ws).send(pack)
 
 
 class NodesManager:
@@ -72,10 +74,15 @@ class NetworkModule(ModuleGeneric):
         self.nodes_manager: NodesManager = NodesManager()
         self.neighbor_table = NeighborTable(own_node_id=context.NODE)
         self.router = Router(self.nodes_manager, context)
+        cfg = context.config.network
+        self.shm = ShmLinkManager(context, enabled=cfg.shm, ring_bytes=cfg.shm_ring_mb << 20)
+        LinkScheduler.configure(cfg.link_weights, cfg.link_quantum_kb << 10,
+                                context.memory.budget)
         self._server        = None
         self._task          = None
         self._gossip_task   = None
         self._announce_task = None
+        self._rtt_task      = None
         self._register_routes()
 
     def _register_routes(self):
@@ -148,6 +155,8 @@ class NetworkModule(ModuleGeneric):
                         'session_id': session_id,
                         'services':   list(self.ctx.services.services.keys()),
                         'neighbors':  self.neighbor_table.to_gossip(),
+                        # подтверждение что мы на одном хосте (см. shm_link.py)
+                        'colocation': self.shm.answer_probe(hello_data.get('colocation')),
                     }
                 ))
                 self.log.info(f'Node {node_id} accepted (session={session_id[:8]})')
@@ -176,6 +185,7 @@ class NetworkModule(ModuleGeneric):
                 if current and current.ws is websocket:
                     self.nodes_manager.remove(node_id)
                     self.neighbor_table.mark_unreachable(node_id)
+                    self.shm.drop(node_id)
                 # Очистить pending-ответы для этого WS в любом случае
                 self.router.cleanup_ws_pending(websocket)
                 self.conn_manager.disconnect(websocket)
@@ -193,12 +203,14 @@ class NetworkModule(ModuleGeneric):
         self._task   = asyncio.create_task(self._server.serve())
         self._gossip_task   = asyncio.create_task(self._gossip_loop())
         self._announce_task = asyncio.create_task(self._announce_loop())
+        self._rtt_task      = asyncio.create_task(self._rtt_loop())
         self.log.info(f'Started on {self.host}:{self.port}')
 
     async def stop(self):
-        for task in (self._gossip_task, self._announce_task):
+        for task in (self._gossip_task, self._announce_task, self._rtt_task):
             if task:
                 task.cancel()
+        self.shm.close_all()
         if self._server:
             self._server.should_exit = True
         if self._task:
@@ -249,6 +261,18 @@ class NetworkModule(ModuleGeneric):
                     except Exception as e:
                         self.log.error(f'Announce to {node.node_id} failed: {e}')
 
+    async def _rtt_loop(self):
+        """Каждые rtt_interval с мерить RTT до connected нод (PING/PONG)."""
+        interval = self.ctx.config.network.rtt_interval
+        while True:
+            await asyncio.sleep(interval)
+            nodes = [n.node_id for n in self.neighbor_table.connected()]
+            rtts = await asyncio.gather(*(self.router.ping(node_id, timeout=interval)
+                                          for node_id in nodes))
+            for node_id, rtt in zip(nodes, rtts):
+                if rtt is not None:
+                    self.neighbor_table.record_rtt(node_id, rtt)
+
     # ------------------------------------------------------------------ #
     #  CERT_SYNC on-connect
     # ------------------------------------------------------------------ #
@@ -314,9 +338,30 @@ class NetworkModule(ModuleGeneric):
         await connector.start()
         self.log.info(f'Dynamic connection initiated → {node_id} ({target_uri})')
 
-    async def call(self, dst: str, service: str, method: str, data=None, timeout: int = 10):
-        """Single RPC вызов."""
-        return await self.router.call(dst, service, method, data, timeout)
+    async def call(self, dst: str, service: str, method: str, data=None,
+                   timeout: float | None = None, priority: str | None = None,
+                   adaptive: bool | None = None):
+        """
+        Single RPC вызов. timeout=None — адаптивный (RTT + история метода,
+        до call_timeout_min; adaptive=False и network.adaptive_exempt —
+        не меньше call_timeout).
+        priority — класс очереди соединения (control / rpc / bulk).
+        """
+        return await self.router.call(dst, service, method, data, timeout, priority, adaptive)
+
+    async def call_batch(self, dst: str, calls: list[dict], timeout: float | None = None,
+                         priority: str | None = None,
+                         adaptive: bool | None = None) -> list[dict]:
+        """Несколько RPC к одному узлу одним пакетом (REQUEST_BATCH)."""
+        return await self.router.call_batch(dst, calls, timeout, priority, adaptive)
+
+    async def call_service(self, service: str, method: str, data=None,
+                           timeout: float | None = None, hedge: bool | None = None,
+                           retries: int | None = None, priority: str | None = None,
+                           adaptive: bool | None = None):
+        """RPC вызов по имени сервиса: реплику выбирает Router (RTT, очередь, нагрузка)."""
+        return await self.router.call_service(service, method, data, timeout,
+                                              hedge, retries, priority, adaptive)
 
     async def stream(self, dst: str, service: str, method: str,
                      data=None, timeout: int = 30):
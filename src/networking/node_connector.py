@@ -106,6 +106,7 @@ class NodeConnector(ModuleGeneric):
                     self.log.error(f'Connector error ({self.peer_node_id}): {e}')
             finally:
                 self._ws = None
+                self.ctx.network.shm.drop(self.peer_node_id)
                 self.ctx.network.router.unregister_client_ws(self.peer_node_id)
                 self.ctx.network.neighbor_table.mark_unreachable(self.peer_node_id)
                 await asyncio.sleep(5)
@@ -124,6 +125,7 @@ class NodeConnector(ModuleGeneric):
                 'version':    PROTOCOL_VERSION,
                 'session_id': str(uuid.uuid4()),
                 'services':   list(self.ctx.services.services.keys()),
+                'colocation': self.ctx.network.shm.probe(),
             }
         )
         await ws.send(hello.model_dump_json())
@@ -133,7 +135,7 @@ class NodeConnector(ModuleGeneric):
             pack = MsgPack(**json.loads(raw))
 
             if pack.type == PackType.HELLO_ACK:
-                await self._on_hello_ack(pack)
+                await self._on_hello_ack(pack, ws)
                 return True
             elif pack.type == PackType.HELLO_REJECT:
                 self.log.warning(
@@ -145,7 +147,7 @@ class NodeConnector(ModuleGeneric):
             self.log.error(f'Handshake timeout with {self.peer_node_id}')
         return False
 
-    async def _on_hello_ack(self, pack: MsgPack):
+    async def _on_hello_ack(self, pack: MsgPack, ws):
         """Обработать HELLO_ACK — смержить соседей и сервисы."""
         data = pack.data or {}
 
@@ -169,6 +171,11 @@ class NodeConnector(ModuleGeneric):
             f'+{len(neighbors)} neighbors'
         )
 
+        # сосед на этом же хосте — данные стримов пустить через shared memory
+        shm = self.ctx.network.shm
+        if shm.verify(data.get('colocation')):
+            asyncio.create_task(shm.offer(self.peer_node_id, ws))
+
     # ------------------------------------------------------------------ #
     #  Keepalive
     # ------------------------------------------------------------------ #
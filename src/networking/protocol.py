@@ -1,9 +1,10 @@
 # GRID/protocol.py
 
+import time
 import uuid
 from enum import Enum
 from typing import Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 
 class PackType(str, Enum):
@@ -24,6 +25,9 @@ class PackType(str, Enum):
     GOSSIP       = "gossip"  # периодическая рассылка топологии
     ANNOUNCE     = "announce"  # периодическая рассылка сервисов
     CERT_SYNC    = "cert_sync"  # рассылка digest сертификатов (thumbprint→метаданные)
+    SHM_LINK     = "shm_link"  # предложение / ответ shared-memory канала (co-located узлы)
+    CANCEL       = "cancel"  # вызывающий отказался: снять задачу / генератор по label
+    REQUEST_BATCH = "request_batch"  # N вызовов к одному dst: data={'calls': [...]}, ответ — список
 
 
 class MsgPack(BaseModel):
@@ -36,4 +40,30 @@ class MsgPack(BaseModel):
     label:    str = Field(default_factory=lambda: str(uuid.uuid4()))
     error:    str | None = None
     path: list[str] = Field(default_factory=list)  # [Node0, Node1, ...]
-    ttl: int = 16
\ No newline at end of file
+    ttl: int = 16
+    # остаток времени вызывающего (секунды) на момент отправки с узла;
+    # относительный — часы узлов не синхронизированы
+    deadline: float | None = None
+    # класс очереди соединения (control / rpc / bulk), None — по типу пакета
+    priority: str | None = None
+
+    # когда пакет появился на этом узле (монотонные часы узла)
+    _born: float = PrivateAttr(default_factory=time.monotonic)
+
+    def remaining(self) -> float | None:
+        """Остаток deadline за вычетом времени, проведённого на этом узле."""
+        if self.deadline is None:
+            return None
+        return self.deadline - (time.monotonic() - self._born)
+
+    @property
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def spend(self):
+        """Перед отправкой на следующий хоп: списать время этого узла с deadline."""
+        if self.deadline is not None:
+            now = time.monotonic()
+            self.deadline -= now - self._born
+            self._born = now
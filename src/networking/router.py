@@ -3,18 +3,23 @@
 import asyncio
 import inspect
 import logging
+import random
 import time
 import uuid
+from collections import deque
 from dataclasses import dataclass, field
 from typing import Any, AsyncGenerator
 
-from src.internal_modules.exceptions import RPCTimeout
+from src.internal_modules.exceptions import (MemoryBudgetExceeded, NoReplica, Overloaded,
+                                             RPCTimeout, remote_error)
 from src.internal_modules.executor import LocalExecutor, MethodNotFound
 from src.internal_modules.memory import Pipe, _SENTINEL
+from src.networking.neighbor_table import NeighborStatus, percentile
 from src.networking.protocol import MsgPack, PackType
 from src.networking.sessions import SessionTable
 from src.networking.stream_registry import StreamRegistry
 from src.networking.transport import WebSocketTransport
+from services.rpc import time_left
 
 log = logging.getLogger('Router')
 
@@ -23,6 +28,20 @@ DEFAULT_TTL = 16
 # TTL кэша маршрута стрима (секунды)
 _STREAM_ROUTE_TTL = 300
 
+# адаптивный timeout: длительностей на (dst, service, method) и сколько нужно,
+# чтобы доверять их p95
+_DURATION_WINDOW = 32
+_DURATION_MIN_SAMPLES = 5
+# удвоений timeout после таймаутов подряд — не больше (дальше упирается в call_timeout_max)
+_TIMEOUT_BACKOFF_MAX = 8
+
+# выбор реплики: оценка задержки узла без замеров / нижняя граница оценки
+_UNPROBED_COST = 0.05
+_MIN_COST = 0.001
+# ошибки с удалённой стороны (приходят текстом), после которых call_service
+# пробует другую реплику: запрос не выполнялся
+_RETRYABLE_REMOTE = ('No route to host', 'Method not found', 'memory budget exceeded')
+
 
 class NodeNotFound(Exception):
     def __init__(self, node): super().__init__(f'node={node}')
@@ -67,6 +86,16 @@ class Router:
         self._client_ws: dict[str, Any] = {}
         # Кэш маршрутов стримов: label → StreamRoute
         self._stream_routes: dict[str, StreamRoute] = {}
+        # Выполняющиеся входящие REQUEST: label → task (для CANCEL)
+        self._requests: dict[str, asyncio.Task] = {}
+        # пакеты, отброшенные с истёкшим deadline (транзит + исполнение)
+        self.expired_dropped = 0
+        # длительности успешных вызовов: (dst, service, method) → deque секунд
+        self._durations: dict[tuple, deque] = {}
+        # таймауты подряд (в историю не идут): (dst, service, method) → число
+        self._timeouts: dict[tuple, int] = {}
+        # исходящие вызовы без ответа: dst → число
+        self._outstanding: dict[str, int] = {}
 
     def register_client_ws(self, node_id: str, ws):
         """Зарегистрировать client-side WS (от NodeConnector)."""
@@ -92,13 +121,16 @@ class Router:
             log.debug(f'Cleaned {len(to_remove)} pending entries for disconnected WS')
 
     def get_transport_to(self, node_id: str) -> WebSocketTransport | None:
-        """Получить транспорт к узлу (server-side или client-side)."""
+        """Получить транспорт к узлу (server-side или client-side).
+
+        Для co-located соседа с shm-каналом данные стримов пойдут через него.
+        """
         node = self._nodes_mgr.get(node_id)
         if node:
-            return WebSocketTransport(node.ws)
+            return self.context.network.shm.wrap(node_id, WebSocketTransport(node.ws))
         client_ws = self._client_ws.get(node_id)
         if client_ws:
-            return WebSocketTransport(client_ws)
+            return self.context.network.shm.wrap(node_id, WebSocketTransport(client_ws))
         return None
 
     # ------------------------------------------------------------------ #
@@ -118,7 +150,24 @@ class Router:
                 if pack.dst and pack.dst != self.context.NODE:
                     await self._on_remote_request(pack, transport)
                 else:
-                    await self._on_request(pack, transport)
+                    self._start_request(pack, transport)
+
+            case PackType.REQUEST_BATCH:
+                # в транзите тип не меняется (FORWARDED его бы потерял):
+                # пакет от mesh-узла уже несёт path, от WS-клиента — нет
+                if pack.dst and pack.dst != self.context.NODE:
+                    if pack.path:
+                        await self._on_forwarded(pack)
+                    else:
+                        await self._on_remote_request(pack, transport)
+                else:
+                    self._start_request(pack, transport)
+
+            case PackType.CANCEL:
+                if pack.dst and pack.dst != self.context.NODE:
+                    await self._forward_cancel(pack)
+                else:
+                    self._on_cancel(pack)
 
             case PackType.RESPONSE:
                 if pack.label in self._ws_pending:
@@ -142,7 +191,9 @@ class Router:
 
             case PackType.STREAM_READY:
                 # кэшировать маршрут на генераторе при получении READY
-                self._cache_stream_route_on_ready(pack)
+                # (транзитные узлы уже закэшировали маршрут на STREAM_OPEN)
+                if pack.dst == self.context.NODE:
+                    self._cache_stream_route_on_ready(pack)
                 if pack.path:
                     await self._route_back(pack)
                 else:
@@ -158,14 +209,27 @@ class Router:
                 if pack.dst and pack.dst != self.context.NODE:
                     await self._route_back(pack)
                 else:
-                    self.sessions.resolve(f'ack_{pack.label}', 'ack')
+                    self.context.memory.on_stream_ack(pack.label, pack.data)
+                    # buff=0 — служебный ACK прогресса (idle): окно он не
+                    # открывает, иначе в пути оказалось бы больше одного окна
+                    ack = pack.data if isinstance(pack.data, dict) else {}
+                    if ack.get('buff') != 0 or ack.get('done') or ack.get('error'):
+                        self.sessions.resolve(f'ack_{pack.label}', 'ack')
 
             case PackType.STREAM_EOF:
                 if pack.dst and pack.dst != self.context.NODE:
                     await self._forward_stream_data(pack)
                 else:
-                    await self.stream_registry.close(pack.label)
-                    self._stream_routes.pop(pack.label, None)
+                    # маршрут consumer'а нужен для финального ACK —
+                    # его снимет send_stream_ack(final=True)
+                    if not self.stream_registry.get(pack.label):
+                        self._stream_routes.pop(pack.label, None)
+                    eof = pack.data if isinstance(pack.data, dict) else {}
+                    if eof.get('error'):
+                        # генератор упал посреди стрима — читатель получит исключение
+                        await self.stream_registry.fail(pack.label, eof['error'])
+                    else:
+                        await self.stream_registry.close(pack.label, cancel=eof.get('cancel', False))
 
             # --- /Stream --- #
 
@@ -176,7 +240,7 @@ class Router:
                 elif pack.path:
                     await self._route_back(pack)
                 else:
-                    self.sessions.resolve(pack.label, Exception(pack.error))
+                    self.sessions.resolve(pack.label, remote_error(pack.error))
 
             case PackType.GOSSIP:
                 neighbors = (pack.data or {}).get('neighbors', [])
@@ -200,17 +264,25 @@ class Router:
                     from_node, certs_digest, sync_version
                 )
 
+            case PackType.SHM_LINK:
+                await self.context.network.shm.on_link(pack, transport)
+
             case PackType.PING:
                 response = MsgPack(
                     type   = PackType.PONG,
                     source = self.context.NODE,
                     dst    = pack.source,
                     label  = pack.label,
-                    path   = list(reversed(pack.path)) if pack.path else [],
+                    path   = list(pack.path),
+                    # нагрузка для выбора реплики (call_service)
+                    data   = {'load': len(self._requests)},
                 )
                 await self._send_back(response, pack)
 
             case PackType.PONG:
+                load = (pack.data or {}).get('load')
+                if load is not None:
+                    self.context.network.neighbor_table.update_load(pack.source, load)
                 self.sessions.resolve(pack.label, 'pong')
 
     # ------------------------------------------------------------------ #
@@ -236,9 +308,10 @@ class Router:
         pack.path.append(self.context.NODE)
 
         if pack.dst == self.context.NODE:
-            pack.type = PackType.REQUEST
+            if pack.type == PackType.FORWARDED:
+                pack.type = PackType.REQUEST
             transport = self._make_transport_back(pack)
-            await self._on_request(pack, transport)
+            self._start_request(pack, transport)
             return
 
         await self._forward(pack)
@@ -265,48 +338,126 @@ class Router:
             )
             await transport.send(err)
 
+    def _start_request(self, pack: MsgPack, transport):
+        """
+        Выполнить REQUEST в отдельной задаче: цикл чтения соединения не ждёт
+        метод, а CANCEL с тем же label может его прервать.
+        """
+        task = asyncio.create_task(self._on_request(pack, transport))
+        self._requests[pack.label] = task
+        task.add_done_callback(lambda _t: self._requests.pop(pack.label, None))
+
+    def _drop_expired(self, pack: MsgPack) -> bool:
+        """Deadline вызывающего истёк: работа бесполезна, пакет не обрабатывается."""
+        if not pack.expired:
+            return False
+        self.expired_dropped += 1
+        log.info(
+            f'[deadline] {pack.type.value} {pack.service}.{pack.method} '
+            f'label={pack.label[:8]} from {pack.source} expired at '
+            f'{self.context.NODE} ({pack.remaining():.3f}s) — dropped'
+        )
+        return True
+
     async def _on_request(self, pack: MsgPack, transport):
+        if self._drop_expired(pack):
+            return
         try:
-            result = await self.executor.execute(pack)
+            if pack.type == PackType.REQUEST_BATCH:
+                result = await self.executor.execute_batch(pack)
+            else:
+                result = await self.executor.execute(pack)
 
             if inspect.isasyncgen(result):
-                async for chunk in result:
-                    chunk_pack = MsgPack(
-                        type    = PackType.STREAM_CHUNK,
-                        source  = self.context.NODE,
-                        dst     = pack.source,
-                        label   = pack.label,
-                        data    = chunk,
-                        path    = list(reversed(pack.path)) if pack.path else [],
-                    )
-                    await self._send_pack(chunk_pack)
-                eof_pack = MsgPack(
-                    type   = PackType.STREAM_EOF,
-                    source = self.context.NODE,
-                    dst    = pack.source,
-                    label  = pack.label,
-                    path   = list(reversed(pack.path)) if pack.path else [],
+                # чанки идут в фоне с кредитным окном: вызывающий
+                # подтверждает взятое через STREAM_ACK с этим label
+                reply = MsgPack(
+                    type    = PackType.STREAM_CHUNK,
+                    source  = self.context.NODE,
+                    dst     = pack.source,
+                    label   = pack.label,
+                    path    = list(pack.path),
                 )
-                await self._send_pack(eof_pack)
+                self.context.memory.attach_generator(result, reply, self)
             else:
-                result.path = list(reversed(pack.path)) if pack.path else []
+                result.path = list(pack.path)
                 await self._send_pack(result)
 
-        except MethodNotFound as e:
+        except Exception as e:
+            # исключение метода — вызывающему ERROR, а не ожидание до таймаута
+            if not isinstance(e, (MethodNotFound, Overloaded)):
+                log.error(f'request {pack.service}.{pack.method} failed: {e!r}')
             err = MsgPack(
                 type   = PackType.ERROR,
                 source = self.context.NODE,
                 dst    = pack.source,
                 label  = pack.label,
-                error  = str(e),
-                path   = list(reversed(pack.path)) if pack.path else [],
+                error  = str(e) or type(e).__name__,
+                path   = list(pack.path),
             )
             await self._send_pack(err)
+        except asyncio.CancelledError:
+            # вызывающий прислал CANCEL — ответ никому не нужен
+            log.info(f'request {pack.service}.{pack.method} {pack.label[:8]} cancelled')
+            raise
+
+    # ------------------------------------------------------------------ #
+    #  CANCEL
+    # ------------------------------------------------------------------ #
+
+    def _on_cancel(self, pack: MsgPack):
+        """CANCEL дошёл до исполнителя: снять задачу REQUEST и/или генератор."""
+        label = pack.label
+        self._stream_routes.pop(label, None)
+        task = self._requests.pop(label, None)
+        if task:
+            task.cancel()
+        transport = self.context.memory.get_transport(label)
+        if transport:
+            transport.abort()
+        if task or transport:
+            log.info(f'[cancel] {label[:8]} from {pack.source}: remote work stopped')
+        else:
+            log.debug(f'[cancel] {label[:8]}: nothing running')
+
+    async def _forward_cancel(self, pack: MsgPack):
+        """Транзит CANCEL: снять кэши маршрута и передать дальше к исполнителю."""
+        self._stream_routes.pop(pack.label, None)
+        self._ws_pending.pop(pack.label, None)
+        if pack.ttl <= 0:
+            return
+        try:
+            await self._forward(pack)
+        except NoRouteToHost:
+            log.debug(f'[cancel] {pack.label[:8]}: no route to {pack.dst}')
+
+    async def send_cancel(self, dst: str, label: str):
+        """
+        Сообщить исполнителю, что результат по label больше не нужен.
+        Идёт тем же маршрутом что REQUEST / STREAM_OPEN; ошибки доставки
+        не пробрасываются — отмена best-effort.
+        """
+        self._stream_routes.pop(label, None)
+        if dst == self.context.NODE:
+            self._on_cancel(MsgPack(type=PackType.CANCEL, source=dst, dst=dst, label=label))
+            return
+        cancel_pack = MsgPack(
+            type   = PackType.CANCEL,
+            source = self.context.NODE,
+            dst    = dst,
+            label  = label,
+            path   = [self.context.NODE],
+            ttl    = DEFAULT_TTL,
+        )
+        try:
+            await self._forward(cancel_pack)
+        except Exception as e:
+            log.debug(f'[cancel] {label[:8]} → {dst} not delivered: {e}')
 
     async def _on_stream_open(self, pack: MsgPack) -> MsgPack:
         try:
             return await self.executor.open_stream(pack)
-        except MethodNotFound as e:
+        except (MethodNotFound, MemoryBudgetExceeded) as e:
             return MsgPack(
                 type   = PackType.ERROR,
                 source = self.context.NODE,
@@ -401,6 +552,9 @@ class Router:
     async def _forward(self, pack: MsgPack):
         """Переслать пакет к следующему хопу на пути к dst."""
         dst = pack.dst
+        if self._drop_expired(pack):
+            return
+        pack.spend()
 
         # 1. server-side
         node = self._nodes_mgr.get(dst)
@@ -452,9 +606,15 @@ class Router:
         raise NoRouteToHost(dst)
 
     async def _route_back(self, pack: MsgPack):
-        """Вернуть пакет по обратному маршруту из pack.path."""
+        """Вернуть пакет по обратному маршруту из pack.path.
+
+        pack.path хранится в прямом порядке (origin → ... → текущий узел):
+        следующий хоп — последний элемент после отбрасывания себя.
+        """
+        # ERROR доходит до инициатора как исключение, а не как data
+        result = remote_error(pack.error) if pack.type == PackType.ERROR else pack.data
         if not pack.path:
-            self.sessions.resolve(pack.label, pack.data)
+            self.sessions.resolve(pack.label, result)
             return
 
         path = pack.path
@@ -462,7 +622,7 @@ class Router:
             path = path[:-1]
 
         if not path:
-            self.sessions.resolve(pack.label, pack.data)
+            self.sessions.resolve(pack.label, result)
             return
 
         next_hop = path[-1]
@@ -485,7 +645,7 @@ class Router:
     async def _send_back(self, response: MsgPack, original: MsgPack):
         """Отправить ответ: по path если был форвардинг, иначе напрямую."""
         if original.path:
-            response.path = list(reversed(original.path))
+            response.path = list(original.path)
             await self._route_back(response)
         else:
             transport = self.get_transport_to(response.dst)
@@ -502,6 +662,9 @@ class Router:
             transport = self.get_transport_to(pack.dst)
             if transport:
                 await transport.send(pack)
+            else:
+                # dst не сосед — через mesh (multi-hop стримы)
+                await self._forward(pack)
 
     def _make_transport_back(self, pack: MsgPack):
         """Создать transport для ответа на пакет через форвардинг."""
@@ -516,17 +679,36 @@ class Router:
     #  Stream ACK — отправка через mesh (Вариант A)
     # ------------------------------------------------------------------ #
 
-    async def send_stream_ack(self, label: str, buff: int):
-        """Отправить STREAM_ACK генератору — через mesh если нужно."""
+    async def send_stream_ack(self, label: str, buff: int,
+                              progress: dict | None = None, final: bool = False):
+        """
+        Отправить STREAM_ACK генератору — через mesh если нужно.
+        ACK несёт прогресс consumer'а (received/completed) для JobRegistry;
+        final=True — последний ACK стрима, после него маршрут снимается.
+        """
         route = self.get_stream_route(label)
+        if final:
+            self._stream_routes.pop(label, None)
         dst = route.source if route else None
+        if progress is None:
+            inbound = self.stream_registry.get(label)
+            progress = {
+                'received':  inbound.pipe.total_put,
+                # элемент, взятый последним, ещё в обработке
+                'completed': max(inbound.pipe.total_got - 1, 0),
+            } if inbound else {}
+        # под давлением памяти consumer просит генератор сузить окно
+        budget = self.context.memory.budget
+        if budget.pressure > budget.high:
+            progress = {**progress, 'window': budget.window(buff)}
         ack_pack = MsgPack(
             type=PackType.STREAM_ACK,
             source=self.context.NODE,
             dst=dst,
             label=label,
-            data=buff,
-            path=list(route.backward_path) if route else [],
+            data={'buff': buff, **progress},
+            # _route_back ждёт путь в прямом порядке (source → ... → мы)
+            path=list(reversed(route.backward_path)) if route else [],
         )
         if route and route.backward_path:
             await self._route_back(ack_pack)
@@ -543,24 +725,171 @@ class Router:
     #  Исходящие вызовы (публичный API)
     # ------------------------------------------------------------------ #
 
+    async def ping(self, node_id: str, timeout: float = 5) -> float | None:
+        """PING соседу: RTT в секундах или None, если PONG не пришёл."""
+        transport = self.get_transport_to(node_id)
+        if not transport:
+            return None
+        pack = MsgPack(type=PackType.PING, source=self.context.NODE, dst=node_id)
+        future = self.sessions.register_single(pack.label)
+        started = time.monotonic()
+        try:
+            await transport.send(pack)
+            await asyncio.wait_for(future, timeout=timeout)
+            return time.monotonic() - started
+        except Exception as e:
+            log.debug(f'PING {node_id} failed: {e!r}')
+            return None
+        finally:
+            self.sessions.cancel(pack.label)
+
+    def adaptive_timeout(self, dst: str, service: str, method: str,
+                         adaptive: bool | None = None) -> float:
+        """
+        Timeout вызова без явного timeout: timeout_factor × p95 прошлых
+        длительностей этого метода на dst (пока их мало — call_timeout), но
+        не меньше timeout_factor × RTT до dst; после каждого таймаута подряд —
+        вдвое больше (первый успешный ответ сбрасывает). Сверху —
+        call_timeout_max, снизу — call_timeout_min (adaptive=False —
+        call_timeout: timeout только растёт). По умолчанию — network.adaptive_timeout,
+        кроме network.adaptive_exempt: медленные, но живые методы (spawner,
+        certstool) не должны падать по таймауту.
+        """
+        cfg = self.context.config.network
+        if adaptive is None:
+            adaptive = cfg.adaptive_timeout and not (
+                service in cfg.adaptive_exempt or f'{service}.{method}' in cfg.adaptive_exempt)
+        key = (dst, service, method)
+        history = self._durations.get(key)
+        if history and len(history) >= _DURATION_MIN_SAMPLES:
+            timeout = cfg.timeout_factor * percentile(history, 0.95)
+        else:
+            timeout = cfg.call_timeout
+        rtt = self.context.network.neighbor_table.rtt_score(dst)
+        if rtt is not None:
+            timeout = max(timeout, cfg.timeout_factor * rtt)
+        floor = cfg.call_timeout_min if adaptive else cfg.call_timeout
+        timeout = max(timeout, floor)
+        streak = self._timeouts.get(key)
+        if streak:
+            timeout *= 2 ** min(streak, _TIMEOUT_BACKOFF_MAX)
+        return min(timeout, cfg.call_timeout_max)
+
+    def _record_duration(self, dst: str, service: str, method: str, seconds: float):
+        key = (dst, service, method)
+        history = self._durations.get(key)
+        if history is None:
+            history = self._durations[key] = deque(maxlen=_DURATION_WINDOW)
+        history.append(seconds)
+        self._timeouts.pop(key, None)
+
     async def call(self, dst: str, service: str, method: str,
-                   data: Any = None, timeout: int = 10) -> Any:
+                   data: Any = None, timeout: float | None = None,
+                   priority: str | None = None, adaptive: bool | None = None) -> Any:
+        """
+        RPC вызов. timeout уходит в пакет как deadline; вызов изнутри другого
+        @rpc метода не ждёт дольше остатка deadline внешнего вызова.
+        Без timeout он выводится из RTT до dst и истории метода
+        (см. adaptive_timeout; adaptive=False — не меньше call_timeout).
+        priority переопределяет класс пакета в очередях соединений
+        (например 'bulk' для тяжёлого фонового вызова).
+        """
+        outer = time_left()
+        if outer is not None and outer <= 0:
+            raise RPCTimeout(f'{service}.{method}', 0)
+        if dst == self.context.NODE:
+            # свой узел — прямой вызов метода, без пакетов и адаптивного timeout
+            remaining = outer if timeout is None else min(timeout, outer or timeout)
+            return await self._call_local(service, method, data, remaining)
+        if timeout is None:
+            timeout = self.adaptive_timeout(dst, service, method, adaptive)
+        if outer is not None:
+            timeout = min(timeout, outer)
+        self._outstanding[dst] = self._outstanding.get(dst, 0) + 1
+        started = time.monotonic()
+        try:
+            pack = MsgPack(
+                type     = PackType.REQUEST,
+                source   = self.context.NODE,
+                dst      = dst,
+                service  = service,
+                method   = method,
+                data     = data,
+                path     = [self.context.NODE],
+                ttl      = DEFAULT_TTL,
+                deadline = timeout,
+                priority = priority,
+            )
+            return await self._call_remote(pack, timeout, started)
+        finally:
+            self._outstanding[dst] -= 1
+            if not self._outstanding[dst]:
+                del self._outstanding[dst]
+
+    async def _call_local(self, service: str, method: str, data: Any,
+                          remaining: float | None) -> Any:
+        self._outstanding[self.context.NODE] = self._outstanding.get(self.context.NODE, 0) + 1
+        started = time.monotonic()
+        try:
+            invoke = self.executor.invoke(service, method, data, remaining)
+            if remaining is None:
+                result = await invoke
+            else:
+                # метод мог не смотреть в time_left() — остаток соблюдаем сами
+                try:
+                    result = await asyncio.wait_for(invoke, max(remaining, 0))
+                except asyncio.TimeoutError:
+                    raise RPCTimeout(f'{service}.{method}', round(remaining, 3)) from None
+            self._record_duration(self.context.NODE, service, method, time.monotonic() - started)
+            return result
+        finally:
+            self._outstanding[self.context.NODE] -= 1
+            if not self._outstanding[self.context.NODE]:
+                del self._outstanding[self.context.NODE]
+
+    async def call_batch(self, dst: str, calls: list[dict],
+                         timeout: float | None = None,
+                         priority: str | None = None,
+                         adaptive: bool | None = None) -> list[dict]:
+        """
+        Несколько вызовов к одному dst одним пакетом REQUEST_BATCH.
+        calls — [{'service', 'method', 'data'}]; dst выполняет их
+        конкурентно. Ответ — список в том же порядке: {'result': ...} или
+        {'error': ...} на каждый вызов. timeout=None — наибольший
+        адаптивный timeout среди вызовов.
+        """
+        if timeout is None:
+            timeout = max((self.adaptive_timeout(dst, c.get('service'), c.get('method'), adaptive)
+                           for c in calls), default=self.context.config.network.call_timeout)
+        outer = time_left()
+        if outer is not None:
+            if outer <= 0:
+                raise RPCTimeout(f'batch of {len(calls)}', 0)
+            timeout = min(timeout, outer)
         pack = MsgPack(
-            type    = PackType.REQUEST,
-            source  = self.context.NODE,
-            dst     = dst,
-            service = service,
-            method  = method,
-            data    = data,
-            path    = [self.context.NODE],
-            ttl     = DEFAULT_TTL,
+            type     = PackType.REQUEST_BATCH,
+            source   = self.context.NODE,
+            dst      = dst,
+            data     = {'calls': list(calls)},
+            path     = [self.context.NODE],
+            ttl      = DEFAULT_TTL,
+            deadline = timeout,
+            priority = priority,
         )
-
         if dst == self.context.NODE:
-            response = await self.executor.execute(pack)
+            response = await self.executor.execute_batch(pack)
             return response.data
+        self._outstanding[dst] = self._outstanding.get(dst, 0) + 1
+        try:
+            return await self._call_remote(pack, timeout, time.monotonic())
+        finally:
+            self._outstanding[dst] -= 1
+            if not self._outstanding[dst]:
+                del self._outstanding[dst]
 
-        future = self.sessions.register_single(pack.label, service, method)
+    async def _call_remote(self, pack: MsgPack, timeout: float, started: float) -> Any:
+        dst, service, method = pack.dst, pack.service, pack.method
+        future = self.sessions.register_single(pack.label, service or '', method or '')
 
         try:
             await self._forward(pack)
@@ -572,14 +901,165 @@ class Router:
             result = await asyncio.wait_for(future, timeout=timeout)
             if isinstance(result, Exception):
                 raise result
+            if service:
+                self._record_duration(dst, service, method, time.monotonic() - started)
             return result
         except asyncio.TimeoutError:
             self.sessions.cancel(pack.label)
+            # таймаут в p95 не идёт (серия таймаутов раздувала бы его без
+            # затухания): следующий timeout удваивается до первого ответа
+            if service:
+                key = (dst, service, method)
+                self._timeouts[key] = self._timeouts.get(key, 0) + 1
+            await self.send_cancel(dst, pack.label)
             raise RPCTimeout(pack.label, timeout)
+        except asyncio.CancelledError:
+            # отменили нас самих (CANCEL сверху) — отменить и вложенный вызов
+            self.sessions.cancel(pack.label)
+            await self.send_cancel(dst, pack.label)
+            raise
+
+    # ------------------------------------------------------------------ #
+    #  Вызов по имени сервиса: выбор реплики, hedging, повтор
+    # ------------------------------------------------------------------ #
+
+    def replicas(self, service: str, method: str = '') -> list[str]:
+        """Узлы с сервисом (включая свой), лучшие первыми."""
+        table = self.context.network.neighbor_table
+        nodes = [n.node_id for n in table.find_by_service(service)
+                 if n.status != NeighborStatus.UNREACHABLE]
+        if service in self.context.services.services:
+            nodes.append(self.context.NODE)
+        costs = {dst: self._replica_cost(dst, service, method) for dst in nodes}
+        # равные оценки — вразнобой, чтобы не бить всем в одну реплику
+        return sorted(nodes, key=lambda dst: (costs[dst], random.random()))
+
+    def _replica_cost(self, dst: str, service: str, method: str) -> float:
+        """
+        Ожидаемое время ответа: p95 прошлых вызовов метода на dst (или RTT),
+        умноженное на очередь — наши незавершённые вызовы + нагрузка узла.
+        """
+        history = self._durations.get((dst, service, method))
+        if history:
+            base = percentile(history, 0.95)
+        elif dst == self.context.NODE:
+            base = 0.0
+        else:
+            rtt = self.context.network.neighbor_table.rtt_score(dst)
+            base = _UNPROBED_COST if rtt is None else rtt
+        if dst == self.context.NODE:
+            load = len(self._requests)
+        else:
+            info = self.context.network.neighbor_table.get(dst)
+            load = (info.load or 0) if info else 0
+        return max(base, _MIN_COST) * (1 + self._outstanding.get(dst, 0) + load)
+
+    def _hedge_delay(self, dst: str, service: str, method: str) -> float:
+        history = self._durations.get((dst, service, method))
+        if history and len(history) >= _DURATION_MIN_SAMPLES:
+            return percentile(history, 0.95)
+        return self.context.config.network.hedge_delay
+
+    @staticmethod
+    def _retryable(error: Exception) -> bool:
+        """Ошибка реплики, после которой вызов можно повторить на другой."""
+        if isinstance(error, (RPCTimeout, NoRouteToHost, NodeNotFound,
+                              MemoryBudgetExceeded, Overloaded, ConnectionError)):
+            return True
+        return str(error).startswith(_RETRYABLE_REMOTE)
+
+    async def call_service(self, service: str, method: str, data: Any = None,
+                           timeout: float | None = None, hedge: bool | None = None,
+                           retries: int | None = None,
+                           priority: str | None = None,
+                           adaptive: bool | None = None) -> Any:
+        """
+        RPC вызов без dst: реплика выбирается по задержке, числу наших
+        незавершённых вызовов к ней и её нагрузке.
+
+        timeout — на весь вызов: каждая попытка и дубль получают только
+        остаток (без timeout — у каждой свой адаптивный).
+        hedge — если реплика не ответила за p95 своих прошлых ответов
+        (hedge_delay, пока истории нет), тот же запрос уходит следующей;
+        берётся первый ответ, второй вызов отменяется (CANCEL). Подходит
+        только для идемпотентных методов. Дублируется каждая попытка,
+        включая повторы, — не больше одного раза.
+        retries — сколько раз повторить на другой реплике после таймаута,
+        недоступности узла, перегрузки (Overloaded) или отсутствия на нём
+        метода. Ошибки самого метода не повторяются.
+        """
+        cfg = self.context.config.network
+        hedge = cfg.hedge if hedge is None else hedge
+        retries = cfg.call_retries if retries is None else retries
+        candidates = self.replicas(service, method)
+        if not candidates:
+            raise NoReplica(service)
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        tried: set[str] = set()
+        pending: dict[asyncio.Task, str] = {}
+        hedge_at: float | None = None  # когда дублировать последнюю попытку
+
+        def launch(hedged: bool = False) -> bool:
+            nonlocal hedge_at
+            dst = next((d for d in candidates if d not in tried), None)
+            if dst is None:
+                return False
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+            tried.add(dst)
+            task = asyncio.create_task(
+                self.call(dst, service, method, data, remaining, priority, adaptive))
+            pending[task] = dst
+            if hedge and not hedged:
+                hedge_at = time.monotonic() + self._hedge_delay(dst, service, method)
+            return True
+
+        launch()
+        failures = 0
+        last_error: Exception | None = None
+        try:
+            while pending:
+                wait = None if hedge_at is None else max(hedge_at - time.monotonic(), 0)
+                done, _ = await asyncio.wait(pending, timeout=wait,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # попытка медлит — продублировать её (один раз)
+                    hedge_at = None
+                    if launch(hedged=True):
+                        log.debug(f'[call_service] {service}.{method}: hedged '
+                                  f'{list(pending.values())}')
+                    continue
+                for task in done:
+                    dst = pending.pop(task)
+                    try:
+                        return task.result()
+                    except Exception as e:
+                        if not self._retryable(e):
+                            raise
+                        last_error = e
+                        failures += 1
+                        log.warning(f'[call_service] {service}.{method} on {dst} failed: {e}')
+                        if failures <= retries:
+                            launch()
+            raise last_error or NoReplica(service)
+        finally:
+            for task in pending:
+                task.cancel()
 
     async def stream(self, dst: str, service: str, method: str,
                      data: Any = None, timeout: int = 30) -> AsyncGenerator:
         """Открыть mesh-стрим и вернуть async iterator."""
+        if dst == self.context.NODE:
+            return self._local_stream(service, method, data)
+        # чанки стрима ложатся в память этого узла — тот же предел, что у executor'а
+        memory = self.context.memory
+        if not memory.budget.admits():
+            memory.budget.refused += 1
+            raise MemoryBudgetExceeded(memory.budget.used, memory.budget.limit)
         label = str(uuid.uuid4())
 
         open_pack = MsgPack(
@@ -595,23 +1075,102 @@ class Router:
         )
 
         ready_future = self.sessions.register_single(label, service, method)
+        # pipe регистрируется до STREAM_OPEN: генератор начинает слать сразу
+        # после STREAM_READY, и первые чанки могут обогнать его
+        pipe = memory.pipe_from_stream(label, self.context.config.memory.default_buff)
+        self.stream_registry.register(label, pipe)
 
         try:
             await self._forward(open_pack)
         except NoRouteToHost:
             self.sessions.cancel(label)
+            self.stream_registry.remove(label)
             raise
 
         try:
-            await asyncio.wait_for(ready_future, timeout=timeout)
+            result = await asyncio.wait_for(ready_future, timeout=timeout)
         except asyncio.TimeoutError:
             self.sessions.cancel(label)
+            self.stream_registry.remove(label)
+            await self.send_cancel(dst, label)
             raise RPCTimeout(label, timeout)
+        if isinstance(result, Exception):
+            self.stream_registry.remove(label)
+            raise result
+
+        # мы consumer: ACK идут генератору обратно по пути STREAM_OPEN
+        # (маршрут из _cache_stream_route_on_ready здесь смотрит не в ту сторону)
+        open_path = result.get('path', []) if isinstance(result, dict) else []
+        self._stream_routes[label] = StreamRoute(
+            label=label,
+            source=dst,
+            dst=self.context.NODE,
+            forward_path=[dst] + list(reversed(open_path)),
+            backward_path=list(open_path) + [dst],
+        )
 
-        pipe = Pipe(pipe_id=f'mesh_{label[:8]}', buff_len=10)
-        self.stream_registry.register(label, pipe)
+        return _MeshStreamIterator(self, label, pipe, dst)
+
+    def _local_stream(self, service: str, method: str, data: Any) -> '_LocalStreamIterator':
+        """Стрим со своего узла: генератор и читатель связаны pipe'ом напрямую."""
+        pipe = self.context.memory.create_pipe(buff=self.context.config.memory.default_buff)
+        pipe.retain()
+        try:
+            task = self.executor.open_local_generator(service, method, data, pipe)
+        except MethodNotFound:
+            pipe.release()
+            raise
+        return _LocalStreamIterator(pipe, task)
+
+
+# ------------------------------------------------------------------ #
+#  LocalStreamIterator — стрим со своего узла, без сети
+# ------------------------------------------------------------------ #
+
+class _LocalStreamIterator:
+    """
+    Итератор по локальному async-генератору @rpc: генератор пишет в pipe
+    в отдельной задаче, кредит — ёмкость pipe'а. aclose / сборка мусора
+    останавливают генератор.
+    """
+
+    def __init__(self, pipe: Pipe, task: asyncio.Task):
+        self._pipe = pipe
+        self._task = task
+        self._done = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._done:
+            raise StopAsyncIteration
+        chunk = await self._pipe.get()
+        if chunk is _SENTINEL:
+            self._finish()
+            raise StopAsyncIteration
+        if isinstance(chunk, Exception):
+            self._finish()
+            raise chunk
+        return chunk
 
-        return _MeshStreamIterator(self, label, pipe)
+    def _finish(self):
+        self._done = True
+        self._task.cancel()
+        self._pipe.release()
+
+    async def aclose(self):
+        if not self._done:
+            self._finish()
+
+    def __del__(self):
+        if self._done:
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return  # loop уже закрыт — генератор и pipe уходят вместе с ним
+        self._finish()
 
 
 # ------------------------------------------------------------------ #
@@ -619,23 +1178,69 @@ class Router:
 # ------------------------------------------------------------------ #
 
 class _MeshStreamIterator:
-    """Итератор по чанкам mesh-стрима с автоматическим ACK."""
+    """
+    Итератор по чанкам mesh-стрима с автоматическим ACK.
 
-    def __init__(self, router: Router, label: str, pipe: Pipe):
+    Кредит генератору возвращается пачками по половине окна: ACK несёт
+    сколько чанков взято из pipe ('completed'). Брошенный до конца итератор
+    (aclose / сборка мусора) отправляет генератору CANCEL.
+    """
+
+    def __init__(self, router: Router, label: str, pipe: Pipe, dst: str):
         self.router = router
         self.label = label
-        self._pipe = pipe
+        self.dst = dst
+        # читатель — второй владелец pipe (первый — реестр, до EOF)
+        self._pipe = pipe.retain()
+        self._acked = 0
+        self._done = False
 
     def __aiter__(self):
         return self
 
+    def _finish(self):
+        self._done = True
+        self.router._stream_routes.pop(self.label, None)
+        self._pipe.release()
+
     async def __anext__(self):
+        if self._done:
+            raise StopAsyncIteration
         chunk = await self._pipe.get()
         if chunk is _SENTINEL:
+            self._finish()
             raise StopAsyncIteration
-        await self.router.send_stream_ack(self.label, self._pipe.buff_len)
+        if isinstance(chunk, Exception):
+            self._finish()
+            raise chunk
+        if self._pipe.total_got - self._acked >= max(1, self._pipe.buff_len // 2):
+            await self._ack()
         return chunk
 
+    async def _ack(self):
+        self._acked = self._pipe.total_got
+        progress = {'received': self._pipe.total_put, 'completed': self._pipe.total_got}
+        await self.router.send_stream_ack(self.label, self._pipe.buff_len, progress)
+
+    async def aclose(self):
+        """Прекратить чтение до конца стрима: генератор на удалённой стороне остановится."""
+        if self._done:
+            return
+        self.router.stream_registry.remove(self.label)
+        self._finish()
+        await self.router.send_cancel(self.dst, self.label)
+
+    def __del__(self):
+        if self._done:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self.router.stream_registry.remove(self.label)
+        self._finish()
+        loop.create_task(self.router.send_cancel(self.dst, self.label))
+
 
 # ------------------------------------------------------------------ #
 #  PathAwareTransport — транспорт для path-aware ответов
@@ -652,5 +1257,5 @@ class _PathAwareTransport:
         self.ws        = None
 
     async def send(self, pack: MsgPack):
-        pack.path = list(reversed(self._original.path))
+        pack.path = list(self._original.path)
         await self._router._route_back(pack)
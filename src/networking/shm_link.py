@@ -0,0 +1,532 @@
+# GRID/shm_link.py — shared-memory канал между узлами на одном хосте
+#
+# Несколько процессов-узлов на одной машине общаются через WebSocket по
+# loopback — каждый STREAM_CHUNK это JSON + TCP. При HELLO узлы проверяют что
+# они на одном хосте (hostname + nonce, прочитанный из shared memory соседа),
+# после чего connector создаёт пару SPSC-колец в multiprocessing.shared_memory.
+# Данные стримов (STREAM_CHUNK / STREAM_EOF) идут через кольца, «звонок»
+# о новых данных / освободившемся месте — UDP-датаграммой на 127.0.0.1.
+# Всё остальное (HELLO, REQUEST, STREAM_OPEN/ACK, gossip, ...) — по WebSocket.
+#
+# Кольцо: [head u64][tail u64][reader_waiting u8][writer_waiting u8]
+#         [capacity u64 @24] ... данные
+# head/tail — монотонные счётчики байт; запись: <u32 длина> <JSON пакета>
+# (та же сериализация MsgPack, что и по WebSocket).
+# Пакет больше половины кольца пишется фрагментами (старший бит длины —
+# «продолжение следует»): порядок пакетов стрима не зависит от их размера.
+
+import asyncio
+import logging
+import json
+import os
+import secrets
+import socket
+import struct
+import time
+import uuid
+from multiprocessing import shared_memory
+from typing import Dict, Optional
+
+from src.networking.protocol import MsgPack, PackType
+from src.networking.transport import WebSocketTransport
+
+log = logging.getLogger('ShmLink')
+
+# что идёт через кольцо; порядок CHUNK → EOF внутри стрима сохраняется
+SHM_TYPES = (PackType.STREAM_CHUNK, PackType.STREAM_EOF)
+# поля пакета стрима, которые пишутся в кольцо
+_FIELDS = {'type', 'source', 'dst', 'label', 'data', 'path'}
+
+_HEADER = 64
+_POS = struct.Struct('<QQ')
+_LEN = struct.Struct('<I')
+_READER_WAITING = 16
+_WRITER_WAITING = 17
+_CAPACITY = 24
+_MORE = 1 << 31   # в длине записи: фрагмент, продолжение в следующей записи
+
+# страховочный опрос кольца, если «звонок» потерялся (UDP, гонка флагов)
+POLL_INTERVAL = 0.05
+
+# проба без HELLO_ACK (таймаут, HELLO_REJECT) удаляется через столько секунд
+PROBE_TTL = 30
+
+_BELL_DATA = b'D'
+_BELL_SPACE = b'S'
+
+# сегменты, созданные этим процессом (несколько узлов в одном процессе — тесты)
+_OWN_SEGMENTS: set[str] = set()
+
+
+def _create(name: str, size: int) -> shared_memory.SharedMemory:
+    shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+    _OWN_SEGMENTS.add(shm.name)
+    return shm
+
+
+def _unlink(shm: shared_memory.SharedMemory):
+    _OWN_SEGMENTS.discard(shm.name)
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Подключиться к чужому сегменту, не забирая его во владение."""
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name == 'posix' and shm.name not in _OWN_SEGMENTS:
+        # иначе resource_tracker этого процесса удалит сегмент при выходе
+        from multiprocessing import resource_tracker
+        try:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception:
+            pass
+    return shm
+
+
+class ShmRing:
+    """Кольцо одного направления: пишет ровно один процесс, читает другой."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        self.buf = shm.buf
+        # ёмкость из заголовка: размер сегмента может быть округлён ОС
+        (self.capacity,) = struct.unpack_from('<Q', self.buf, _CAPACITY)
+
+    @classmethod
+    def create(cls, size: int) -> 'ShmRing':
+        shm = _create(f'p2p_{uuid.uuid4().hex[:16]}', size + _HEADER)
+        shm.buf[:_HEADER] = bytes(_HEADER)
+        struct.pack_into('<Q', shm.buf, _CAPACITY, size)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> 'ShmRing':
+        return cls(_attach(name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def _positions(self) -> tuple[int, int]:
+        return _POS.unpack_from(self.buf, 0)
+
+    def free(self) -> int:
+        head, tail = self._positions()
+        return self.capacity - (head - tail)
+
+    def pending(self) -> bool:
+        head, tail = self._positions()
+        return head != tail
+
+    def flag(self, offset: int) -> bool:
+        return bool(self.buf[offset])
+
+    def set_flag(self, offset: int, value: bool):
+        self.buf[offset] = 1 if value else 0
+
+    def _copy_in(self, pos: int, data: bytes):
+        start = pos % self.capacity
+        first = min(len(data), self.capacity - start)
+        self.buf[_HEADER + start:_HEADER + start + first] = data[:first]
+        if first < len(data):
+            self.buf[_HEADER:_HEADER + len(data) - first] = data[first:]
+
+    def _copy_out(self, pos: int, length: int) -> bytes:
+        start = pos % self.capacity
+        first = min(length, self.capacity - start)
+        data = bytes(self.buf[_HEADER + start:_HEADER + start + first])
+        if first < length:
+            data += bytes(self.buf[_HEADER:_HEADER + length - first])
+        return data
+
+    def write(self, payload: bytes, more: bool = False):
+        """Записать запись (место уже проверено вызывающим)."""
+        head, _ = self._positions()
+        self._copy_in(head, _LEN.pack(len(payload) | (_MORE if more else 0)))
+        self._copy_in(head + _LEN.size, payload)
+        # head публикуется последним — читатель видит только целые записи
+        struct.pack_into('<Q', self.buf, 0, head + _LEN.size + len(payload))
+
+    def read_all(self) -> list[tuple[bytes, bool]]:
+        """Все записи: (payload, more) — more=True у не последнего фрагмента."""
+        head, tail = self._positions()
+        records = []
+        while tail < head:
+            (length,) = _LEN.unpack(self._copy_out(tail, _LEN.size))
+            more, length = bool(length & _MORE), length & ~_MORE
+            records.append((self._copy_out(tail + _LEN.size, length), more))
+            tail += _LEN.size + length
+        struct.pack_into('<Q', self.buf, 8, tail)
+        return records
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            _unlink(self.shm)
+
+
+class _Doorbell(asyncio.DatagramProtocol):
+    def __init__(self, link: 'ShmLink'):
+        self.link = link
+
+    def datagram_received(self, data: bytes, addr):
+        if _BELL_DATA in data:
+            self.link._data_ready.set()
+        if _BELL_SPACE in data:
+            self.link._space_ready.set()
+
+
+class ShmLink:
+    """
+    Канал с одним co-located соседом: out — пишем мы, inbound — пишет он.
+    Входящие пакеты уходят в Router.handle() как если бы пришли по WS.
+    """
+
+    def __init__(self, peer: str, router, out_ring: ShmRing, in_ring: ShmRing):
+        self.peer = peer
+        self.router = router
+        self.out = out_ring
+        self.inbound = in_ring
+        self._lock = asyncio.Lock()
+        self._data_ready = asyncio.Event()
+        self._space_ready = asyncio.Event()
+        self._udp: Optional[asyncio.DatagramTransport] = None
+        self._peer_bell: Optional[tuple] = None
+        self._task: Optional[asyncio.Task] = None
+        # фрагменты входящего пакета, пока не пришёл последний
+        self._partial: list[bytes] = []
+        self.active = False
+        # метрики
+        self.sent = 0
+        self.received = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.fragmented = 0   # пакеты больше половины кольца — записаны по частям
+        self.full_waits = 0   # писатель ждал места
+
+    async def bind(self) -> int:
+        """Поднять свой «звонок», вернуть порт."""
+        loop = asyncio.get_running_loop()
+        self._udp, _ = await loop.create_datagram_endpoint(
+            lambda: _Doorbell(self), local_addr=('127.0.0.1', 0)
+        )
+        return self._udp.get_extra_info('sockname')[1]
+
+    def connect(self, peer_port: int):
+        self._peer_bell = ('127.0.0.1', peer_port)
+        self.active = True
+        self._task = asyncio.create_task(self._read_loop())
+        log.info(f'shm link with {self.peer} up '
+                 f'(ring {self.out.capacity >> 10} KiB each way)')
+
+    def _ring(self, signal: bytes):
+        if self._udp and self._peer_bell:
+            self._udp.sendto(signal, self._peer_bell)
+
+    # ------------------------------------------------------------------ #
+    #  Отправка
+    # ------------------------------------------------------------------ #
+
+    async def send(self, pack: MsgPack):
+        """
+        Записать пакет в кольцо. Больше половины кольца — фрагментами:
+        пакеты стрима не уходят в обход кольца и не обгоняют друг друга.
+        """
+        payload = pack.model_dump_json(include=_FIELDS).encode()
+        step = self.out.capacity // 2 - _LEN.size
+        if len(payload) > step:
+            self.fragmented += 1
+        view = memoryview(payload)
+        # фрагменты одного пакета идут подряд — lock на всю запись
+        async with self._lock:
+            for offset in range(0, len(payload), step):
+                fragment = view[offset:offset + step]
+                await self._wait_space(_LEN.size + len(fragment))
+                self.out.write(fragment, more=offset + step < len(payload))
+                if self.out.flag(_READER_WAITING):
+                    self._ring(_BELL_DATA)
+        self.sent += 1
+        self.bytes_sent += len(payload)
+
+    async def _wait_space(self, need: int):
+        """ConnectionError если link закрыт (в т.ч. пока ждали) — кольца уже нет."""
+        while True:
+            if not self.active:
+                raise ConnectionError(f'shm link with {self.peer} closed')
+            if self.out.free() >= need:
+                break
+            self.full_waits += 1
+            self._space_ready.clear()
+            self.out.set_flag(_WRITER_WAITING, True)
+            if self.out.free() >= need:
+                break
+            try:
+                await asyncio.wait_for(self._space_ready.wait(), POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+        self.out.set_flag(_WRITER_WAITING, False)
+
+    # ------------------------------------------------------------------ #
+    #  Приём
+    # ------------------------------------------------------------------ #
+
+    async def _read_loop(self):
+        while self.active:
+            try:
+                records = self.inbound.read_all()
+            except Exception as e:
+                log.error(f'shm link {self.peer}: read failed: {e}')
+                return
+            if records:
+                if self.inbound.flag(_WRITER_WAITING):
+                    self._ring(_BELL_SPACE)
+                for record, more in records:
+                    self._partial.append(record)
+                    if not more:
+                        record = b''.join(self._partial) \
+                            if len(self._partial) > 1 else self._partial[0]
+                        self._partial.clear()
+                        await self._dispatch(record)
+                continue
+            # кольцо пусто: выставить флаг, перепроверить, ждать «звонка»
+            self._data_ready.clear()
+            self.inbound.set_flag(_READER_WAITING, True)
+            if not self.inbound.pending():
+                try:
+                    await asyncio.wait_for(self._data_ready.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+            if not self.active:
+                # close() уже освободил сегменты
+                return
+            self.inbound.set_flag(_READER_WAITING, False)
+
+    async def _dispatch(self, record: bytes):
+        self.received += 1
+        self.bytes_received += len(record)
+        try:
+            pack = MsgPack(**json.loads(record))
+        except Exception as e:
+            log.error(f'shm link {self.peer}: bad record: {e}')
+            return
+        try:
+            await self.router.handle(pack, self.router.get_transport_to(self.peer))
+        except Exception as e:
+            log.error(f'shm link {self.peer}: handle {pack.type} failed: {e}')
+
+    def close(self):
+        self.active = False
+        if self._task:
+            self._task.cancel()
+        if self._udp:
+            self._udp.close()
+        self.out.close()
+        self.inbound.close()
+
+    def stats(self) -> dict:
+        return {
+            'peer':           self.peer,
+            'active':         self.active,
+            'ring_bytes':     self.out.capacity,
+            'out_pending':    self.out.capacity - self.out.free(),
+            'sent':           self.sent,
+            'received':       self.received,
+            'bytes_sent':     self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'fragmented':     self.fragmented,
+            'full_waits':     self.full_waits,
+        }
+
+
+class ShmTransport:
+    """Транспорт к co-located соседу: данные стримов — кольцо, остальное — WS."""
+
+    def __init__(self, link: ShmLink, ws_transport: WebSocketTransport):
+        self.link = link
+        self.ws_transport = ws_transport
+        self.ws = ws_transport.ws
+
+    async def send(self, pack: MsgPack):
+        if pack.type in SHM_TYPES and self.link.active:
+            try:
+                await self.link.send(pack)
+                return
+            except ConnectionError as e:
+                # link закрылся во время записи — пакет уходит по WS
+                log.debug(f'{e}, {pack.type} falls back to WS')
+        await self.ws_transport.send(pack)
+
+
+class ShmLinkManager:
+    """
+    Обнаружение co-located соседей при HELLO и жизненный цикл ShmLink.
+    connector: probe() в HELLO → verify() ответа → offer() по WS (SHM_LINK)
+    server:    answer_probe() в HELLO_ACK → on_link() на SHM_LINK
+    """
+
+    def __init__(self, context, enabled: bool = True, ring_bytes: int = 8 << 20):
+        self.ctx = context
+        self.enabled = enabled
+        self.ring_bytes = ring_bytes
+        self.hostname = socket.gethostname()
+        self.links: Dict[str, ShmLink] = {}
+        # segment → (shm, nonce, created): пробы, ожидающие HELLO_ACK
+        self._probes: Dict[str, tuple] = {}
+
+    # ------------------------------------------------------------------ #
+    #  Обнаружение: hostname + nonce из shared memory
+    # ------------------------------------------------------------------ #
+
+    def probe(self) -> Optional[dict]:
+        """Для HELLO: сегмент с nonce, который прочитает только процесс на этом хосте."""
+        if not self.enabled:
+            return None
+        self._expire_probes()
+        nonce = secrets.token_bytes(16)
+        shm = _create(f'p2p_probe_{uuid.uuid4().hex[:12]}', len(nonce))
+        shm.buf[:len(nonce)] = nonce
+        self._probes[shm.name] = (shm, nonce, time.monotonic())
+        return {'hostname': self.hostname, 'segment': shm.name}
+
+    def answer_probe(self, probe: Optional[dict]) -> Optional[dict]:
+        """Для HELLO_ACK: прочитать nonce соседа (если он на этом хосте)."""
+        if not self.enabled or not probe or probe.get('hostname') != self.hostname:
+            return None
+        try:
+            shm = _attach(probe['segment'])
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+        try:
+            nonce = bytes(shm.buf[:16]).hex()
+        finally:
+            shm.close()
+        return {'segment': probe['segment'], 'nonce': nonce}
+
+    def verify(self, answer: Optional[dict]) -> bool:
+        """
+        Ответ соседа совпал с нашим nonce — он видит нашу shared memory.
+        Снимается только проба этого ответа: HELLO к другим соседам ещё ждут
+        своих; пробы без ответа удаляет _expire_probes().
+        """
+        self._expire_probes()
+        probe = self._probes.pop(answer.get('segment'), None) if answer else None
+        if probe is None:
+            return False
+        shm, nonce, _ = probe
+        self._unlink_probe(shm)
+        return answer.get('nonce') == nonce.hex()
+
+    def _expire_probes(self):
+        deadline = time.monotonic() - PROBE_TTL
+        for name, (shm, _, created) in list(self._probes.items()):
+            if created < deadline:
+                del self._probes[name]
+                self._unlink_probe(shm)
+
+    @staticmethod
+    def _unlink_probe(shm: shared_memory.SharedMemory):
+        shm.close()
+        _unlink(shm)
+
+    def _drop_probes(self):
+        for shm, _, _ in self._probes.values():
+            self._unlink_probe(shm)
+        self._probes.clear()
+
+    # ------------------------------------------------------------------ #
+    #  Установка канала
+    # ------------------------------------------------------------------ #
+
+    async def offer(self, peer: str, ws, timeout: int = 10):
+        """Connector: создать кольца и предложить соседу канал (SHM_LINK по WS)."""
+        router = self.ctx.network.router
+        link = ShmLink(peer, router, ShmRing.create(self.ring_bytes),
+                       ShmRing.create(self.ring_bytes))
+        try:
+            port = await link.bind()
+            label = str(uuid.uuid4())
+            future = router.sessions.register_single(label, '', '')
+            await WebSocketTransport(ws).send(MsgPack(
+                type   = PackType.SHM_LINK,
+                source = self.ctx.NODE,
+                dst    = peer,
+                label  = label,
+                data   = {
+                    # с точки зрения connector'а: to_peer пишет он, from_peer — сосед
+                    'to_peer':   link.out.name,
+                    'from_peer': link.inbound.name,
+                    'doorbell':  port,
+                },
+            ))
+            reply = await asyncio.wait_for(future, timeout=timeout)
+        except Exception as e:
+            log.warning(f'shm link offer to {peer} failed: {e}')
+            link.close()
+            return
+        if not isinstance(reply, dict) or not reply.get('doorbell'):
+            log.info(f'shm link declined by {peer}: {reply}')
+            link.close()
+            return
+        link.connect(reply['doorbell'])
+        self._replace(peer, link)
+
+    async def on_link(self, pack: MsgPack, transport):
+        """Router: SHM_LINK — предложение канала (server) или ответ на него (connector)."""
+        data = pack.data or {}
+        if 'to_peer' not in data:
+            self.ctx.network.router.sessions.resolve(pack.label, data)
+            return
+        reply = {'doorbell': None}
+        if self.enabled:
+            try:
+                link = ShmLink(pack.source, self.ctx.network.router,
+                               ShmRing.attach(data['from_peer']),
+                               ShmRing.attach(data['to_peer']))
+                reply['doorbell'] = await link.bind()
+                link.connect(data['doorbell'])
+                self._replace(pack.source, link)
+            except Exception as e:
+                log.warning(f'shm link from {pack.source} not attached: {e}')
+                reply['error'] = str(e)
+        await transport.send(MsgPack(
+            type   = PackType.SHM_LINK,
+            source = self.ctx.NODE,
+            dst    = pack.source,
+            label  = pack.label,
+            data   = reply,
+        ))
+
+    def _replace(self, peer: str, link: ShmLink):
+        old = self.links.pop(peer, None)
+        if old:
+            old.close()
+        self.links[peer] = link
+
+    # ------------------------------------------------------------------ #
+    #  Использование / завершение
+    # ------------------------------------------------------------------ #
+
+    def wrap(self, node_id: str, transport: WebSocketTransport):
+        link = self.links.get(node_id)
+        if link and link.active:
+            return ShmTransport(link, transport)
+        return transport
+
+    def drop(self, peer: str):
+        """Сосед отключился — закрыть канал (кольца удаляет создатель)."""
+        link = self.links.pop(peer, None)
+        if link:
+            link.close()
+            log.info(f'shm link with {peer} closed')
+
+    def close_all(self):
+        for peer in list(self.links):
+            self.drop(peer)
+        self._drop_probes()
+
+    def stats(self) -> list[dict]:
+        return [link.stats() for link in self.links.values()]
@@ -22,7 +22,8 @@ class StreamRegistry:
         self._streams: Dict[str, InboundStream] = {}
 
     def register(self, label: str, pipe: Pipe) -> InboundStream:
-        stream = InboundStream(label, pipe)
+        # реестр — владелец pipe до EOF: сюда пишут входящие STREAM_CHUNK
+        stream = InboundStream(label, pipe.retain())
         self._streams[label] = stream
         log.debug(f'inbound stream registered: {label[:8]}')
         return stream
@@ -31,7 +32,9 @@ class StreamRegistry:
         return self._streams.get(label)
 
     def remove(self, label: str):
-        self._streams.pop(label, None)
+        stream = self._streams.pop(label, None)
+        if stream:
+            stream.pipe.release()
 
     async def feed(self, label: str, chunk):
         stream = self._streams.get(label)
@@ -40,10 +43,21 @@ class StreamRegistry:
         else:
             log.warning(f'CHUNK for unknown stream {label[:8]} — dropped')
 
-    async def close(self, label: str):
+    async def close(self, label: str, cancel: bool = False):
+        """EOF стрима. cancel=True — необработанные элементы выбрасываются."""
         stream = self._streams.get(label)
         if stream:
+            if cancel:
+                dropped = stream.pipe.clear()
+                log.info(f'inbound stream cancelled: {label[:8]} dropped={dropped}')
             await stream.pipe.put(_SENTINEL)
             stream.pipe.close()
             self.remove(label)
-            log.debug(f'inbound stream closed: {label[:8]}')
\ No newline at end of file
+            log.debug(f'inbound stream closed: {label[:8]}')
+
+    async def fail(self, label: str, error: str):
+        """Стрим оборван ошибкой на стороне генератора: читатель получит исключение."""
+        stream = self._streams.get(label)
+        if stream:
+            await stream.pipe.put(Exception(error))
+            await self.close(label)
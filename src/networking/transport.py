@@ -2,6 +2,7 @@
 
 import logging
 
+from src.networking.link_scheduler import LinkScheduler
 from src.networking.protocol import MsgPack
 
 log = logging.getLogger('Transport')
@@ -10,20 +11,16 @@ log = logging.getLogger('Transport')
 class WebSocketTransport:
     """
     Универсальный транспорт — работает с обоими типами WS:
-    - FastAPI WebSocket (server-side) — имеет send_json()
+    - FastAPI WebSocket (server-side) — имеет send_text()
     - websockets ClientConnection (client-side) — имеет только send()
+
+    Запись идёт через LinkScheduler соединения: служебный трафик вперёд,
+    RPC и данные стримов — по весам (см. link_scheduler.py).
     """
     def __init__(self, websocket):
         self.ws = websocket
-        # определяем тип один раз при создании
-        self._is_fastapi = hasattr(websocket, 'send_json')
+        self.link = LinkScheduler.for_ws(websocket)
 
     async def send(self, pack: MsgPack):
-        data = pack.model_dump_json()
-        if self._is_fastapi:
-            await self.ws.send_json(pack.model_dump())
-        else:
-            await self.ws.send(data)
+        await self.link.send(pack)
         log.debug(f'→ {pack.type} [{pack.label[:8]}] to {pack.dst}')
-
-